@@ -0,0 +1,80 @@
+// Benchmark: per-request overhead of the stdout logging modes (sync, async, worker, pretty, sampling).
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { createLogger, shouldLogRequest, flushLogger } = require('../src/utils/log_output');
+
+/*
+ * Usage (no database needed):
+ *   node benchmarks/logger.js
+ *
+ * Optional environment variables:
+ *   BENCH_ITERATIONS=50000   simulated requests per case
+ *
+ * Every case logs the request line of logMiddleware into a temporary file and
+ * reports the main-thread time per request. The "legacy" case formats the
+ * previous template string; all others log structured fields.
+ */
+
+const ITERATIONS = Number(process.env.BENCH_ITERATIONS) || 50000;
+
+const CASES = [
+  { name: 'legacy template (sync)', mode: 'sync', legacy: true },
+  { name: 'sync', mode: 'sync' },
+  { name: 'async (4 KB buffer)', mode: 'async' },
+  { name: 'worker thread', mode: 'worker' },
+  { name: 'pretty (worker thread)', mode: 'pretty' },
+  { name: 'async + 10% sampling', mode: 'async', sampleRate: 0.1 },
+  { name: 'async + 1% sampling', mode: 'async', sampleRate: 0.01 }
+];
+
+// A finished request as seen by logMiddleware (one in twenty is an error).
+const requestAt = (i) => ({
+  method: 'GET',
+  url: `/api/report?id=123123&year=2025&month=${(i % 12) + 1}`,
+  statusCode: i % 20 === 0 ? 500 : 200,
+  responseTimeMs: i % 40
+});
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function runCase(testCase, file) {
+  const logger = createLogger({ mode: testCase.mode, destination: file });
+  // Worker-based transports start asynchronously.
+  await sleep(testCase.mode === 'worker' || testCase.mode === 'pretty' ? 500 : 50);
+
+  const rate = testCase.sampleRate === undefined ? 1 : testCase.sampleRate;
+  const start = process.hrtime.bigint();
+  for (let i = 0; i < ITERATIONS; i++) {
+    const r = requestAt(i);
+    if (testCase.legacy) {
+      logger.info(`${r.method} ${r.url} ${r.statusCode} ${r.responseTimeMs}ms`);
+    } else if (shouldLogRequest(r.statusCode, rate)) {
+      logger.info(r, 'request completed');
+    }
+  }
+  const elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+
+  await flushLogger(logger);
+  return (elapsedMs * 1000) / ITERATIONS;
+}
+
+async function main() {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'logger-bench-'));
+  console.log(`${ITERATIONS} requests per case`);
+  console.log('mode                          us/request');
+
+  try {
+    for (const [i, testCase] of CASES.entries()) {
+      const usPerRequest = await runCase(testCase, path.join(dir, `case-${i}.log`));
+      console.log(`${testCase.name.padEnd(28)} ${usPerRequest.toFixed(2).padStart(11)}`);
+    }
+  } finally {
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+}
+
+main().then(() => process.exit(0)).catch((err) => {
+  console.error('Benchmark failed:', err);
+  process.exit(1);
+});
@@ -0,0 +1,113 @@
+// Benchmark: legacy in-JS report grouping vs. the aggregation-based report engine.
+const mongoose = require('mongoose');
+const connectDb = require('../src/utils/connect_db');
+const Cost = require('../src/models/cost_model');
+const CATEGORIES = require('../src/utils/categories');
+const { computeMonthlyCosts } = require('../src/utils/report_engine');
+
+/*
+ * Usage (use a scratch database, the benchmark inserts and deletes costs):
+ *   MONGODB_URI=mongodb://127.0.0.1:27017/cost_bench node benchmarks/report_engine.js
+ *
+ * Optional environment variables:
+ *   BENCH_SIZES=1000,10000,100000   costs per user-month to benchmark
+ *   BENCH_RUNS=10                   timed runs per path and size
+ */
+
+const SIZES = (process.env.BENCH_SIZES || '1000,10000,100000').split(',').map(Number);
+const RUNS = Number(process.env.BENCH_RUNS) || 10;
+
+// Reserved user id range that does not collide with real users.
+const BENCH_USER_BASE = 990000000;
+const YEAR = 2000;
+const MONTH = 1;
+
+// The original implementation: hydrate every document, filter once per category.
+async function legacyReportCosts(userId, year, month) {
+  const costs = await Cost.find({ userid: userId, year, month });
+  return CATEGORIES.map((cat) => ({
+    [cat]: costs
+      .filter((c) => c.category === cat)
+      .map((c) => ({ sum: c.sum, description: c.description, day: c.day }))
+  }));
+}
+
+// Insert `size` synthetic cost items for one user-month.
+async function seed(userId, size) {
+  const batch = 5000;
+  for (let i = 0; i < size; i += batch) {
+    const docs = [];
+    for (let j = i; j < Math.min(size, i + batch); j++) {
+      docs.push({
+        userid: userId,
+        description: `bench item ${j}`,
+        category: CATEGORIES[j % CATEGORIES.length],
+        sum: (j % 500) + 0.99,
+        createdAt: new Date(YEAR, MONTH - 1, (j % 28) + 1),
+        year: YEAR,
+        month: MONTH,
+        day: (j % 28) + 1
+      });
+    }
+    await Cost.insertMany(docs, { lean: true });
+  }
+}
+
+// Run fn RUNS times (after one warm-up) and return latency statistics in milliseconds.
+async function measure(fn) {
+  await fn();
+  const samples = [];
+  for (let i = 0; i < RUNS; i++) {
+    const start = process.hrtime.bigint();
+    await fn();
+    samples.push(Number(process.hrtime.bigint() - start) / 1e6);
+  }
+  samples.sort((a, b) => a - b);
+  const mean = samples.reduce((acc, v) => acc + v, 0) / samples.length;
+  return { mean, p50: samples[Math.floor(samples.length / 2)], max: samples[samples.length - 1] };
+}
+
+// Sanity check: both paths must produce the same report content.
+function sameCosts(a, b) {
+  return JSON.stringify(a) === JSON.stringify(b);
+}
+
+async function main() {
+  await connectDb();
+  const rows = [];
+
+  for (const [i, size] of SIZES.entries()) {
+    const userId = BENCH_USER_BASE + i;
+    await Cost.deleteMany({ userid: userId });
+    await seed(userId, size);
+
+    const legacy = await legacyReportCosts(userId, YEAR, MONTH);
+    const engine = await computeMonthlyCosts(userId, YEAR, MONTH);
+    if (!sameCosts(legacy, engine)) {
+      throw new Error(`Report mismatch for size ${size}`);
+    }
+
+    const legacyStats = await measure(() => legacyReportCosts(userId, YEAR, MONTH));
+    const engineStats = await measure(() => computeMonthlyCosts(userId, YEAR, MONTH));
+    rows.push({ size, legacyStats, engineStats });
+
+    await Cost.deleteMany({ userid: userId });
+  }
+
+  const fmt = (v) => v.toFixed(1).padStart(10);
+  console.log('costs/month   legacy mean  legacy p50  engine mean  engine p50  speedup');
+  for (const { size, legacyStats, engineStats } of rows) {
+    console.log(
+      `${String(size).padStart(11)} ${fmt(legacyStats.mean)}  ${fmt(legacyStats.p50)}  ` +
+      `${fmt(engineStats.mean)}  ${fmt(engineStats.p50)}  ${(legacyStats.mean / engineStats.mean).toFixed(2)}x`
+    );
+  }
+
+  await mongoose.disconnect();
+}
+
+main().catch(async (err) => {
+  console.error('Benchmark failed:', err);
+  await mongoose.disconnect();
+  process.exit(1);
+});
@@ -0,0 +1,145 @@
+// Benchmark: hydrated documents + toObject/JSON.stringify vs. lean objects + precompiled serializers.
+const { PerformanceObserver } = require('perf_hooks');
+const Cost = require('../src/models/cost_model');
+const User = require('../src/models/user_model');
+const CATEGORIES = require('../src/utils/categories');
+const { serializers } = require('../src/utils/serializers');
+
+/*
+ * Usage (no database needed, documents are built in memory):
+ *   node benchmarks/serializers.js
+ *
+ * Optional environment variables:
+ *   BENCH_ITERATIONS=20000   serializations per case
+ *   BENCH_REPORT_ITEMS=500   cost items in the serialized report
+ *
+ * For every response shape the benchmark reports the time per serialization
+ * and the number / duration of garbage collections while the case ran.
+ */
+
+const ITERATIONS = Number(process.env.BENCH_ITERATIONS) || 20000;
+const REPORT_ITEMS = Number(process.env.BENCH_REPORT_ITEMS) || 500;
+
+// The toObject() call the add handlers used before the serializers existed.
+const toPublicObject = (doc) => doc.toObject({
+  versionKey: false,
+  transform: function (d, ret) {
+    delete ret._id;
+    return ret;
+  }
+});
+
+// Track garbage collections (count and total pause time) per case.
+const gc = { count: 0, ms: 0 };
+new PerformanceObserver((list) => {
+  for (const entry of list.getEntries()) {
+    gc.count++;
+    gc.ms += entry.duration;
+  }
+}).observe({ entryTypes: ['gc'] });
+
+// Run fn ITERATIONS times (after a warm-up) and return the timing and GC statistics.
+async function measure(fn) {
+  for (let i = 0; i < Math.min(1000, ITERATIONS); i++) fn(i);
+  // GC entries are delivered asynchronously; let pending ones arrive first.
+  await new Promise((resolve) => setImmediate(resolve));
+  gc.count = 0;
+  gc.ms = 0;
+
+  let bytes = 0;
+  const start = process.hrtime.bigint();
+  for (let i = 0; i < ITERATIONS; i++) {
+    bytes += fn(i).length;
+  }
+  const elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+
+  await new Promise((resolve) => setImmediate(resolve));
+  return { usPerOp: (elapsedMs * 1000) / ITERATIONS, gcCount: gc.count, gcMs: gc.ms, bytes };
+}
+
+function buildFixtures() {
+  const costInput = {
+    userid: 123123,
+    description: 'milk and bread',
+    category: 'food',
+    sum: 12.5,
+    createdAt: new Date(),
+    year: 2025,
+    month: 1,
+    day: 14
+  };
+  const userInput = { id: 123123, first_name: 'mosh', last_name: 'israeli', birthday: new Date('1990-01-01') };
+
+  const items = {};
+  for (let i = 0; i < REPORT_ITEMS; i++) {
+    const cat = CATEGORIES[i % CATEGORIES.length];
+    (items[cat] = items[cat] || []).push({ sum: (i % 500) + 0.99, description: `item ${i}`, day: (i % 28) + 1 });
+  }
+  const report = {
+    userid: 123123,
+    year: 2025,
+    month: 1,
+    costs: CATEGORIES.map((cat) => ({ [cat]: items[cat] || [] }))
+  };
+
+  const logs = [];
+  for (let i = 0; i < 100; i++) {
+    logs.push({
+      _id: `65a${i}`,
+      level: 'info',
+      time: new Date(),
+      msg: `GET /api/report?id=123123&year=2025&month=${i % 12}`,
+      pid: 4242,
+      hostname: 'bench-host',
+      statusCode: 200,
+      responseTimeMs: i % 40,
+      __v: 0
+    });
+  }
+
+  return {
+    costDoc: new Cost(costInput),
+    costLean: { _id: 'x', ...costInput, __v: 0 },
+    userDoc: new User(userInput),
+    report,
+    logs
+  };
+}
+
+async function main() {
+  const f = buildFixtures();
+
+  // Sanity check: serializers must produce the same JSON as the previous code paths.
+  if (serializers.cost(f.costDoc) !== JSON.stringify(toPublicObject(f.costDoc)) ||
+      serializers.report(f.report) !== JSON.stringify(f.report)) {
+    throw new Error('Serializer output differs from JSON.stringify');
+  }
+
+  const cases = [
+    ['cost (hydrated doc)', 'toObject + stringify', () => JSON.stringify(toPublicObject(f.costDoc))],
+    ['cost (hydrated doc)', 'serializer', () => serializers.cost(f.costDoc)],
+    ['cost (lean)', 'strip + stringify', () => { const { _id, __v, ...c } = f.costLean; return JSON.stringify(c); }],
+    ['cost (lean)', 'serializer', () => serializers.cost(f.costLean)],
+    ['user (hydrated doc)', 'toObject + stringify', () => JSON.stringify(toPublicObject(f.userDoc))],
+    ['user (hydrated doc)', 'serializer', () => serializers.user(f.userDoc)],
+    [`report (${REPORT_ITEMS} items)`, 'JSON.stringify', () => JSON.stringify(f.report)],
+    [`report (${REPORT_ITEMS} items)`, 'serializer', () => serializers.report(f.report)],
+    ['logs page (100)', 'strip + stringify', () => JSON.stringify(f.logs.map(({ _id, __v, ...log }) => log))],
+    ['logs page (100)', 'serializer', () => serializers.logs(f.logs)]
+  ];
+
+  console.log(`${ITERATIONS} iterations per case`);
+  console.log('shape                  path                    us/op   GCs  GC ms');
+  for (const [shape, path, fn] of cases) {
+    const r = await measure(fn);
+    console.log(
+      `${shape.padEnd(22)} ${path.padEnd(22)} ${r.usPerOp.toFixed(2).padStart(7)} ` +
+      `${String(r.gcCount).padStart(5)} ${r.gcMs.toFixed(1).padStart(6)}`
+    );
+  }
+}
+
+main().catch((err) => {
+  console.error('Benchmark failed:', err);
+  process.exit(1);
+});
@@ -1,8 +1,10 @@
 // Admin service: exposes the /api/about endpoint that returns the team members list.
 const express = require('express');
 const dotenv = require('dotenv');
-const connectDb = require('../utils/connect_db');
+const startService = require('../utils/start_service');
+const { mountDiagnostics } = require('../utils/diagnostics');
 const { logMiddleware } = require('../utils/logger');
+const { compression } = require('../utils/compression');
 
 dotenv.config();
 
@@ -10,9 +12,15 @@ dotenv.config();
 const app = express();
 app.use(express.json());
 
+// Compress large response bodies for clients that accept brotli/gzip.
+app.use(compression());
+
 // Middleware: log every HTTP request (course requirement), typically saved to DB via logger.
 app.use(logMiddleware);
 
+// Expose runtime statistics (log sink counters, ...) at GET /internal/stats.
+mountDiagnostics(app);
+
 // Shared handler used by both /api/about and /api/about/ for compatibility with testers.
 const aboutHandler = (req, res) => {
   // Read the team members list from environment variables (not from the database).
@@ -62,13 +70,9 @@ app.get('/api/about/', aboutHandler);
 // Choose a port: prefer a general PORT, otherwise a service-specific PORT_ADMIN, fallback to 3004.
 const PORT = process.env.PORT || process.env.PORT_ADMIN || 3004;
 
-// Connect to MongoDB so logMiddleware can persist logs; start server only after DB is ready.
-connectDb()
-  .then(() => {
-    app.listen(PORT, () => console.log(`Admin Service running on port ${PORT}`));
-  })
-  .catch((err) => {
-    // If DB connection fails, print the error and exit so deployment sees the failure immediately.
-    console.error('Admin Service failed to start (DB connection error):', err.message);
-    process.exit(1);
-  });
+// Start the service when run directly (not when mounted by the gateway or a test).
+if (require.main === module) {
+  startService({ name: 'Admin Service', key: 'admin', app, port: PORT });
+}
+
+module.exports = { app };
@@ -0,0 +1,116 @@
+// Cluster launcher: forks worker processes per service, restarts crashed workers and shuts down gracefully.
+const cluster = require('cluster');
+const os = require('os');
+const path = require('path');
+const dotenv = require('dotenv');
+
+dotenv.config();
+
+/*
+ * Usage:
+ *   node src/cluster.js           -> users, costs, logs and admin services
+ *   node src/cluster.js gateway   -> the combined single-port gateway
+ *
+ * Worker counts: CLUSTER_WORKERS_<SERVICE> (e.g. CLUSTER_WORKERS_COSTS=8),
+ * falling back to CLUSTER_WORKERS, then to a quarter of the CPU cores (min 1).
+ * Workers of one service share its port through the cluster module.
+ *
+ * Each worker opens its own MongoDB connection pool, so size the pools
+ * (see connect_db) with the total number of workers in mind.
+ */
+const SERVICES = {
+  users: path.join(__dirname, 'users', 'app.js'),
+  costs: path.join(__dirname, 'costs', 'app.js'),
+  logs: path.join(__dirname, 'logs', 'app.js'),
+  admin: path.join(__dirname, 'admin', 'app.js'),
+  gateway: path.join(__dirname, 'gateway.js')
+};
+
+// Restart backoff for workers that crash shortly after starting (crash loops).
+const MIN_UPTIME_MS = 5000;
+const MAX_RESTART_DELAY_MS = 30000;
+const SHUTDOWN_TIMEOUT_MS = Number(process.env.SHUTDOWN_TIMEOUT_MS) || 10000;
+
+const cpuCount = typeof os.availableParallelism === 'function' ? os.availableParallelism() : os.cpus().length;
+
+// Number of workers for a service.
+function workerCount(name) {
+  const specific = Number(process.env[`CLUSTER_WORKERS_${name.toUpperCase()}`]);
+  const shared = Number(process.env.CLUSTER_WORKERS);
+  return specific || shared || Math.max(1, Math.floor(cpuCount / 4));
+}
+
+const workerInfo = new Map();
+const restartDelays = new Map();
+let shuttingDown = false;
+
+// Fork one worker running the given service file.
+// A shared PORT would make all four services bind the same port, so it is
+// cleared for them; each service then uses its PORT_<SERVICE> variable.
+function fork(name) {
+  cluster.setupPrimary({ exec: SERVICES[name] });
+  const worker = cluster.fork(name === 'gateway' ? {} : { PORT: '' });
+  workerInfo.set(worker.id, { name, startedAt: Date.now() });
+}
+
+// Restart crashed workers; back off exponentially while a service keeps crashing on startup.
+function onWorkerExit(worker, code, signal) {
+  const info = workerInfo.get(worker.id);
+  workerInfo.delete(worker.id);
+  if (shuttingDown || !info) return;
+
+  const uptime = Date.now() - info.startedAt;
+  const previous = restartDelays.get(info.name) || 0;
+  const delay = uptime < MIN_UPTIME_MS ? Math.min(MAX_RESTART_DELAY_MS, Math.max(1000, previous * 2)) : 0;
+  restartDelays.set(info.name, delay);
+
+  console.error(
+    `${info.name} worker ${worker.process.pid} exited (${signal || code}), restarting in ${delay}ms`
+  );
+  setTimeout(() => {
+    if (!shuttingDown) fork(info.name);
+  }, delay);
+}
+
+// Forward SIGTERM to every worker (they drain and close their own resources), then exit.
+function shutdown(signal) {
+  if (shuttingDown) return;
+  shuttingDown = true;
+  console.log(`${signal} received, stopping ${workerInfo.size} worker(s)`);
+
+  for (const worker of Object.values(cluster.workers)) {
+    worker.process.kill('SIGTERM');
+  }
+
+  const timer = setTimeout(() => {
+    console.error('Workers did not exit in time, exiting');
+    process.exit(1);
+  }, SHUTDOWN_TIMEOUT_MS);
+  timer.unref();
+
+  const waitForWorkers = setInterval(() => {
+    if (Object.keys(cluster.workers).length === 0) {
+      clearInterval(waitForWorkers);
+      process.exit(0);
+    }
+  }, 100);
+}
+
+function main() {
+  const mode = process.argv[2] === 'gateway' ? 'gateway' : 'services';
+  const names = mode === 'gateway' ? ['gateway'] : ['users', 'costs', 'logs', 'admin'];
+
+  for (const name of names) {
+    const count = workerCount(name);
+    console.log(`Starting ${count} ${name} worker(s)`);
+    for (let i = 0; i < count; i++) {
+      fork(name);
+    }
+  }
+
+  cluster.on('exit', onWorkerExit);
+  process.once('SIGTERM', () => shutdown('SIGTERM'));
+  process.once('SIGINT', () => shutdown('SIGINT'));
+}
+
+main();
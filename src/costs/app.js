@@ -1,103 +1,213 @@
 // Costs service: validates and records cost entries and provides monthly reports.
 const express = require('express');
 const dotenv = require('dotenv');
-const connectDb = require('../utils/connect_db');
+const startService = require('../utils/start_service');
+const { mountDiagnostics } = require('../utils/diagnostics');
 const { logMiddleware } = require('../utils/logger');
 const Cost = require('../models/cost_model');
 const Report = require('../models/report_model');
-const getOrCreateReport = require('../utils/get_or_create_report');
-// User model is used to validate that costs are linked to an existing user.
-const User = require('../models/user_model');
+const { TOP_ITEMS, applyCost, applyCosts, bumpVersions, removeUserTotals } = require('../utils/user_totals');
+const { validateCostInput } = require('../utils/cost_validation');
+const { bulkConfig, sendBulkResult } = require('../utils/bulk_insert');
+const { insertCost, insertCosts, removeCost, removeUserCosts } = require('../utils/cost_storage');
+const { readNdjson, isNdjsonRequest } = require('../utils/ndjson');
+const { computeReportRange } = require('../utils/report_engine');
+const { idempotency } = require('../utils/idempotency');
+const { userCacheConfig, userExists, findExistingUserIds, startUserExistenceCache } = require('../utils/user_existence');
+const { serializers, sendJson } = require('../utils/serializers');
+const { compression } = require('../utils/compression');
+const { isConditional, sendNotModified, setEtag } = require('../utils/etag');
+const { admission } = require('../utils/admission');
+const {
+  cacheConfig,
+  getReport,
+  patchReport,
+  invalidateReport,
+  reportEtag,
+  currentReportEtag,
+  startChangeStreamInvalidation
+} = require('../utils/report_cache');
+const { materializerConfig, startReportMaterializer } = require('../utils/report_materializer');
+const { FORMATS, exportConfig, streamExport } = require('../utils/cost_export');
+const { MAX_ANALYTICS_USERS, computeAnalytics } = require('../utils/analytics');
 
 dotenv.config();
 
-// Create Express application and enable JSON request body parsing.
+// Create Express application.
 const app = express();
-app.use(express.json());
 
 // Middleware: log every HTTP request as required by the project specification.
+// Mounted first, so requests rejected by admission control are logged too.
 app.use(logMiddleware);
 
+// Bulk uploads are shed first under load (before their large body is parsed).
+app.use('/api/add/bulk', admission('costs:add-bulk', 'low'));
+
+// Enable JSON request body parsing.
+// Bulk uploads get a larger JSON body limit; the default parser then skips the parsed body.
+app.use('/api/add/bulk', express.json({ limit: bulkConfig.jsonLimit }));
+app.use(express.json());
+
+// Compress large response bodies for clients that accept brotli/gzip.
+app.use(compression());
+
+// Expose runtime statistics (log sink counters, ...) at GET /internal/stats.
+mountDiagnostics(app);
+
+// Admission control per route (see admission.js): cached report reads are shed last.
+const admitAdd = admission('costs:add', 'normal');
+const admitReport = admission('costs:report', 'high');
+const admitReportRange = admission('costs:report-range', 'normal');
+const admitExport = admission('costs:export', 'low');
+const admitAnalytics = admission('costs:analytics', 'normal');
+
 /*
  Shared handler for adding a cost item.
  Supports both /api/add and /api/add/ endpoints.
 */
 const addCostHandler = async (req, res) => {
   try {
-    // Extract cost fields from request body (support both userid and user_id).
-    const { description, category, userid, user_id, sum, createdAt } = req.body;
-    const rawUserId = userid ?? user_id;
+    // Validate and normalize the request body (shared with the bulk endpoint).
+    const { value, error } = validateCostInput(req.body);
+    if (error) {
+      return res.status(400).json({ id: 400, message: error });
+    }
 
-    // Validate presence of mandatory fields before any processing.
-    if (!description || !category || rawUserId === undefined || sum === undefined) {
-      return res.status(400).json({ id: 400, message: 'Missing required fields' });
+    // Verify that the referenced user exists (known-id cache, lean exists() on a miss).
+    if (!(await userExists(value.userid))) {
+      return res.status(400).json({ id: 400, message: 'User not found' });
     }
 
-    // Convert user id and sum to numbers and validate numeric correctness.
-    const numericUserId = Number(rawUserId);
-    const numericSum = Number(sum);
+    // Persist the new cost item (a cost document or a bucket append, see cost_storage.js).
+    const costItem = await insertCost(value);
+
+    // Keep a cached report of this month in sync with the new item (before the
+    // month version moves on, so a new version never meets an outdated entry).
+    patchReport(costItem);
 
-    if (!Number.isFinite(numericUserId) || !Number.isFinite(numericSum)) {
-      return res.status(400).json({ id: 400, message: 'Invalid numeric fields' });
+    // Update the running totals. The cost is already stored, so a failure here
+    // is only logged (drift is repaired by the totals rebuild command), but the
+    // ETag versions must still move; the request fails if even that fails.
+    try {
+      await applyCost(costItem);
+    } catch (totalsErr) {
+      console.error('Failed to update running totals:', totalsErr);
+      await bumpVersions([costItem]);
     }
 
-    // Validate category against the predefined list required by the assignment.
-    const allowedCategories = ['food', 'health', 'housing', 'sports', 'education'];
-    if (!allowedCategories.includes(category)) {
-      return res.status(400).json({ id: 400, message: 'Invalid category' });
+    // Return the created cost item; the serializer writes only the public fields.
+    return sendJson(res, serializers.cost, costItem, 201);
+  } catch (err) {
+    // Catch validation or database errors and return a consistent error response.
+    console.error(err);
+    return res.status(400).json({ id: 400, message: err.message });
+  }
+};
+
+// Register add-cost endpoint (with and without trailing slash).
+// Retries with the same Idempotency-Key header receive the stored response.
+app.post('/api/add', admitAdd, idempotency('costs'), addCostHandler);
+app.post('/api/add/', admitAdd, idempotency('costs'), addCostHandler);
+
+/*
+ Validate, resolve and insert one chunk of bulk cost items.
+ Each entry is { index, value } or { index, error } (NDJSON parse failure);
+ per-item outcomes are appended to `results`.
+*/
+const ingestCostChunk = async (entries, results) => {
+  const valid = [];
+  for (const entry of entries) {
+    const { value, error } = entry.error ? entry : validateCostInput(entry.value);
+    if (error) {
+      results.push({ index: entry.index, status: 'failed', message: error });
+    } else {
+      valid.push({ index: entry.index, value });
     }
+  }
 
-    // Verify that the referenced user exists in the users collection.
-    const userExists = await User.findOne({ id: numericUserId });
-    if (!userExists) {
-      return res.status(400).json({ id: 400, message: 'User not found' });
+  // Resolve the referenced users of the chunk (cache first, one $in query for the rest).
+  const userIds = [...new Set(valid.map((v) => v.value.userid))];
+  const knownIds = await findExistingUserIds(userIds);
+
+  // Build complete documents: insertMany does not run the pre('save') hook.
+  const docs = [];
+  const positions = [];
+  for (const { index, value } of valid) {
+    if (!knownIds.has(value.userid)) {
+      results.push({ index, status: 'failed', message: 'User not found' });
+      continue;
     }
+    const createdAt = value.createdAt || new Date();
+    docs.push({ ...value, createdAt, ...Cost.deriveDateParts(createdAt) });
+    positions.push(index);
+  }
 
-    // Optional createdAt handling: validate date and ensure it is not in the past.
-    let parsedCreatedAt;
-    if (createdAt) {
-      parsedCreatedAt = new Date(createdAt);
-      if (isNaN(parsedCreatedAt.getTime())) {
-        return res.status(400).json({ id: 400, message: 'Invalid createdAt' });
-      }
+  const { inserted, failures } = await insertCosts(docs);
+  docs.forEach((doc, i) => {
+    results.push(failures.has(i)
+      ? { index: positions[i], status: 'failed', message: failures.get(i).errmsg || 'Insert failed' }
+      : { index: positions[i], status: 'created' });
+  });
 
-      const today = new Date();
-      today.setHours(0, 0, 0, 0);
+  // Update cached reports and running totals for the inserted items.
+  inserted.forEach(patchReport);
+  try {
+    await applyCosts(inserted);
+  } catch (totalsErr) {
+    console.error('Failed to update running totals:', totalsErr);
+    await bumpVersions(inserted);
+  }
+};
 
-      if (parsedCreatedAt < today) {
-        return res.status(400).json({ id: 400, message: 'Cannot add cost in the past' });
+/*
+ Shared handler for bulk cost ingestion.
+ Accepts a JSON array or an NDJSON stream (Content-Type: application/x-ndjson)
+ of cost items and responds with a per-item result (201 all created, 207 partial).
+*/
+const addCostsBulkHandler = async (req, res) => {
+  try {
+    let source;
+    if (isNdjsonRequest(req)) {
+      source = readNdjson(req);
+    } else if (Array.isArray(req.body)) {
+      if (req.body.length > bulkConfig.maxItems) {
+        return res.status(413).json({ id: 413, message: `Bulk requests are limited to ${bulkConfig.maxItems} items` });
       }
+      source = req.body.map((value) => ({ value }));
+    } else {
+      return res.status(400).json({ id: 400, message: 'Expected a JSON array or an NDJSON body' });
     }
 
-    // Persist the new cost item in the database.
-    const costItem = await Cost.create({
-      description,
-      category,
-      userid: numericUserId,
-      sum: numericSum,
-      ...(parsedCreatedAt ? { createdAt: parsedCreatedAt } : {})
-    });
+    const results = [];
+    let chunk = [];
+    let index = 0;
 
-    // Return the created cost item while removing MongoDB internal fields.
-    return res.status(201).json(
-      costItem.toObject({
-        versionKey: false,
-        transform: function (doc, ret) {
-          delete ret._id;
-          return ret;
-        }
-      })
-    );
+    for await (const entry of source) {
+      // NDJSON streams are cut off at the item limit.
+      if (index >= bulkConfig.maxItems) {
+        results.push({ index, status: 'failed', message: `Item limit of ${bulkConfig.maxItems} exceeded` });
+        break;
+      }
+      chunk.push({ index: index++, ...entry });
+
+      if (chunk.length >= bulkConfig.chunkSize) {
+        await ingestCostChunk(chunk, results);
+        chunk = [];
+      }
+    }
+    await ingestCostChunk(chunk, results);
+
+    results.sort((a, b) => a.index - b.index);
+    return sendBulkResult(res, results);
   } catch (err) {
-    // Catch validation or database errors and return a consistent error response.
     console.error(err);
     return res.status(400).json({ id: 400, message: err.message });
   }
 };
 
-// Register add-cost endpoint (with and without trailing slash).
-app.post('/api/add', addCostHandler);
-app.post('/api/add/', addCostHandler);
+// Register bulk add-cost endpoint (with and without trailing slash).
+app.post('/api/add/bulk', addCostsBulkHandler);
+app.post('/api/add/bulk/', addCostsBulkHandler);
 
 /*
  Shared handler for generating or retrieving a monthly cost report.
@@ -117,16 +227,20 @@ const reportHandler = async (req, res) => {
       return res.status(400).json({ id: 400, message: 'Invalid query parameters' });
     }
 
-    // Retrieve cached report or compute a new one if it does not exist.
-    const report = await getOrCreateReport(userId, numericYear, numericMonth);
+    // A matching If-None-Match is answered from the validator alone (no report computation).
+    if (isConditional(req)) {
+      const etag = await currentReportEtag(userId, numericYear, numericMonth);
+      if (sendNotModified(req, res, etag, 'report')) {
+        return res;
+      }
+    }
 
-    // Return report data in the format required by the assignment.
-    return res.json({
-      userid: report.userid,
-      year: report.year,
-      month: report.month,
-      costs: report.costs
-    });
+    // Serve from the in-process cache, or retrieve/compute the report on a miss.
+    const report = await getReport(userId, numericYear, numericMonth);
+    setEtag(res, reportEtag(report));
+
+    // Return report data in the format required by the assignment (userid, year, month, costs).
+    return sendJson(res, serializers.report, report);
   } catch (err) {
     // Handle report computation or database errors.
     console.error(err);
@@ -135,13 +249,172 @@ const reportHandler = async (req, res) => {
 };
 
 // Register report endpoints (with and without trailing slash).
-app.get('/api/report', reportHandler);
-app.get('/api/report/', reportHandler);
+app.get('/api/report', admitReport, reportHandler);
+app.get('/api/report/', admitReport, reportHandler);
+
+// Parse a "YYYY-MM" query value into { year, month } (null when invalid).
+const parseMonthParam = (value) => {
+  const match = /^(\d{4})-(\d{1,2})$/.exec(String(value || ''));
+  if (!match) return null;
+  const year = Number(match[1]);
+  const month = Number(match[2]);
+  return month >= 1 && month <= 12 ? { year, month } : null;
+};
+
+/*
+ Parse a month range from ?from=YYYY-MM&to=YYYY-MM or a year-to-date ?year=YYYY
+ (January up to the current month, or December for past years).
+ Returns { range } or { error } with a client-facing message.
+*/
+const parseRangeQuery = ({ from, to, year }) => {
+  if (year !== undefined) {
+    const numericYear = Number(year);
+    if (!Number.isInteger(numericYear)) {
+      return { error: 'Invalid year' };
+    }
+    const now = new Date();
+    const lastMonth = numericYear === now.getFullYear() ? now.getMonth() + 1 : 12;
+    return { range: { from: { year: numericYear, month: 1 }, to: { year: numericYear, month: lastMonth } } };
+  }
+  const range = { from: parseMonthParam(from), to: parseMonthParam(to) };
+  if (!range.from || !range.to) {
+    return { error: 'Invalid range, expected from=YYYY-MM&to=YYYY-MM' };
+  }
+  return { range };
+};
+
+/*
+ Shared handler for multi-month reports computed in a single aggregation.
+ Supports either ?id=&from=YYYY-MM&to=YYYY-MM or a year-to-date range ?id=&year=YYYY.
+*/
+const reportRangeHandler = async (req, res) => {
+  try {
+    const { id, user_id } = req.query;
+    const userId = Number(user_id || id);
+
+    if (!Number.isFinite(userId)) {
+      return res.status(400).json({ id: 400, message: 'Invalid query parameters' });
+    }
+
+    const { range, error } = parseRangeQuery(req.query);
+    if (error) {
+      return res.status(400).json({ id: 400, message: error });
+    }
+
+    const reports = await computeReportRange(userId, range.from, range.to);
+    return sendJson(res, serializers.reports, reports);
+  } catch (err) {
+    console.error(err);
+    return res.status(400).json({ id: 400, message: err.message });
+  }
+};
+
+// Register range report endpoints (with and without trailing slash).
+app.get('/api/report/range', admitReportRange, reportRangeHandler);
+app.get('/api/report/range/', admitReportRange, reportRangeHandler);
+
+/*
+ Shared handler for spending analytics served from the monthly rollups.
+ Parameters: id (one user) or ids=1,2,3 (up to MAX_ANALYTICS_USERS), a range
+ (from=YYYY-MM&to=YYYY-MM or year=YYYY) and optionally top (number of largest expenses).
+*/
+const analyticsHandler = async (req, res) => {
+  try {
+    const raw = req.query.ids !== undefined ? String(req.query.ids) : String(req.query.user_id || req.query.id || '');
+    const userIds = [...new Set(raw.split(',').map((v) => v.trim()).filter(Boolean).map(Number))];
+    if (userIds.length === 0 || userIds.some((v) => !Number.isFinite(v))) {
+      return res.status(400).json({ id: 400, message: 'Invalid ids' });
+    }
+    if (userIds.length > MAX_ANALYTICS_USERS) {
+      return res.status(400).json({ id: 400, message: `At most ${MAX_ANALYTICS_USERS} ids are allowed` });
+    }
+
+    const { range, error } = parseRangeQuery(req.query);
+    if (error) {
+      return res.status(400).json({ id: 400, message: error });
+    }
+
+    const top = req.query.top === undefined ? TOP_ITEMS : Number(req.query.top);
+    if (!Number.isInteger(top) || top < 0 || top > TOP_ITEMS) {
+      return res.status(400).json({ id: 400, message: `Invalid top, expected 0-${TOP_ITEMS}` });
+    }
+
+    const analytics = await computeAnalytics(userIds, range.from, range.to, top);
+    return sendJson(res, serializers.analytics, analytics);
+  } catch (err) {
+    console.error(err);
+    return res.status(400).json({ id: 400, message: err.message });
+  }
+};
+
+// Register analytics endpoints (with and without trailing slash).
+app.get('/api/analytics', admitAnalytics, analyticsHandler);
+app.get('/api/analytics/', admitAnalytics, analyticsHandler);
+
+/*
+ Shared handler for exporting cost items as a download.
+ Parameters (all optional): id (one user, all users when omitted),
+ from/to (ISO dates, createdAt range [from, to)), format (csv or ndjson, default csv).
+ The body is gzip-compressed when the client accepts it (Accept-Encoding: gzip).
+*/
+const exportHandler = (req, res) => {
+  try {
+    const { id, user_id, from, to } = req.query;
+    const format = req.query.format || 'csv';
+    if (!FORMATS.includes(format)) {
+      return res.status(400).json({ id: 400, message: `Invalid format, expected ${FORMATS.join(' or ')}` });
+    }
+
+    const options = { format };
+    if (id !== undefined || user_id !== undefined) {
+      options.userId = Number(user_id || id);
+      if (!Number.isFinite(options.userId)) {
+        return res.status(400).json({ id: 400, message: 'Invalid id' });
+      }
+    }
+    for (const [name, value] of [['from', from], ['to', to]]) {
+      if (value !== undefined) {
+        options[name] = new Date(value);
+        if (isNaN(options[name].getTime())) {
+          return res.status(400).json({ id: 400, message: `Invalid ${name}` });
+        }
+      }
+    }
+
+    options.filename = `costs-${options.userId === undefined ? 'all' : options.userId}.${format}`;
+    options.gzip = exportConfig.gzip && req.acceptsEncodings('gzip', 'identity') === 'gzip';
+    return streamExport(res, options);
+  } catch (err) {
+    console.error(err);
+    return res.status(400).json({ id: 400, message: err.message });
+  }
+};
+
+// Register export endpoints (with and without trailing slash).
+app.get('/api/export', admitExport, exportHandler);
+app.get('/api/export/', admitExport, exportHandler);
 
 // Test-only cleanup endpoints used by automated tests.
 if (process.env.NODE_ENV === 'test') {
   app.delete('/removecost', async (req, res) => {
-    await Cost.deleteOne({ _id: req.body._id });
+    const removed = await removeCost(req.body._id);
+    // Keep the running totals consistent with the removed cost item.
+    if (removed) {
+      await applyCost(removed, -1);
+      invalidateReport(removed.userid, removed.year, removed.month);
+    }
+    res.json({ status: 'success' });
+  });
+
+  // Remove every cost item, running total and persisted report of a user (benchmark teardown).
+  app.delete('/removeusercosts', async (req, res) => {
+    const userId = Number(req.body.user_id);
+    const [months] = await Promise.all([
+      removeUserTotals(userId),
+      removeUserCosts(userId),
+      Report.deleteMany({ userid: userId })
+    ]);
+    months.forEach(({ year, month }) => invalidateReport(userId, year, month));
     res.json({ status: 'success' });
   });
 
@@ -151,14 +424,35 @@ if (process.env.NODE_ENV === 'test') {
       year: Number(req.body.year),
       month: Number(req.body.month)
     });
+    invalidateReport(Number(req.body.user_id), Number(req.body.year), Number(req.body.month));
     res.json({ status: 'success' });
   });
 }
 
+// Background tasks started once the database connection is ready.
+const onReady = () => {
+  // Keep report caches of several instances coherent (optional, needs a replica set).
+  if (cacheConfig.enabled && cacheConfig.changeStream) {
+    startChangeStreamInvalidation();
+  }
+
+  // Warm the known user ids used to validate new cost items.
+  if (userCacheConfig.enabled) {
+    startUserExistenceCache();
+  }
+
+  // Precompute the reports of the previous month after rollover (optional).
+  if (materializerConfig.enabled) {
+    startReportMaterializer();
+  }
+};
+
 // Select port from environment variables with a fallback for local development.
 const PORT = process.env.PORT || process.env.PORT_COSTS || 3002;
 
-// Connect to MongoDB and start the service only after successful connection.
-connectDb().then(() => {
-  app.listen(PORT, () => console.log(`Costs Service running on port ${PORT}`));
-});
+// Start the service when run directly (not when mounted by the gateway or a test).
+if (require.main === module) {
+  startService({ name: 'Costs Service', key: 'costs', app, port: PORT, onReady });
+}
+
+module.exports = { app, onReady };
@@ -0,0 +1,51 @@
+// Gateway: runs all four services in one process behind one port (small deployments).
+const express = require('express');
+const dotenv = require('dotenv');
+const startService = require('./utils/start_service');
+const { mountHealthChecks } = require('./utils/diagnostics');
+const users = require('./users/app');
+const costs = require('./costs/app');
+const logs = require('./logs/app');
+const admin = require('./admin/app');
+
+dotenv.config();
+
+/*
+ * Combined Mode
+ *
+ * The four Express applications are mounted as sub-applications under a path
+ * prefix, so they share one event loop and one MongoDB connection pool:
+ *   /users/api/...  /costs/api/...  /logs/api/...  /admin/api/...
+ * Each sub-application keeps its own middleware (JSON parsing, request logging).
+ * The regular four-process deployment is unchanged.
+ */
+const services = [
+  { prefix: '/users', ...users },
+  { prefix: '/costs', ...costs },
+  { prefix: '/logs', ...logs },
+  { prefix: '/admin', ...admin }
+];
+
+const gateway = express();
+// Load balancer probes for the combined process (each service also has /<prefix>/readyz).
+mountHealthChecks(gateway);
+for (const { prefix, app } of services) {
+  gateway.use(prefix, app);
+}
+
+// Start background tasks of every mounted service once the database is ready.
+const onReady = () => {
+  for (const service of services) {
+    if (service.onReady) {
+      service.onReady();
+    }
+  }
+};
+
+const PORT = process.env.PORT || process.env.PORT_GATEWAY || 3000;
+
+if (require.main === module) {
+  startService({ name: 'Gateway', key: 'gateway', app: gateway, port: PORT, onReady });
+}
+
+module.exports = { app: gateway, onReady };
@@ -1,9 +1,19 @@
 // Logs service: exposes stored HTTP request logs for diagnostics and monitoring.
 const express = require('express');
+const mongoose = require('mongoose');
 const dotenv = require('dotenv');
-const connectDb = require('../utils/connect_db');
+const startService = require('../utils/start_service');
+const { mountDiagnostics } = require('../utils/diagnostics');
 const Log = require('../models/log_model');
+const LogRollup = require('../models/log_rollup_model');
+const logStorage = require('../utils/log_storage');
+const { startLogRollup } = require('../utils/log_rollup');
 const { logMiddleware } = require('../utils/logger');
+const { compression } = require('../utils/compression');
+const { admission } = require('../utils/admission');
+const { parseLimit, encodeCursor, decodeCursor } = require('../utils/pagination');
+const { streamNdjson } = require('../utils/ndjson');
+const { serializers, sendJson } = require('../utils/serializers');
 
 dotenv.config();
 
@@ -11,26 +21,176 @@ dotenv.config();
 const app = express();
 app.use(express.json());
 
+// Compress large response bodies (log listings) for clients that accept brotli/gzip.
+app.use(compression());
+
 // Middleware: log every incoming HTTP request to the logs collection.
 app.use(logMiddleware);
 
-// Endpoint: retrieve all stored logs for inspection or debugging purposes.
-app.get('/api/logs', async (req, res) => {
+// Expose runtime statistics (log sink counters, ...) at GET /internal/stats.
+mountDiagnostics(app);
+
+// Page size limits for GET /api/logs.
+const DEFAULT_PAGE_SIZE = 100;
+const MAX_PAGE_SIZE = 1000;
+
+// Fields returned to clients (MongoDB internal fields are excluded).
+const LOG_FIELDS = 'level time msg pid hostname statusCode responseTimeMs';
+
+/*
+ Build the MongoDB filter from query parameters.
+ Supported filters: from/to (time range), statusCode, minResponseTimeMs, hostname, pid.
+ Returns { filter } or { error } with a client-facing message.
+*/
+const buildLogFilter = (query) => {
+  const filter = {};
+
+  if (query.from !== undefined || query.to !== undefined) {
+    filter.time = {};
+    if (query.from !== undefined) {
+      const from = new Date(query.from);
+      if (isNaN(from.getTime())) return { error: 'Invalid from' };
+      filter.time.$gte = from;
+    }
+    if (query.to !== undefined) {
+      const to = new Date(query.to);
+      if (isNaN(to.getTime())) return { error: 'Invalid to' };
+      filter.time.$lt = to;
+    }
+  }
+
+  // Numeric equality / minimum filters.
+  const numeric = [
+    ['statusCode', 'statusCode', (v) => v],
+    ['pid', 'pid', (v) => v],
+    ['minResponseTimeMs', 'responseTimeMs', (v) => ({ $gte: v })]
+  ];
+  for (const [param, field, toCondition] of numeric) {
+    if (query[param] !== undefined) {
+      const value = Number(query[param]);
+      if (!Number.isFinite(value)) return { error: `Invalid ${param}` };
+      filter[field] = toCondition(value);
+    }
+  }
+
+  if (query.hostname !== undefined) {
+    filter.hostname = String(query.hostname);
+  }
+
+  // Keyset cursor: continue strictly after the last (time, _id) of the previous page.
+  if (query.cursor !== undefined) {
+    const cursor = decodeCursor(query.cursor);
+    const time = cursor && new Date(cursor.t);
+    if (!cursor || isNaN(time.getTime()) || !mongoose.isValidObjectId(cursor.id)) {
+      return { error: 'Invalid cursor' };
+    }
+    const id = new mongoose.Types.ObjectId(cursor.id);
+    filter.$or = [{ time: { $lt: time } }, { time, _id: { $lt: id } }];
+  }
+
+  return { filter };
+};
+
+/*
+ Endpoint: retrieve stored logs, newest first.
+ - JSON (default): one page as an array; X-Next-Cursor header holds the next page cursor.
+ - NDJSON (?format=ndjson): streams every matching log at constant memory.
+*/
+app.get('/api/logs', admission('logs:list', 'low'), async (req, res) => {
   try {
-    // Query all log entries and exclude MongoDB internal fields.
-    const logs = await Log.find({}).select('-_id -__v');
-    res.json(logs);
+    const { filter, error } = buildLogFilter(req.query);
+    if (error) {
+      return res.status(400).json({ id: 400, message: error });
+    }
+
+    const sort = { time: -1, _id: -1 };
+
+    if (req.query.format === 'ndjson') {
+      const cursor = Log.find(filter).select(LOG_FIELDS).sort(sort).lean().cursor();
+      return streamNdjson(res, cursor, serializers.log);
+    }
+
+    const limit = parseLimit(req.query.limit, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE);
+    if (limit === null) {
+      return res.status(400).json({ id: 400, message: 'Invalid limit' });
+    }
+
+    // Fetch one extra row to know whether another page exists.
+    const rows = await Log.find(filter).select(LOG_FIELDS).sort(sort).limit(limit + 1).lean();
+    const page = rows.slice(0, limit);
+
+    if (rows.length > limit) {
+      const last = page[page.length - 1];
+      res.set('X-Next-Cursor', encodeCursor({ t: last.time.toISOString(), id: String(last._id) }));
+    }
+
+    // The serializer writes only the public log fields (no _id / __v).
+    return sendJson(res, serializers.logs, page);
   } catch (err) {
     // Handle database or query errors and return a server error response.
     console.error(err);
-    res.status(500).json({ id: 500, message: err.message });
+    return res.status(500).json({ id: 500, message: err.message });
   }
 });
 
+// Page size limits for GET /api/logs/rollups (one document per minute and route).
+const DEFAULT_ROLLUP_LIMIT = 60;
+const MAX_ROLLUP_LIMIT = 10000;
+
+/*
+ Endpoint: per-minute request aggregates (count, p50/p95/p99 latency, status histogram).
+ Optional filters: from/to (ISO dates), route, method, limit. Newest minutes first.
+*/
+app.get('/api/logs/rollups', admission('logs:rollups', 'low'), async (req, res) => {
+  try {
+    const filter = {};
+
+    if (req.query.from !== undefined || req.query.to !== undefined) {
+      filter.minute = {};
+      for (const [param, op] of [['from', '$gte'], ['to', '$lt']]) {
+        if (req.query[param] !== undefined) {
+          const date = new Date(req.query[param]);
+          if (isNaN(date.getTime())) {
+            return res.status(400).json({ id: 400, message: `Invalid ${param}` });
+          }
+          filter.minute[op] = date;
+        }
+      }
+    }
+    if (req.query.route !== undefined) filter.route = String(req.query.route);
+    if (req.query.method !== undefined) filter.method = String(req.query.method).toUpperCase();
+
+    const limit = parseLimit(req.query.limit, DEFAULT_ROLLUP_LIMIT, MAX_ROLLUP_LIMIT);
+    if (limit === null) {
+      return res.status(400).json({ id: 400, message: 'Invalid limit' });
+    }
+
+    const rollups = await LogRollup.find(filter)
+      .select('-_id')
+      .sort({ minute: -1 })
+      .limit(limit)
+      .lean();
+    return res.json(rollups);
+  } catch (err) {
+    console.error(err);
+    return res.status(500).json({ id: 500, message: err.message });
+  }
+});
+
+// Background tasks started once the database connection is ready.
+const onReady = () => {
+  // Compact old raw entries into per-minute rollups in the background (optional).
+  if (logStorage.rollup.enabled) {
+    startLogRollup();
+  }
+};
+
 // Select port from environment variables with a fallback for local execution.
 const PORT = process.env.PORT || process.env.PORT_LOGS || 3003;
 
-// Connect to MongoDB and start the service only after a successful connection.
-connectDb().then(() => {
-  app.listen(PORT, () => console.log(`Logs Service running on port ${PORT}`));
-});
+// Start the service when run directly (not when mounted by the gateway or a test).
+if (require.main === module) {
+  startService({ name: 'Logs Service', key: 'logs', app, port: PORT, onReady });
+}
+
+module.exports = { app, onReady };
@@ -0,0 +1,22 @@
+// Checkpoint model: progress markers of background jobs ("checkpoints" collection).
+const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+
+/*
+ * Background jobs store how far they got, so a restarted process resumes
+ * where the previous run stopped instead of starting over.
+ */
+const checkpointSchema = new mongoose.Schema({
+  // Unique job name (e.g. "log-rollup").
+  job: { type: String, required: true, unique: true },
+
+  // Job-specific progress value (a date, an id, ...).
+  value: { type: mongoose.Schema.Types.Mixed },
+
+  updatedAt: { type: Date, default: Date.now }
+}, { versionKey: false });
+
+// Record query durations in the metrics registry.
+checkpointSchema.plugin(queryMetrics);
+
+module.exports = mongoose.model('Checkpoint', checkpointSchema);
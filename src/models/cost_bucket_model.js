@@ -0,0 +1,52 @@
+// Cost bucket model: cost items of one user-month stored together ("cost_buckets" collection).
+const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+const CATEGORIES = require('../utils/categories');
+
+/*
+ * CostBucket Model (Bucket Pattern, COST_STORAGE_MODE=buckets)
+ *
+ * Instead of one document per cost item, items are appended to a bucket of
+ * their (userid, year, month). A bucket holds at most COST_BUCKET_SIZE items;
+ * further items overflow into a new bucket of the same month. Every bucket
+ * keeps running sums of its items, so monthly reports and totals read one
+ * (or a few) documents instead of one document per item.
+ * Buckets are written with $push/$inc only (see utils/cost_storage.js).
+ */
+const itemSchema = new mongoose.Schema({
+  // Item id (the former cost document id after a migration).
+  _id: { type: mongoose.Schema.Types.ObjectId },
+  description: { type: String, required: true },
+  category: { type: String, enum: CATEGORIES, required: true },
+  sum: { type: Number, required: true, min: 0 },
+  createdAt: { type: Date },
+  day: { type: Number }
+});
+
+const categoryTotals = Object.fromEntries(
+  CATEGORIES.map((cat) => [cat, {
+    total: { type: Number },
+    count: { type: Number }
+  }])
+);
+
+const costBucketSchema = new mongoose.Schema({
+  userid: { type: Number, required: true },
+  year: { type: Number, required: true },
+  month: { type: Number, required: true },
+
+  // Number and sum of the items in this bucket, plus per-category sums.
+  count: { type: Number, default: 0 },
+  total: { type: Number, default: 0 },
+  categories: categoryTotals,
+
+  items: [itemSchema]
+}, { versionKey: false });
+
+// Buckets of a user-month (reports, appends to a bucket with free space) and user totals.
+costBucketSchema.index({ userid: 1, year: 1, month: 1, count: 1 });
+
+// Record query durations in the metrics registry.
+costBucketSchema.plugin(queryMetrics);
+
+module.exports = mongoose.model('CostBucket', costBucketSchema);
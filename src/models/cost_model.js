@@ -1,5 +1,6 @@
 // Cost model: represents a single cost item stored in the "costs" collection.
 const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
 
 /*
  * Cost Schema (Project Requirements)
@@ -13,12 +14,12 @@ const mongoose = require('mongoose');
  * - year/month/day: derived from createdAt for monthly reporting
  */
 const costSchema = new mongoose.Schema({
-  userid: { type: Number, required: true, index: true },
+  userid: { type: Number, required: true },
 
-  createdAt: { type: Date, default: Date.now, index: true },
+  createdAt: { type: Date, default: Date.now },
 
-  year: { type: Number, index: true },
-  month: { type: Number, index: true },
+  year: { type: Number },
+  month: { type: Number },
   day: { type: Number },
 
   description: { type: String, required: true },
@@ -33,13 +34,29 @@ const costSchema = new mongoose.Schema({
   sum: { type: Number, required: true, min: 0 }
 });
 
+/*
+ One compound index serves every cost query of the services:
+ - report and range queries: { userid, year, month } (prefix)
+ - user totals: { userid } with $sum of "sum", answered from the index alone (covered)
+ Run `npm run db:audit` to check the query plans (and `-- --sync-indexes` to drop
+ the former single-field indexes of an existing database).
+*/
+costSchema.index({ userid: 1, year: 1, month: 1, category: 1, sum: 1 });
+
+// Derive the reporting fields year/month/day from a createdAt date.
+costSchema.statics.deriveDateParts = function (createdAt) {
+  const d = new Date(createdAt);
+  return { year: d.getFullYear(), month: d.getMonth() + 1, day: d.getDate() };
+};
+
 // Pre-save hook: derive year/month/day from createdAt for report generation.
+// Bulk inserts (insertMany) bypass this hook and call deriveDateParts directly.
 costSchema.pre('save', function (next) {
-  const d = new Date(this.createdAt);
-  this.year = d.getFullYear();
-  this.month = d.getMonth() + 1;
-  this.day = d.getDate();
+  Object.assign(this, this.constructor.deriveDateParts(this.createdAt));
   next();
 });
 
+// Record query durations in the metrics registry.
+costSchema.plugin(queryMetrics);
+
 module.exports = mongoose.model('Cost', costSchema);
@@ -0,0 +1,34 @@
+// Idempotency key model: stored responses of POST requests sent with an Idempotency-Key header.
+const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+
+/*
+ * One document per (service, key). While the first request runs the document
+ * is "pending"; afterwards it holds the response that retries receive.
+ * MongoDB removes documents IDEMPOTENCY_TTL_SECONDS after they were created.
+ */
+const TTL_SECONDS = Number(process.env.IDEMPOTENCY_TTL_SECONDS) || 24 * 60 * 60;
+
+const idempotencyKeySchema = new mongoose.Schema({
+  // "<scope>:<Idempotency-Key header>", e.g. "costs:6f1c...".
+  _id: { type: String },
+
+  // Hash of the request body; a key reused with another body is rejected.
+  fingerprint: { type: String, required: true },
+
+  status: { type: String, enum: ['pending', 'done'], required: true },
+
+  // When the request holding the key started (abandoned pending keys can be taken over).
+  lockedAt: { type: Date, required: true },
+
+  // Stored response of a completed request.
+  statusCode: { type: Number },
+  body: { type: String },
+
+  createdAt: { type: Date, default: Date.now, expires: TTL_SECONDS }
+}, { versionKey: false });
+
+// Record query durations in the metrics registry.
+idempotencyKeySchema.plugin(queryMetrics);
+
+module.exports = mongoose.model('IdempotencyKey', idempotencyKeySchema);
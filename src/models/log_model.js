@@ -6,6 +6,18 @@
  * long-term analysis, debugging, and monitoring in production environments.
  */
 const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+const logStorage = require('../utils/log_storage');
+
+// Capped mode: the collection is created with a fixed size and keeps only the newest entries.
+const storageOptions = logStorage.mode === 'capped'
+  ? {
+      capped: {
+        size: logStorage.cappedSizeBytes,
+        ...(logStorage.cappedMaxDocs ? { max: logStorage.cappedMaxDocs } : {})
+      }
+    }
+  : {};
 
 // Define schema for log entries stored by the logging middleware.
 const logSchema = new mongoose.Schema({
@@ -24,8 +36,29 @@ const logSchema = new mongoose.Schema({
 
   // Optional HTTP-related metadata for request/response diagnostics.
   statusCode: { type: Number },
-  responseTimeMs: { type: Number }
-});
+  responseTimeMs: { type: Number },
+
+  // HTTP method and matched route pattern (e.g. /api/users/:id), used by the rollup job.
+  method: { type: String },
+  route: { type: String }
+}, storageOptions);
+
+/*
+ * Indexes for GET /api/logs (newest first, keyset pagination on time/_id).
+ * Equality filters come first, followed by the sort keys, so filtered pages
+ * are served by an index range scan without an in-memory sort.
+ */
+logSchema.index({ time: -1, _id: -1 });
+logSchema.index({ statusCode: 1, time: -1, _id: -1 });
+logSchema.index({ hostname: 1, pid: 1, time: -1, _id: -1 });
+
+// Optional retention: MongoDB removes raw entries older than LOG_TTL_DAYS.
+if (logStorage.ttlDays > 0) {
+  logSchema.index({ time: 1 }, { expireAfterSeconds: Math.round(logStorage.ttlDays * 24 * 60 * 60) });
+}
+
+// Record query durations in the metrics registry.
+logSchema.plugin(queryMetrics);
 
 // Export Log model for use by the logging middleware and logs service.
 module.exports = mongoose.model('Log', logSchema);
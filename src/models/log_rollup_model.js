@@ -0,0 +1,39 @@
+// Log rollup model: per-minute request aggregates compacted from raw log entries.
+const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+
+/*
+ * LogRollup Model
+ *
+ * One document per (minute, method, route) with the request count,
+ * responseTimeMs percentiles and a status-code histogram.
+ * Rollups are small and bounded per minute, so long-range latency history
+ * stays queryable after raw entries expire or are compacted.
+ */
+const logRollupSchema = new mongoose.Schema({
+  // Start of the minute bucket.
+  minute: { type: Date, required: true },
+
+  method: { type: String, required: true },
+  route: { type: String, required: true },
+
+  count: { type: Number, required: true },
+
+  // responseTimeMs statistics of the minute.
+  p50: { type: Number },
+  p95: { type: Number },
+  p99: { type: Number },
+  max: { type: Number },
+
+  // Status code -> number of responses (e.g. { "200": 10, "404": 1 }).
+  statusCodes: { type: Map, of: Number }
+}, { versionKey: false });
+
+// One rollup per minute and route; the second index serves per-route history queries.
+logRollupSchema.index({ minute: 1, method: 1, route: 1 }, { unique: true });
+logRollupSchema.index({ route: 1, minute: -1 });
+
+// Record query durations in the metrics registry.
+logRollupSchema.plugin(queryMetrics);
+
+module.exports = mongoose.model('LogRollup', logRollupSchema);
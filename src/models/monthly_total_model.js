@@ -0,0 +1,58 @@
+// Monthly total model: running cost sums per user, month and category ("monthly_totals" collection).
+const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+const CATEGORIES = require('../utils/categories');
+
+/*
+ * MonthlyTotal Model
+ *
+ * One document per (userid, year, month) holding the overall sum and count
+ * of the month plus a { total, count } pair for every category, and the
+ * largest items of the month (analytics top-N).
+ * Updated atomically with $inc on every cost insert, rebuildable from "costs".
+ */
+const categoryTotals = Object.fromEntries(
+  CATEGORIES.map((cat) => [cat, {
+    total: { type: Number },
+    count: { type: Number }
+  }])
+);
+
+// One of the largest items of the month (its _id is the cost item id).
+const topItemSchema = new mongoose.Schema({
+  _id: { type: mongoose.Schema.Types.ObjectId },
+  sum: { type: Number },
+  description: { type: String },
+  category: { type: String },
+  day: { type: Number }
+});
+
+const monthlyTotalSchema = new mongoose.Schema({
+  userid: { type: Number, required: true },
+  year: { type: Number, required: true },
+  month: { type: Number, required: true },
+
+  // Totals of the whole month.
+  total: { type: Number, default: 0 },
+  count: { type: Number, default: 0 },
+
+  // Incremented on every change of the month (ETag validator of current-month reports).
+  version: { type: Number, default: 0 },
+
+  // Per-category totals of the month.
+  categories: categoryTotals,
+
+  // The ROLLUP_TOP_ITEMS largest items of the month, sum descending.
+  top: [topItemSchema]
+}, { versionKey: false });
+
+// One document per user-month; also serves range queries for a single user.
+monthlyTotalSchema.index({ userid: 1, year: 1, month: 1 }, { unique: true });
+
+// Users of a month in userid order (report materializer pages).
+monthlyTotalSchema.index({ year: 1, month: 1, userid: 1 });
+
+// Record query durations in the metrics registry.
+monthlyTotalSchema.plugin(queryMetrics);
+
+module.exports = mongoose.model('MonthlyTotal', monthlyTotalSchema);
@@ -1,5 +1,6 @@
 // Report model: stores aggregated monthly cost reports per user.
 const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
 
 /*
  * Report Model
@@ -12,20 +13,24 @@ const mongoose = require('mongoose');
 // Define schema for monthly report documents.
 const reportSchema = new mongoose.Schema({
   // Logical user identifier the report belongs to.
-  userid: { type: Number, required: true, index: true },
+  userid: { type: Number, required: true },
 
   // Year of the report (e.g., 2024).
-  year: { type: Number, required: true, index: true },
+  year: { type: Number, required: true },
 
   // Month of the report (1–12).
-  month: { type: Number, required: true, index: true },
+  month: { type: Number, required: true },
 
   // Array of cost objects grouped by category, following the required JSON format.
   costs: { type: Array, required: true }
 });
 
 // Prevent duplicate reports for the same user, year, and month.
+// The unique index also serves every report lookup (single-field indexes would be redundant).
 reportSchema.index({ userid: 1, year: 1, month: 1 }, { unique: true });
 
+// Record query durations in the metrics registry.
+reportSchema.plugin(queryMetrics);
+
 // Export Report model for use in report computation and retrieval.
 module.exports = mongoose.model('Report', reportSchema);
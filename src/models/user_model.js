@@ -1,4 +1,5 @@
 const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
 
 /*
  * User Model
@@ -40,4 +41,7 @@ const userSchema = new mongoose.Schema({
   }
 });
 
+// Record query durations in the metrics registry.
+userSchema.plugin(queryMetrics);
+
 module.exports = mongoose.model('User', userSchema);
@@ -0,0 +1,30 @@
+// User total model: running sum of all cost items per user ("user_totals" collection).
+const mongoose = require('mongoose');
+const queryMetrics = require('../utils/query_metrics');
+
+/*
+ * UserTotal Model
+ *
+ * Maintained incrementally whenever a cost item is inserted, so the
+ * user-details endpoint can answer with a single indexed point read instead
+ * of loading every cost document of the user.
+ * The collection can always be rebuilt from "costs" (see src/scripts/rebuild_user_totals.js).
+ */
+const userTotalSchema = new mongoose.Schema({
+  // Logical user identifier (matches users.id and costs.userid).
+  userid: { type: Number, required: true, unique: true },
+
+  // Sum of all cost items of the user.
+  total: { type: Number, default: 0 },
+
+  // Number of cost items included in the total.
+  count: { type: Number, default: 0 },
+
+  // Incremented on every change of the total (ETag validator of GET /api/users/:id).
+  version: { type: Number, default: 0 }
+}, { versionKey: false });
+
+// Record query durations in the metrics registry.
+userTotalSchema.plugin(queryMetrics);
+
+module.exports = mongoose.model('UserTotal', userTotalSchema);
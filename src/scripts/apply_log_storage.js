@@ -0,0 +1,49 @@
+// Maintenance script: applies the configured log storage policy to an existing database.
+const mongoose = require('mongoose');
+const connectDb = require('../utils/connect_db');
+const Log = require('../models/log_model');
+const LogRollup = require('../models/log_rollup_model');
+const logStorage = require('../utils/log_storage');
+const { runLogRollup } = require('../utils/log_rollup');
+
+/*
+ * Mongoose creates new collections with the configured options, but it does not
+ * change collections that already exist. This script:
+ * - converts an existing "logs" collection to capped (LOG_STORAGE_MODE=capped),
+ * - synchronizes indexes (creates/updates/drops the TTL index on "time"),
+ * - with --rollup, runs the per-minute rollup job once.
+ *
+ * Usage: node src/scripts/apply_log_storage.js [--rollup]
+ */
+async function main() {
+  await connectDb();
+  const db = mongoose.connection.db;
+
+  if (logStorage.mode === 'capped') {
+    const [info] = await db.listCollections({ name: Log.collection.name }).toArray();
+    const stats = info ? await db.command({ collStats: Log.collection.name }) : null;
+
+    if (stats && !stats.capped) {
+      console.log(`Converting "${Log.collection.name}" to a capped collection (${logStorage.cappedSizeBytes} bytes)`);
+      await db.command({ convertToCapped: Log.collection.name, size: logStorage.cappedSizeBytes });
+    }
+  }
+
+  // syncIndexes also drops indexes that are no longer declared (e.g. a disabled TTL index).
+  const dropped = await Log.syncIndexes();
+  await LogRollup.syncIndexes();
+  console.log(`Log indexes synchronized${dropped.length ? ` (dropped: ${dropped.join(', ')})` : ''}`);
+
+  if (process.argv.includes('--rollup')) {
+    const result = await runLogRollup();
+    console.log(`Rolled up ${result.minutes} minute(s) into ${result.rollups} rollup document(s)`);
+  }
+
+  await mongoose.disconnect();
+}
+
+main().catch(async (err) => {
+  console.error('Applying log storage policy failed:', err);
+  await mongoose.disconnect();
+  process.exit(1);
+});
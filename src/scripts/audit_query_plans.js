@@ -0,0 +1,296 @@
+// Maintenance script: explains the read queries of the services and jobs and flags collection scans.
+const mongoose = require('mongoose');
+const connectDb = require('../utils/connect_db');
+const Cost = require('../models/cost_model');
+const CostBucket = require('../models/cost_bucket_model');
+const Report = require('../models/report_model');
+const User = require('../models/user_model');
+const UserTotal = require('../models/user_total_model');
+const MonthlyTotal = require('../models/monthly_total_model');
+const Log = require('../models/log_model');
+const LogRollup = require('../models/log_rollup_model');
+const Checkpoint = require('../models/checkpoint_model');
+const IdempotencyKey = require('../models/idempotency_key_model');
+const { costSource, buildAppendOps } = require('../utils/cost_storage');
+const { buildExportPipeline } = require('../utils/cost_export');
+const { buildRangePipeline, buildUsersMonthPipeline } = require('../utils/report_engine');
+const { buildMonthTotalsPipeline, buildUserSumsPipeline, buildUserLookupPipeline } = require('../utils/user_totals');
+const { buildAnalyticsQuery } = require('../utils/analytics');
+const { pageQuery } = require('../utils/report_materializer');
+const { buildRollupPipeline } = require('../utils/log_rollup');
+
+/*
+ * Query Plan Audit
+ *
+ * Usage:
+ *   node src/scripts/audit_query_plans.js                 -> explain all queries (exit code 1 on problems)
+ *   node src/scripts/audit_query_plans.js --sync-indexes  -> first create declared / drop undeclared indexes
+ *
+ * The list below covers the read queries of the services and background jobs
+ * and the filters of their updates; pipelines and compound filters come from
+ * the same builders the services use, so they cannot drift apart. Cost queries
+ * are explained for both storage modes (documents and buckets), with sample
+ * values taken from the database. Maintenance scripts (rebuild, migration)
+ * read whole collections on purpose and are not listed.
+ * The winning plan is checked for:
+ * - COLLSCAN                        -> failure (no usable index), or a warning
+ *                                      for queries marked `scan` (accepted scans)
+ * - FETCH on a query marked covered -> failure (index no longer covers it)
+ * - blocking SORT                   -> warning (sorted in memory)
+ * Run it against a staging copy of the data before deploying index changes.
+ */
+
+// Pick sample filter values from existing documents (falls back to placeholders).
+async function loadSamples() {
+  const cost = await Cost.findOne({}).select('userid year month').lean() ||
+    await CostBucket.findOne({}).select('userid year month').lean();
+  const log = await Log.findOne({}).sort({ time: -1 }).select('time statusCode hostname pid').lean();
+  const now = new Date();
+  return {
+    userid: cost ? cost.userid : 1,
+    year: cost ? cost.year : now.getFullYear(),
+    month: cost ? cost.month : now.getMonth() + 1,
+    time: log ? log.time : now,
+    statusCode: log ? log.statusCode : 200,
+    hostname: log ? log.hostname : 'localhost',
+    pid: log ? log.pid : 1
+  };
+}
+
+// Cost queries of one storage mode (report, range, totals and export pipelines).
+function costQueries(s, mode) {
+  const source = costSource(mode);
+  const name = (label) => `${source.Model.collection.name}: ${label}`;
+  const aggregate = (pipeline) => () => source.Model.aggregate(pipeline).explain('queryPlanner');
+  const month = { year: s.year, month: s.month };
+
+  return [
+    {
+      name: name('monthly report aggregation'),
+      explain: aggregate(buildRangePipeline(s.userid, month, month, source))
+    },
+    {
+      name: name('report range aggregation (two years)'),
+      explain: aggregate(buildRangePipeline(s.userid, { year: s.year - 1, month: 1 }, { year: s.year, month: 12 }, source))
+    },
+    {
+      name: name('materializer batch aggregation'),
+      explain: aggregate(buildUsersMonthPipeline([s.userid], s.year, s.month, source))
+    },
+    {
+      name: name('user total fallback / seed ($sum)'),
+      covered: mode === 'documents',
+      explain: aggregate(buildUserSumsPipeline(s.userid, source))
+    },
+    {
+      name: name('user totals batch ($in)'),
+      covered: mode === 'documents',
+      explain: aggregate(buildUserSumsPipeline({ $in: [s.userid] }, source))
+    },
+    {
+      name: name('monthly totals seed ($or)'),
+      explain: aggregate(buildMonthTotalsPipeline({ $or: [{ userid: s.userid, year: s.year, month: s.month }] }, source))
+    },
+    {
+      name: name('user export stream'),
+      explain: aggregate(buildExportPipeline({ userId: s.userid, from: new Date(s.year, 0, 1) }, source))
+    },
+    {
+      name: name('all-users export stream'),
+      explain: aggregate(buildExportPipeline({}, source))
+    }
+  ];
+}
+
+// The queries issued by the services: { name, covered?, scan?, explain: () => Promise<explain output> }.
+function buildQueries(s) {
+  const monthMatch = { userid: s.userid, year: s.year, month: s.month };
+  const logPage = (filter) => Log.find(filter).sort({ time: -1, _id: -1 }).limit(101).explain('queryPlanner');
+
+  return [
+    ...costQueries(s, 'documents'),
+    ...costQueries(s, 'buckets'),
+    {
+      name: 'cost_buckets: append target (bucket with free space)',
+      explain: () => CostBucket.find(buildAppendOps([{ ...monthMatch, sum: 0 }])[0].op.updateOne.filter).explain('queryPlanner')
+    },
+    {
+      name: 'cost_buckets: item lookup by _id (test cleanup)',
+      scan: 'items._id is not indexed to keep appends cheap',
+      explain: () => CostBucket.findOne({ 'items._id': new mongoose.Types.ObjectId() }).explain('queryPlanner')
+    },
+    {
+      name: 'reports: cached report lookup',
+      explain: () => Report.findOne(monthMatch).select('userid year month costs').explain('queryPlanner')
+    },
+    {
+      name: 'users: user by id',
+      explain: () => User.findOne({ id: s.userid }).explain('queryPlanner')
+    },
+    {
+      name: 'users: existence check',
+      explain: () => User.find({ id: s.userid }).select('_id').limit(1).explain('queryPlanner')
+    },
+    {
+      name: 'users: existence batch ($in)',
+      explain: () => User.find({ id: { $in: [s.userid] } }).select('id -_id').explain('queryPlanner')
+    },
+    {
+      name: 'users: existence cache delta refresh',
+      explain: () => User.find({ _id: { $gt: new mongoose.Types.ObjectId() } }).select('id').sort({ _id: 1 }).explain('queryPlanner')
+    },
+    {
+      name: 'users: batch lookup with totals',
+      explain: () => User.aggregate(buildUserLookupPipeline([s.userid])).explain('queryPlanner')
+    },
+    {
+      name: 'users: paginated listing',
+      explain: () => User.find({ id: { $gt: 0 } }).sort({ id: 1 }).limit(1001).explain('queryPlanner')
+    },
+    {
+      name: 'user_totals: point read',
+      explain: () => UserTotal.findOne({ userid: s.userid }).select('total version -_id').explain('queryPlanner')
+    },
+    {
+      name: 'user_totals: seed existence check ($in)',
+      explain: () => UserTotal.find({ userid: { $in: [s.userid] } }).select('userid -_id').explain('queryPlanner')
+    },
+    {
+      name: 'monthly_totals: seed existence check ($or)',
+      explain: () => MonthlyTotal.find({ $or: [monthMatch] }).select('userid year month -_id').explain('queryPlanner')
+    },
+    {
+      name: 'monthly_totals: month version read',
+      explain: () => MonthlyTotal.findOne(monthMatch).select('version -_id').explain('queryPlanner')
+    },
+    {
+      name: 'monthly_totals: analytics range',
+      explain: () => buildAnalyticsQuery([s.userid], { year: s.year - 1, month: 1 }, { year: s.year, month: 12 })
+        .explain('queryPlanner')
+    },
+    {
+      name: 'monthly_totals: materializer page',
+      explain: () => pageQuery(s.year, s.month, s.userid, 800).explain('queryPlanner')
+    },
+    {
+      name: 'checkpoints: job checkpoint read',
+      explain: () => Checkpoint.findOne({ job: 'report-materializer' }).explain('queryPlanner')
+    },
+    {
+      name: 'idempotency_keys: stored response lookup',
+      explain: () => IdempotencyKey.findById('costs:sample').explain('queryPlanner')
+    },
+    {
+      name: 'logs: newest page',
+      explain: () => logPage({})
+    },
+    {
+      name: 'logs: time range page',
+      explain: () => logPage({ time: { $lte: s.time } })
+    },
+    {
+      name: 'logs: status code page',
+      explain: () => logPage({ statusCode: s.statusCode })
+    },
+    {
+      name: 'logs: hostname/pid page',
+      explain: () => logPage({ hostname: s.hostname, pid: s.pid })
+    },
+    {
+      name: 'logs: oldest entry (rollup start)',
+      explain: () => Log.findOne({}).sort({ time: 1 }).select('time').explain('queryPlanner')
+    },
+    {
+      name: 'logs: rollup window aggregation',
+      explain: () => Log.aggregate(buildRollupPipeline(new Date(s.time.getTime() - 60 * 60 * 1000), s.time))
+        .explain('queryPlanner')
+    },
+    {
+      name: 'log_rollups: per-route history',
+      explain: () => LogRollup.find({ route: '/api/report' }).sort({ minute: -1 }).limit(60).explain('queryPlanner')
+    }
+  ];
+}
+
+/*
+ Collect the stage names of every winning plan in an explain document.
+ Handles find and aggregate output (the plan may sit under stages[0].$cursor)
+ and both the classic and the slot-based (queryPlan) formats.
+*/
+function winningStages(explain) {
+  const stages = [];
+  const walkPlan = (plan) => {
+    if (!plan || typeof plan !== 'object') return;
+    if (typeof plan.stage === 'string') stages.push(plan.stage);
+    for (const key of ['inputStage', 'queryPlan']) walkPlan(plan[key]);
+    (plan.inputStages || []).forEach(walkPlan);
+  };
+  const visit = (node) => {
+    if (!node || typeof node !== 'object') return;
+    if (node.winningPlan) walkPlan(node.winningPlan);
+    for (const [key, value] of Object.entries(node)) {
+      if (key !== 'winningPlan' && key !== 'rejectedPlans') visit(value);
+    }
+  };
+  visit(explain);
+  return stages;
+}
+
+// Classify one explained query into failures and warnings.
+function checkPlan(query, stages) {
+  const failures = [];
+  const warnings = [];
+  if (stages.length === 0 || stages.every((stage) => stage === 'EOF')) {
+    warnings.push('collection is empty or missing, plan not evaluated');
+    return { failures, warnings };
+  }
+  if (stages.includes('COLLSCAN')) {
+    if (query.scan) {
+      warnings.push(`collection scan (accepted: ${query.scan})`);
+    } else {
+      failures.push('collection scan');
+    }
+  }
+  if (query.covered && stages.includes('FETCH')) {
+    failures.push('expected a covered plan, found FETCH');
+  }
+  if (stages.includes('SORT')) {
+    warnings.push('blocking in-memory SORT');
+  }
+  return { failures, warnings };
+}
+
+async function main() {
+  await connectDb();
+
+  if (process.argv.includes('--sync-indexes')) {
+    for (const Model of [Cost, CostBucket, Report, User, UserTotal, MonthlyTotal, Log, LogRollup, Checkpoint, IdempotencyKey]) {
+      const dropped = await Model.syncIndexes();
+      console.log(`${Model.collection.name}: indexes synchronized${dropped.length ? ` (dropped: ${dropped.join(', ')})` : ''}`);
+    }
+  }
+
+  const queries = buildQueries(await loadSamples());
+  let failed = 0;
+
+  for (const query of queries) {
+    const stages = winningStages(await query.explain());
+    const { failures, warnings } = checkPlan(query, stages);
+    const status = failures.length ? 'FAIL' : warnings.length ? 'WARN' : 'OK';
+    const notes = [...failures, ...warnings].join('; ');
+    console.log(`${status.padEnd(4)} ${query.name} [${stages.join(' <- ')}]${notes ? ` ${notes}` : ''}`);
+    if (failures.length) failed++;
+  }
+
+  console.log(`Audited ${queries.length} queries: ${failed} with problems.`);
+  await mongoose.disconnect();
+  if (failed > 0) {
+    process.exitCode = 1;
+  }
+}
+
+main().catch(async (err) => {
+  console.error('Query plan audit failed:', err);
+  await mongoose.disconnect();
+  process.exit(1);
+});
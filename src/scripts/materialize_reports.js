@@ -0,0 +1,49 @@
+// Maintenance script: precomputes the reports of a closed month (cron or manual backfill).
+const mongoose = require('mongoose');
+const connectDb = require('../utils/connect_db');
+const { materializeMonth, previousMonth } = require('../utils/report_materializer');
+
+/*
+ * Usage:
+ *   node src/scripts/materialize_reports.js                    -> previous month
+ *   node src/scripts/materialize_reports.js --month 2025-01    -> a specific closed month
+ *   node src/scripts/materialize_reports.js --month 2025-01 --force
+ *                                                              -> recompute a completed month
+ *
+ * Batch size and concurrency come from REPORT_MATERIALIZER_BATCH_SIZE and
+ * REPORT_MATERIALIZER_CONCURRENCY. An interrupted run resumes from its checkpoint.
+ */
+
+// Parse "--month YYYY-MM" (defaults to the previous month).
+function parseTargetMonth(argv) {
+  const i = argv.indexOf('--month');
+  if (i === -1) {
+    return previousMonth();
+  }
+  const match = /^(\d{4})-(\d{1,2})$/.exec(argv[i + 1] || '');
+  if (!match || Number(match[2]) < 1 || Number(match[2]) > 12) {
+    throw new Error('Expected --month YYYY-MM');
+  }
+  return { year: Number(match[1]), month: Number(match[2]) };
+}
+
+async function main() {
+  const { year, month } = parseTargetMonth(process.argv);
+
+  // The current month is still open; its report would be outdated by the next insert.
+  const now = new Date();
+  if (year * 12 + month >= now.getFullYear() * 12 + now.getMonth() + 1) {
+    throw new Error(`${year}-${month} is not a closed month`);
+  }
+
+  await connectDb();
+  const users = await materializeMonth(year, month, { force: process.argv.includes('--force') });
+  console.log(`Materialized ${users} report(s) for ${year}-${month}`);
+  await mongoose.disconnect();
+}
+
+main().catch(async (err) => {
+  console.error('Report materialization failed:', err);
+  await mongoose.disconnect();
+  process.exit(1);
+});
@@ -0,0 +1,198 @@
+// Maintenance script: copies the "costs" collection into per-user-month buckets ("cost_buckets").
+const mongoose = require('mongoose');
+const connectDb = require('../utils/connect_db');
+const Cost = require('../models/cost_model');
+const CostBucket = require('../models/cost_bucket_model');
+const Checkpoint = require('../models/checkpoint_model');
+const { costStorage } = require('../utils/cost_storage');
+
+/*
+ * Usage:
+ *   node src/scripts/migrate_costs_to_buckets.js            -> migrate (resumes from its checkpoint)
+ *   node src/scripts/migrate_costs_to_buckets.js --restart  -> migrate all user-months again
+ *   node src/scripts/migrate_costs_to_buckets.js --verify   -> compare both collections (exit code 1 on mismatch)
+ *
+ * Run it while the costs service still uses COST_STORAGE_MODE=documents and
+ * no new costs are added, then switch the services to "buckets". Every item
+ * keeps the _id of its cost document. The existing buckets of a user-month are
+ * replaced, so a repeated run does not duplicate items. "costs" is left
+ * untouched (switching back to "documents" is the rollback).
+ */
+
+const JOB_NAME = 'cost-bucket-migration';
+
+// User-months migrated between two checkpoint updates.
+const CHECKPOINT_EVERY = 500;
+
+// Sort order of the user-months (a prefix of the compound cost index, so no in-memory sort).
+// Within a month the index returns items by category and sum; writeMonth restores _id order.
+const MONTH_ORDER = { userid: 1, year: 1, month: 1 };
+
+// Compare ObjectIds by value (24 lowercase hex digits sort like the bytes).
+const byId = (a, b) => (String(a._id) < String(b._id) ? -1 : String(a._id) > String(b._id) ? 1 : 0);
+
+// Filter for the user-months after the last migrated one.
+function afterMonth(last) {
+  if (!last) {
+    return {};
+  }
+  const { userid, year, month } = last;
+  return {
+    $or: [
+      { userid: { $gt: userid } },
+      { userid, year: { $gt: year } },
+      { userid, year, month: { $gt: month } }
+    ]
+  };
+}
+
+// Build the bucket documents of one user-month (chunks of COST_BUCKET_SIZE items).
+function buildBuckets({ userid, year, month }, costs) {
+  const buckets = [];
+  for (let i = 0; i < costs.length; i += costStorage.bucketSize) {
+    const bucket = { userid, year, month, count: 0, total: 0, categories: {}, items: [] };
+    for (const cost of costs.slice(i, i + costStorage.bucketSize)) {
+      const { _id, description, category, sum, createdAt, day } = cost;
+      bucket.items.push({ _id, description, category, sum, createdAt, day });
+      bucket.count++;
+      bucket.total += sum;
+      const cat = bucket.categories[category] || { total: 0, count: 0 };
+      cat.total += sum;
+      cat.count++;
+      bucket.categories[category] = cat;
+    }
+    buckets.push(bucket);
+  }
+  return buckets;
+}
+
+/*
+ Replace the buckets of one user-month with the given cost documents.
+ Items are stored in _id order, the order of report items in documents mode.
+*/
+async function writeMonth(key, costs) {
+  costs.sort(byId);
+  await CostBucket.bulkWrite([
+    { deleteMany: { filter: key } },
+    ...buildBuckets(key, costs).map((document) => ({ insertOne: { document } }))
+  ], { ordered: true });
+}
+
+const saveCheckpoint = (last, completed) => Checkpoint.updateOne(
+  { job: JOB_NAME },
+  { $set: { value: { last, completed }, updatedAt: new Date() } },
+  { upsert: true }
+);
+
+async function migrate(restart) {
+  const checkpoint = await Checkpoint.findOne({ job: JOB_NAME }).lean();
+  const state = !restart && checkpoint && checkpoint.value;
+  if (state && state.completed) {
+    console.log('Migration already completed (use --restart to run it again)');
+    return;
+  }
+
+  let last = state ? state.last : null;
+  let current = null;
+  let costs = [];
+  let months = 0;
+  let items = 0;
+
+  const flush = async () => {
+    await writeMonth(current, costs);
+    last = current;
+    months++;
+    items += costs.length;
+    if (months % CHECKPOINT_EVERY === 0) {
+      await saveCheckpoint(last, false);
+      console.log(`Migrated ${months} user-month(s), ${items} item(s)`);
+    }
+  };
+
+  const cursor = Cost.find(afterMonth(last)).sort(MONTH_ORDER).lean().cursor();
+  for await (const cost of cursor) {
+    if (current && (cost.userid !== current.userid || cost.year !== current.year || cost.month !== current.month)) {
+      await flush();
+      costs = [];
+    }
+    if (costs.length === 0) {
+      current = { userid: cost.userid, year: cost.year, month: cost.month };
+    }
+    costs.push(cost);
+  }
+  if (costs.length > 0) {
+    await flush();
+  }
+
+  await saveCheckpoint(last, true);
+  console.log(`Migration finished: ${months} user-month(s), ${items} item(s) in buckets of up to ${costStorage.bucketSize}`);
+}
+
+/*
+ Compare item count, sum and item order per user-month between "costs" and
+ "cost_buckets". Items are read in the order of the report pipelines of both
+ modes (documents by _id; buckets by _id, then items in stored order), so a
+ match means reports return the same items in the same order after the switch.
+*/
+async function verify() {
+  const group = (count, total, id) => ({
+    $group: {
+      _id: { userid: '$userid', year: '$year', month: '$month' },
+      count: { $sum: count },
+      total: { $sum: total },
+      ids: { $push: id }
+    }
+  });
+  const [expected, actual] = await Promise.all([
+    Cost.aggregate([{ $sort: { _id: 1 } }, group(1, '$sum', '$_id')]).allowDiskUse(true),
+    CostBucket.aggregate([
+      { $sort: { _id: 1 } },
+      { $unwind: '$items' },
+      group(1, '$items.sum', '$items._id')
+    ]).allowDiskUse(true)
+  ]);
+  const sameOrder = (a, b) => a.length === b.length && a.every((id, i) => String(id) === String(b[i]));
+
+  const keyOf = (row) => `${row._id.userid}:${row._id.year}:${row._id.month}`;
+  const stored = new Map(actual.map((row) => [keyOf(row), row]));
+  let mismatches = 0;
+
+  for (const row of expected) {
+    const key = keyOf(row);
+    const bucket = stored.get(key);
+    stored.delete(key);
+    // Differences smaller than half a cent are rounding noise of summing doubles.
+    if (!bucket || bucket.count !== row.count || Math.abs(bucket.total - row.total) > 0.005) {
+      mismatches++;
+      console.log(`mismatch key=${key} costs=${row.count}/${row.total} buckets=${bucket ? `${bucket.count}/${bucket.total}` : 'none'}`);
+    } else if (!sameOrder(row.ids, bucket.ids)) {
+      mismatches++;
+      console.log(`mismatch key=${key} item order differs`);
+    }
+  }
+  for (const [key, bucket] of stored) {
+    mismatches++;
+    console.log(`mismatch key=${key} costs=none buckets=${bucket.count}/${bucket.total}`);
+  }
+
+  console.log(`Compared ${expected.length} user-month(s): ${mismatches} mismatch(es).`);
+  return mismatches;
+}
+
+async function main() {
+  await connectDb();
+  if (process.argv.includes('--verify')) {
+    if (await verify() > 0) {
+      process.exitCode = 1;
+    }
+  } else {
+    await migrate(process.argv.includes('--restart'));
+  }
+  await mongoose.disconnect();
+}
+
+main().catch(async (err) => {
+  console.error('Cost bucket migration failed:', err);
+  await mongoose.disconnect();
+  process.exit(1);
+});
@@ -0,0 +1,163 @@
+// Maintenance script: recomputes the running totals from the stored cost items and reports drift.
+const mongoose = require('mongoose');
+const connectDb = require('../utils/connect_db');
+const { costSource } = require('../utils/cost_storage');
+const { addCategoryTotals, buildMonthTotalsPipeline } = require('../utils/user_totals');
+const UserTotal = require('../models/user_total_model');
+const MonthlyTotal = require('../models/monthly_total_model');
+
+/*
+ * Usage:
+ *   node src/scripts/rebuild_user_totals.js           -> rebuild (overwrite drifted documents)
+ *   node src/scripts/rebuild_user_totals.js --verify  -> only report drift (exit code 1 if any)
+ *
+ * The expected totals are computed server-side with one aggregation that
+ * groups the cost items by (userid, year, month, category). The largest items
+ * of every group ($topN, MongoDB 5.2+) are merged into the month's top list.
+ *
+ * Pause cost writes while rebuilding: an $inc applied between the aggregation
+ * and the overwrite of its document is lost (a later --verify reports it).
+ */
+
+// Differences smaller than half a cent are rounding noise of $inc on doubles.
+const EPSILON = 0.005;
+
+// Number of write operations sent per bulkWrite call.
+const WRITE_BATCH_SIZE = 1000;
+
+// Build the expected user_totals and monthly_totals documents from the cost items.
+async function computeExpectedTotals() {
+  const users = new Map();
+  const months = new Map();
+
+  // Reads "costs" or the items of "cost_buckets", depending on COST_STORAGE_MODE.
+  const source = costSource();
+  const cursor = source.Model.aggregate(buildMonthTotalsPipeline({}, source)).allowDiskUse(true).cursor();
+
+  for await (const row of cursor) {
+    const { userid, year, month } = row._id;
+
+    const user = users.get(userid) || { userid, total: 0, count: 0 };
+    user.total += row.total;
+    user.count += row.count;
+    users.set(userid, user);
+
+    const key = `${userid}:${year}:${month}`;
+    const monthly = months.get(key) || { userid, year, month, total: 0, count: 0, categories: {}, top: [] };
+    months.set(key, addCategoryTotals(monthly, row));
+  }
+
+  return { users, months };
+}
+
+// Compare two totals documents field by field (total/count and per-category values).
+function isDrifted(expected, actual) {
+  if (!actual) return true;
+  if (Math.abs((actual.total || 0) - expected.total) > EPSILON) return true;
+  if ((actual.count || 0) !== expected.count) return true;
+
+  // Top lists are compared by their sums (items with equal sums may be ordered differently).
+  if (expected.top) {
+    const actualTop = actual.top || [];
+    if (actualTop.length !== expected.top.length) return true;
+    if (expected.top.some((item, i) => Math.abs(item.sum - actualTop[i].sum) > EPSILON)) return true;
+  }
+
+  if (expected.categories) {
+    const actualCats = actual.categories || {};
+    const names = new Set([...Object.keys(expected.categories), ...Object.keys(actualCats)]);
+    for (const cat of names) {
+      const e = expected.categories[cat] || { total: 0, count: 0 };
+      const a = actualCats[cat] || {};
+      if (Math.abs((a.total || 0) - e.total) > EPSILON) return true;
+      if ((a.count || 0) !== e.count) return true;
+    }
+  }
+  return false;
+}
+
+// Scan a stored totals collection and collect replace/delete operations for drifted documents.
+async function collectDrift(Model, expectedMap, keyOf) {
+  const ops = [];
+  const drifted = [];
+  const seen = new Set();
+
+  for await (const doc of Model.find({}).lean().cursor()) {
+    const key = keyOf(doc);
+    seen.add(key);
+    const expected = expectedMap.get(key);
+
+    if (!expected) {
+      // Totals document without any backing cost items.
+      if (doc.total || doc.count) {
+        drifted.push({ key, expected: null, actual: doc.total });
+      }
+      ops.push({ deleteOne: { filter: { _id: doc._id } } });
+    } else if (isDrifted(expected, doc)) {
+      drifted.push({ key, expected: expected.total, actual: doc.total });
+      // A repaired document changes content, so its version moves on (ETag validators).
+      ops.push({ replaceOne: { filter: { _id: doc._id }, replacement: { ...expected, version: (doc.version || 0) + 1 } } });
+    }
+  }
+
+  // Expected documents that are missing entirely.
+  for (const [key, expected] of expectedMap) {
+    if (!seen.has(key)) {
+      drifted.push({ key, expected: expected.total, actual: null });
+      ops.push({ insertOne: { document: { ...expected, version: 1 } } });
+    }
+  }
+
+  return { ops, drifted };
+}
+
+// Execute write operations in bounded batches.
+async function applyOps(Model, ops) {
+  for (let i = 0; i < ops.length; i += WRITE_BATCH_SIZE) {
+    await Model.bulkWrite(ops.slice(i, i + WRITE_BATCH_SIZE), { ordered: false });
+  }
+}
+
+async function main() {
+  const verifyOnly = process.argv.includes('--verify');
+  await connectDb();
+
+  const { users, months } = await computeExpectedTotals();
+
+  const userDrift = await collectDrift(UserTotal, users, (d) => d.userid);
+  const monthDrift = await collectDrift(
+    MonthlyTotal,
+    months,
+    (d) => `${d.userid}:${d.year}:${d.month}`
+  );
+
+  // Report drift in a compact, grep-friendly format.
+  for (const d of userDrift.drifted) {
+    console.log(`user_totals drift userid=${d.key} expected=${d.expected} actual=${d.actual}`);
+  }
+  for (const d of monthDrift.drifted) {
+    console.log(`monthly_totals drift key=${d.key} expected=${d.expected} actual=${d.actual}`);
+  }
+
+  const driftCount = userDrift.drifted.length + monthDrift.drifted.length;
+  console.log(
+    `Checked ${users.size} users and ${months.size} user-months: ${driftCount} drifted document(s).`
+  );
+
+  if (!verifyOnly) {
+    await applyOps(UserTotal, userDrift.ops);
+    await applyOps(MonthlyTotal, monthDrift.ops);
+    console.log('Running totals rebuilt.');
+  }
+
+  await mongoose.disconnect();
+  if (verifyOnly && driftCount > 0) {
+    process.exitCode = 1;
+  }
+}
+
+main().catch(async (err) => {
+  console.error('Totals rebuild failed:', err);
+  await mongoose.disconnect();
+  process.exit(1);
+});
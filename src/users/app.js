@@ -1,71 +1,71 @@
 // Users service: handles user creation and retrieval, and aggregates total costs per user.
 const express = require('express');
 const dotenv = require('dotenv');
-const connectDb = require('../utils/connect_db');
+const startService = require('../utils/start_service');
+const { mountDiagnostics } = require('../utils/diagnostics');
 const { logMiddleware } = require('../utils/logger');
 const User = require('../models/user_model');
-const Cost = require('../models/cost_model');
+const { getUserTotalState, getUserTotals, getUserVersion, buildUserLookupPipeline } = require('../utils/user_totals');
+const { validateUserInput, isDuplicateKeyError } = require('../utils/user_validation');
+const { forgetUser } = require('../utils/user_existence');
+const { bulkConfig, insertManyUnordered, sendBulkResult } = require('../utils/bulk_insert');
+const { readNdjson, isNdjsonRequest, streamNdjson } = require('../utils/ndjson');
+const { parseLimit, encodeCursor, decodeCursor } = require('../utils/pagination');
+const SingleFlight = require('../utils/single_flight');
+const { idempotency } = require('../utils/idempotency');
+const { serializers, userSerializer, sendJson } = require('../utils/serializers');
+const { compression } = require('../utils/compression');
+const { weakEtag, isConditional, sendNotModified, setEtag } = require('../utils/etag');
+const { admission } = require('../utils/admission');
 
 dotenv.config();
 
-// Create Express application and enable JSON request body parsing.
+// Create Express application.
 const app = express();
-app.use(express.json());
 
 // Middleware: log every incoming HTTP request for auditing and debugging.
+// Mounted first, so requests rejected by admission control are logged too.
 app.use(logMiddleware);
 
+// Bulk uploads are shed first under load (before their large body is parsed).
+app.use('/api/add/bulk', admission('users:add-bulk', 'low'));
+
+// Enable JSON request body parsing.
+// Bulk uploads get a larger JSON body limit; the default parser then skips the parsed body.
+app.use('/api/add/bulk', express.json({ limit: bulkConfig.jsonLimit }));
+app.use(express.json());
+
+// Compress large response bodies (user listings) for clients that accept brotli/gzip.
+app.use(compression());
+
+// Expose runtime statistics (log sink counters, ...) at GET /internal/stats.
+mountDiagnostics(app);
+
+// Admission control per route (see admission.js): user details are shed last.
+const admitAdd = admission('users:add', 'normal');
+
 /*
  Shared handler for adding a new user.
  Supports both /api/add and /api/add/ endpoints.
 */
 const addUserHandler = async (req, res) => {
   try {
-    // Extract user fields from the request body.
-    const { id, first_name, last_name, birthday } = req.body;
-
-    // Validate presence of all required fields.
-    if (id === undefined || id === null || !first_name || !last_name || !birthday) {
-      return res.status(400).json({ id: 400, message: 'Missing required fields' });
+    // Validate and normalize the request body (shared with the bulk endpoint).
+    const { value, error } = validateUserInput(req.body);
+    if (error) {
+      return res.status(400).json({ id: 400, message: error });
     }
 
-    // Convert user id to a number and ensure it is valid.
-    const numericId = Number(id);
-    if (!Number.isFinite(numericId)) {
-      return res.status(400).json({ id: 400, message: 'Invalid id' });
-    }
+    // Persist the new user; duplicate ids are rejected by the unique index.
+    const newUser = await User.create(value);
 
+    // Return the created user; the serializer writes only the public fields.
+    return sendJson(res, serializers.user, newUser, 201);
+  } catch (err) {
     // Prevent creation of duplicate users with the same logical id.
-    const exists = await User.findOne({ id: numericId });
-    if (exists) {
+    if (isDuplicateKeyError(err)) {
       return res.status(400).json({ id: 400, message: 'User already exists' });
     }
-
-    // Parse birthday string into a Date object and validate its format.
-    const parsedBirthday = new Date(birthday);
-    if (isNaN(parsedBirthday.getTime())) {
-      return res.status(400).json({ id: 400, message: 'Invalid birthday format' });
-    }
-
-    // Persist the new user in the database.
-    const newUser = await User.create({
-      id: numericId,
-      first_name,
-      last_name,
-      birthday: parsedBirthday
-    });
-
-    // Return the created user while removing MongoDB internal fields.
-    return res.status(201).json(
-      newUser.toObject({
-        versionKey: false,
-        transform: function (doc, ret) {
-          delete ret._id;
-          return ret;
-        }
-      })
-    );
-  } catch (err) {
     // Handle validation or database errors.
     console.error(err);
     return res.status(400).json({ id: 400, message: err.message });
@@ -73,13 +73,165 @@ const addUserHandler = async (req, res) => {
 };
 
 // Register add-user endpoint (with and without trailing slash).
-app.post('/api/add', addUserHandler);
-app.post('/api/add/', addUserHandler);
+// Retries with the same Idempotency-Key header receive the stored response.
+app.post('/api/add', admitAdd, idempotency('users'), addUserHandler);
+app.post('/api/add/', admitAdd, idempotency('users'), addUserHandler);
+
+/*
+ Validate and insert one chunk of bulk users.
+ Each entry is { index, value } or { index, error } (NDJSON parse failure);
+ per-item outcomes are appended to `results`.
+*/
+const ingestUserChunk = async (entries, results) => {
+  const docs = [];
+  const positions = [];
+
+  for (const entry of entries) {
+    const { value, error } = entry.error ? entry : validateUserInput(entry.value);
+    if (error) {
+      results.push({ index: entry.index, status: 'failed', message: error });
+    } else {
+      docs.push(value);
+      positions.push(entry.index);
+    }
+  }
+
+  // No pre-reads: duplicates (existing or within the request) fail on the unique index.
+  const { failures } = await insertManyUnordered(User, docs);
+  docs.forEach((doc, i) => {
+    const failure = failures.get(i);
+    if (!failure) {
+      results.push({ index: positions[i], status: 'created' });
+    } else {
+      const message = isDuplicateKeyError(failure) ? 'User already exists' : failure.errmsg || 'Insert failed';
+      results.push({ index: positions[i], status: 'failed', message });
+    }
+  });
+};
+
+/*
+ Shared handler for bulk user import.
+ Accepts a JSON array or an NDJSON stream (Content-Type: application/x-ndjson)
+ of users and responds with a per-item result (201 all created, 207 partial).
+*/
+const addUsersBulkHandler = async (req, res) => {
+  try {
+    let source;
+    if (isNdjsonRequest(req)) {
+      source = readNdjson(req);
+    } else if (Array.isArray(req.body)) {
+      if (req.body.length > bulkConfig.maxItems) {
+        return res.status(413).json({ id: 413, message: `Bulk requests are limited to ${bulkConfig.maxItems} items` });
+      }
+      source = req.body.map((value) => ({ value }));
+    } else {
+      return res.status(400).json({ id: 400, message: 'Expected a JSON array or an NDJSON body' });
+    }
+
+    const results = [];
+    let chunk = [];
+    let index = 0;
+
+    for await (const entry of source) {
+      // NDJSON streams are cut off at the item limit.
+      if (index >= bulkConfig.maxItems) {
+        results.push({ index, status: 'failed', message: `Item limit of ${bulkConfig.maxItems} exceeded` });
+        break;
+      }
+      chunk.push({ index: index++, ...entry });
+
+      if (chunk.length >= bulkConfig.chunkSize) {
+        await ingestUserChunk(chunk, results);
+        chunk = [];
+      }
+    }
+    await ingestUserChunk(chunk, results);
+
+    results.sort((a, b) => a.index - b.index);
+    return sendBulkResult(res, results);
+  } catch (err) {
+    console.error(err);
+    return res.status(400).json({ id: 400, message: err.message });
+  }
+};
+
+// Register bulk add-user endpoint (with and without trailing slash).
+app.post('/api/add/bulk', addUsersBulkHandler);
+app.post('/api/add/bulk/', addUsersBulkHandler);
+
+// Maximum number of ids accepted by the batch lookup.
+const MAX_BATCH_IDS = 1000;
+
+/*
+ Get many users with their totals in one aggregation query.
+ Usage: GET /api/users/batch?ids=1,2,3 — users are returned in the requested order;
+ unknown ids are omitted.
+*/
+app.get('/api/users/batch', admission('users:batch', 'normal'), async (req, res) => {
+  try {
+    const ids = String(req.query.ids || '')
+      .split(',')
+      .map((v) => v.trim())
+      .filter(Boolean)
+      .map(Number);
+
+    if (ids.length === 0 || ids.some((v) => !Number.isFinite(v))) {
+      return res.status(400).json({ id: 400, message: 'Invalid ids' });
+    }
+    if (ids.length > MAX_BATCH_IDS) {
+      return res.status(400).json({ id: 400, message: `At most ${MAX_BATCH_IDS} ids are allowed` });
+    }
+
+    // Join each user with its running total document.
+    const users = await User.aggregate(buildUserLookupPipeline(ids));
+
+    // Users without a totals document (costs predating the totals store) fall back to one $sum query.
+    const missing = users.filter((u) => u.total === undefined).map((u) => u.id);
+    const fallback = missing.length ? await getUserTotals(missing) : new Map();
+
+    const byId = new Map(users.map((u) => [u.id, {
+      ...u,
+      total: u.total === undefined ? fallback.get(u.id) || 0 : Number(u.total.toFixed(2))
+    }]));
+
+    const found = [...new Set(ids)].filter((v) => byId.has(v)).map((v) => byId.get(v));
+    return sendJson(res, serializers.userDetailsList, found);
+  } catch (err) {
+    console.error(err);
+    return res.status(400).json({ id: 400, message: err.message });
+  }
+});
+
+// Concurrent requests for the same user share one lookup (single-flight).
+const userDetailsFlight = new SingleFlight('user-details');
+
+// Load the response body of GET /api/users/:id (null when the user does not exist).
+const loadUserDetails = async (userId) => {
+  const user = await User.findOne({ id: userId }).select('first_name last_name id -_id').lean();
+  if (!user) {
+    return null;
+  }
+
+  // Read the maintained running total (rounded to two decimal places) and its version.
+  const { total, version } = await getUserTotalState(userId);
+
+  // Return the required user fields and the computed total (the version is not serialized).
+  return {
+    first_name: user.first_name,
+    last_name: user.last_name,
+    id: user.id,
+    total,
+    version
+  };
+};
+
+// Version-based ETag of the user details (users never change, their total does).
+const userEtag = (userId, version) => weakEtag(`user-${userId}-v${version}`);
 
 /*
  Get details of a specific user, including the aggregated total of all their costs.
 */
-app.get('/api/users/:id', async (req, res) => {
+app.get('/api/users/:id', admission('users:details', 'high'), async (req, res) => {
   try {
     // Parse and validate the user id from the URL path.
     const userId = Number(req.params.id);
@@ -87,29 +239,19 @@ app.get('/api/users/:id', async (req, res) => {
       return res.status(400).json({ id: 400, message: 'Invalid user id' });
     }
 
-    // Retrieve the user document from the database.
-    const user = await User.findOne({ id: userId });
-    if (!user) {
-      return res.status(404).json({ id: 404, message: 'User not found' });
+    // A matching If-None-Match is answered from the totals version alone.
+    if (isConditional(req) && sendNotModified(req, res, userEtag(userId, await getUserVersion(userId)), 'user')) {
+      return res;
     }
 
-    // Retrieve all cost entries for the user and sum their values.
-    const costs = await Cost.find({ userid: userId }).select('sum');
-    let total = 0;
-    costs.forEach((c) => {
-      total += Number(c.sum) || 0;
-    });
-
-    // Round the total to two decimal places and return it as a number.
-    const totalRounded = Number(total.toFixed(2));
+    // Retrieve the user and the running total (joining an identical lookup in flight).
+    const details = await userDetailsFlight.do(userId, () => loadUserDetails(userId));
+    if (!details) {
+      return res.status(404).json({ id: 404, message: 'User not found' });
+    }
+    setEtag(res, userEtag(userId, details.version));
 
-    // Return only the required user fields and the computed total.
-    return res.json({
-      first_name: user.first_name,
-      last_name: user.last_name,
-      id: user.id,
-      total: totalRounded
-    });
+    return sendJson(res, serializers.userDetails, details);
   } catch (err) {
     // Handle aggregation or database errors.
     console.error(err);
@@ -117,14 +259,65 @@ app.get('/api/users/:id', async (req, res) => {
   }
 });
 
+// Page size limits for GET /api/users (paged requests, see below).
+const DEFAULT_PAGE_SIZE = 1000;
+const MAX_PAGE_SIZE = 5000;
+
+// Fields a client may request with ?fields=.
+const USER_FIELDS = ['id', 'first_name', 'last_name', 'birthday'];
+
 /*
- List all users stored in the system.
+ List users ordered by id, one page at a time.
+ - limit / cursor: keyset pagination on the unique numeric id (X-Next-Cursor header).
+   Without either parameter every user is returned, as before pagination existed.
+ - fields: comma-separated projection (id, first_name, last_name, birthday).
+ - format=ndjson: stream every user as newline-delimited JSON at constant memory.
 */
-app.get('/api/users', async (req, res) => {
+app.get('/api/users', admission('users:list', 'normal'), async (req, res) => {
   try {
-    // Retrieve all users while excluding MongoDB internal fields.
-    const users = await User.find({}).select('-_id -__v');
-    return res.json(users);
+    // Build the projection; the id is always read because it is the page key.
+    const fields = req.query.fields
+      ? String(req.query.fields).split(',').map((f) => f.trim()).filter(Boolean)
+      : USER_FIELDS;
+    if (fields.length === 0 || fields.some((f) => !USER_FIELDS.includes(f))) {
+      return res.status(400).json({ id: 400, message: 'Invalid fields' });
+    }
+    const projection = Object.fromEntries([['_id', 0], ['id', 1], ...fields.map((f) => [f, 1])]);
+    const serializer = userSerializer(USER_FIELDS.filter((f) => fields.includes(f)));
+
+    const filter = {};
+    if (req.query.cursor !== undefined) {
+      const cursor = decodeCursor(req.query.cursor);
+      if (!cursor || !Number.isFinite(cursor.id)) {
+        return res.status(400).json({ id: 400, message: 'Invalid cursor' });
+      }
+      filter.id = { $gt: cursor.id };
+    }
+
+    if (req.query.format === 'ndjson') {
+      const cursor = User.find(filter, projection).sort({ id: 1 }).lean().cursor();
+      return streamNdjson(res, cursor, serializer.one);
+    }
+
+    // Unpaged request (existing clients): the complete list in one response.
+    if (req.query.limit === undefined && req.query.cursor === undefined) {
+      const users = await User.find(filter, projection).sort({ id: 1 }).lean();
+      return sendJson(res, serializer.many, users);
+    }
+
+    const limit = parseLimit(req.query.limit, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE);
+    if (limit === null) {
+      return res.status(400).json({ id: 400, message: 'Invalid limit' });
+    }
+
+    // Fetch one extra row to know whether another page exists.
+    const rows = await User.find(filter, projection).sort({ id: 1 }).limit(limit + 1).lean();
+    const page = rows.slice(0, limit);
+    if (rows.length > limit) {
+      res.set('X-Next-Cursor', encodeCursor({ id: page[page.length - 1].id }));
+    }
+
+    return sendJson(res, serializer.many, page);
   } catch (err) {
     // Handle query errors.
     console.error(err);
@@ -138,8 +331,9 @@ app.get('/api/users', async (req, res) => {
 if (process.env.NODE_ENV === 'test') {
   app.delete('/removeuser', async (req, res) => {
     try {
-      // Remove test users by logical user id.
+      // Remove test users by logical user id (and from the existence cache of a gateway process).
       await User.deleteMany({ id: Number(req.body.id) });
+      forgetUser(Number(req.body.id));
       return res.json({ status: 'success' });
     } catch (err) {
       console.error(err);
@@ -151,7 +345,9 @@ if (process.env.NODE_ENV === 'test') {
 // Select port from environment variables with a fallback for local development.
 const PORT = process.env.PORT || process.env.PORT_USERS || 3001;
 
-// Connect to MongoDB and start the service after a successful connection.
-connectDb().then(() => {
-  app.listen(PORT, () => console.log(`Users Service running on port ${PORT}`));
-});
+// Start the service when run directly (not when mounted by the gateway or a test).
+if (require.main === module) {
+  startService({ name: 'Users Service', key: 'users', app, port: PORT });
+}
+
+module.exports = { app };
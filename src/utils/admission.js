@@ -0,0 +1,154 @@
+// Admission control: per-route concurrency limits and priority-based load shedding (503 + Retry-After).
+const dotenv = require('dotenv');
+const { monitorEventLoopDelay } = require('perf_hooks');
+const { registry, getPoolState } = require('./metrics');
+const { registerStats } = require('./diagnostics');
+const { onShutdown, ORDER } = require('./shutdown');
+
+dotenv.config();
+
+/*
+ * Admission Control
+ *
+ * Under a spike, accepting every request only lets handlers queue up on the
+ * MongoDB pool until all of them time out. Each guarded route therefore has:
+ * - a concurrency limit: requests beyond it are rejected immediately;
+ * - a priority class that decides how much overload it tolerates:
+ *     high    cheap reads (cached reports, user details)
+ *     normal  single writes, listings
+ *     low     bulk writes, exports, log scans
+ *
+ * Overload is measured from the event-loop lag (p99 of the last
+ * ADMISSION_LAG_WINDOW_MS) and the MongoDB pool wait (oldest pending checkout,
+ * or the last checkout within the window), relative to ADMISSION_MAX_LAG_MS and
+ * ADMISSION_MAX_POOL_WAIT_MS. Low-priority requests are shed from 1x the
+ * thresholds, normal ones from 2x and high ones from 4x. Rejected requests get
+ * 503 with Retry-After before any body parsing or database work.
+ * Health, readiness and metrics endpoints are never guarded.
+ */
+const PRIORITIES = { high: 4, normal: 2, low: 1 };
+
+const admissionConfig = {
+  enabled: process.env.ADMISSION_ENABLED !== 'false',
+  maxLagMs: Number(process.env.ADMISSION_MAX_LAG_MS) || 200,
+  maxPoolWaitMs: Number(process.env.ADMISSION_MAX_POOL_WAIT_MS) || 500,
+  lagWindowMs: Number(process.env.ADMISSION_LAG_WINDOW_MS) || 1000,
+  retryAfterSeconds: Number(process.env.ADMISSION_RETRY_AFTER_SECONDS) || 2,
+  // Default concurrency limit per route by priority class.
+  concurrency: {
+    high: Number(process.env.ADMISSION_CONCURRENCY_HIGH) || 512,
+    normal: Number(process.env.ADMISSION_CONCURRENCY_NORMAL) || 128,
+    low: Number(process.env.ADMISSION_CONCURRENCY_LOW) || 8
+  }
+};
+
+const shed = registry.counter('admission_shed_total', 'Requests rejected by admission control by route, priority and reason');
+const admitted = registry.counter('admission_admitted_total', 'Requests admitted by route and priority');
+const inFlightGauge = registry.gauge('admission_in_flight', 'Admitted requests in progress by route');
+const loadGauge = registry.gauge('admission_load', 'Current overload signals in milliseconds by signal');
+
+const routes = new Map();
+let lagMs = 0;
+let sampler = null;
+
+// Sample the event-loop lag p99 once per window (the histogram is reset every time).
+function startLagSampler() {
+  if (sampler) return;
+  const histogram = monitorEventLoopDelay({ resolution: 10 });
+  histogram.enable();
+  sampler = setInterval(() => {
+    lagMs = histogram.percentile(99) / 1e6;
+    histogram.reset();
+  }, admissionConfig.lagWindowMs);
+  sampler.unref();
+  onShutdown('admission lag sampler', () => {
+    clearInterval(sampler);
+    histogram.disable();
+  }, ORDER.BACKGROUND);
+}
+
+// Current pool wait: the oldest pending checkout, or the last completed one if recent.
+function poolWaitMs() {
+  const pool = getPoolState();
+  const recent = Date.now() - pool.lastWaitAt <= admissionConfig.lagWindowMs ? pool.lastWaitMs : 0;
+  return Math.max(pool.oldestWaitMs, recent);
+}
+
+// Overload as a multiple of the thresholds, with the signal that dominates.
+function currentLoad() {
+  const lagLoad = lagMs / admissionConfig.maxLagMs;
+  const poolLoad = poolWaitMs() / admissionConfig.maxPoolWaitMs;
+  return lagLoad >= poolLoad
+    ? { level: lagLoad, reason: 'event_loop_lag' }
+    : { level: poolLoad, reason: 'pool_wait' };
+}
+
+// Reject a request with 503 and a Retry-After hint.
+function reject(res, route, priority, reason) {
+  shed.inc({ route, priority, reason });
+  routes.get(route).shed++;
+  res.set('Retry-After', String(admissionConfig.retryAfterSeconds));
+  return res.status(503).json({ id: 503, message: 'Service is overloaded, retry later' });
+}
+
+/*
+ Create the admission middleware of one route (share the instance between the
+ "/path" and "/path/" registrations). Options: { limit } overrides the
+ concurrency limit of the priority class.
+*/
+function admission(route, priority = 'normal', { limit } = {}) {
+  if (!PRIORITIES[priority]) {
+    throw new Error(`Unknown admission priority: ${priority}`);
+  }
+  const state = {
+    priority,
+    limit: limit || admissionConfig.concurrency[priority],
+    inFlight: 0,
+    shed: 0
+  };
+  routes.set(route, state);
+  startLagSampler();
+
+  return (req, res, next) => {
+    if (!admissionConfig.enabled) {
+      return next();
+    }
+    if (state.inFlight >= state.limit) {
+      return reject(res, route, priority, 'concurrency');
+    }
+    const load = currentLoad();
+    if (load.level >= PRIORITIES[priority]) {
+      return reject(res, route, priority, load.reason);
+    }
+
+    state.inFlight++;
+    admitted.inc({ route, priority });
+    let released = false;
+    const release = () => {
+      if (!released) {
+        released = true;
+        state.inFlight--;
+      }
+    };
+    res.on('finish', release);
+    res.on('close', release);
+    return next();
+  };
+}
+
+registry.addCollector(() => {
+  for (const [route, state] of routes) {
+    inFlightGauge.set({ route }, state.inFlight);
+  }
+  loadGauge.set({ signal: 'event_loop_lag' }, lagMs);
+  loadGauge.set({ signal: 'pool_wait' }, poolWaitMs());
+});
+
+registerStats('admission', () => ({
+  ...admissionConfig,
+  lagMs,
+  poolWaitMs: poolWaitMs(),
+  routes: Object.fromEntries(routes)
+}));
+
+module.exports = { PRIORITIES, admissionConfig, admission };
@@ -0,0 +1,105 @@
+// Spending analytics: totals, averages and top expenses over a range of months, read from monthly_totals.
+const MonthlyTotal = require('../models/monthly_total_model');
+const CATEGORIES = require('./categories');
+const { MAX_RANGE_MONTHS, toMonthIndex, fromMonthIndex, buildRangeMatch } = require('./report_engine');
+const { TOP_ITEMS } = require('./user_totals');
+
+/*
+ * Analytics from Rollups
+ *
+ * Trend charts need per-month and per-category sums, not the cost items.
+ * Those sums are already maintained incrementally in "monthly_totals" (one
+ * small document per user-month, see user_totals.js), so a range of N months
+ * for U users reads at most N * U documents with one indexed query instead of
+ * scanning the cost history. Top expenses come from the per-month top lists.
+ * Months without costs are reported with zero totals.
+ */
+
+// Largest number of users per analytics request.
+const MAX_ANALYTICS_USERS = 100;
+
+const round = (value) => Number(value.toFixed(2));
+
+// The monthly_totals documents of users over the months from..to (inclusive).
+const buildAnalyticsQuery = (userIds, from, to) => MonthlyTotal.find(buildRangeMatch({ $in: userIds }, from, to))
+  .select('userid year month total count categories top -_id');
+
+/*
+ Compute the analytics of users over the months from..to (inclusive).
+ `topN` (at most ROLLUP_TOP_ITEMS) limits the list of the largest expenses.
+*/
+async function computeAnalytics(userIds, from, to, topN = TOP_ITEMS) {
+  const start = toMonthIndex(from);
+  const end = toMonthIndex(to);
+  if (end < start) {
+    throw new Error('Invalid analytics range');
+  }
+  if (end - start + 1 > MAX_RANGE_MONTHS) {
+    throw new Error(`Analytics range cannot exceed ${MAX_RANGE_MONTHS} months`);
+  }
+  const months = end - start + 1;
+
+  const rows = await buildAnalyticsQuery(userIds, from, to).lean();
+
+  // Zero-filled accumulators for every month, category and user of the request.
+  const monthly = [];
+  for (let i = start; i <= end; i++) {
+    const { year, month } = fromMonthIndex(i);
+    monthly.push({ year, month, total: 0, count: 0, categories: Object.fromEntries(CATEGORIES.map((cat) => [cat, 0])) });
+  }
+  const categories = new Map(CATEGORIES.map((cat) => [cat, { total: 0, count: 0 }]));
+  const users = new Map(userIds.map((userid) => [userid, { userid, total: 0, count: 0 }]));
+  let top = [];
+
+  for (const row of rows) {
+    const entry = monthly[toMonthIndex(row) - start];
+    entry.total += row.total || 0;
+    entry.count += row.count || 0;
+
+    for (const [cat, sums] of Object.entries(row.categories || {})) {
+      if (!categories.has(cat)) continue;
+      categories.get(cat).total += sums.total || 0;
+      categories.get(cat).count += sums.count || 0;
+      entry.categories[cat] += sums.total || 0;
+    }
+
+    const user = users.get(row.userid);
+    user.total += row.total || 0;
+    user.count += row.count || 0;
+
+    for (const item of row.top || []) {
+      top.push({ userid: row.userid, year: row.year, month: row.month, ...item });
+    }
+  }
+
+  const total = monthly.reduce((sum, entry) => sum + entry.total, 0);
+  const count = monthly.reduce((sum, entry) => sum + entry.count, 0);
+  top = top.sort((a, b) => b.sum - a.sum).slice(0, Math.min(topN, TOP_ITEMS));
+
+  return {
+    userids: userIds,
+    from,
+    to,
+    months,
+    total: round(total),
+    count,
+    monthlyAverage: round(total / months),
+    itemAverage: count ? round(total / count) : 0,
+    categories: [...categories].map(([category, sums]) => ({
+      category,
+      total: round(sums.total),
+      count: sums.count,
+      monthlyAverage: round(sums.total / months),
+      share: total > 0 ? round(sums.total / total) : 0
+    })),
+    monthly: monthly.map((entry) => ({
+      ...entry,
+      total: round(entry.total),
+      categories: Object.fromEntries(Object.entries(entry.categories).map(([cat, sum]) => [cat, round(sum)]))
+    })),
+    users: [...users.values()].map((user) => ({ ...user, total: round(user.total) })),
+    top
+  };
+}
+
+module.exports = { MAX_ANALYTICS_USERS, buildAnalyticsQuery, computeAnalytics };
@@ -0,0 +1,65 @@
+// Bulk insert helpers: chunked, unordered insertMany with per-item results.
+const dotenv = require('dotenv');
+
+dotenv.config();
+
+/*
+ * Bulk endpoints validate items first, then insert the valid ones with
+ * unordered insertMany calls of BULK_CHUNK_SIZE documents. A failing document
+ * (e.g. a duplicate key) does not stop the rest of its chunk; the write errors
+ * are mapped back to the position of the item in the request.
+ */
+const bulkConfig = {
+  chunkSize: Number(process.env.BULK_CHUNK_SIZE) || 1000,
+  maxItems: Number(process.env.BULK_MAX_ITEMS) || 10000,
+  jsonLimit: process.env.BULK_JSON_LIMIT || '10mb'
+};
+
+// Extract driver write errors from an insertMany failure (empty when it was not a write error).
+function getWriteErrors(err) {
+  if (Array.isArray(err.writeErrors)) return err.writeErrors;
+  if (err.writeErrors) return [err.writeErrors];
+  if (err.result && typeof err.result.getWriteErrors === 'function') return err.result.getWriteErrors();
+  return [];
+}
+
+/*
+ Insert already validated documents without hydration or schema validation.
+ Returns { inserted: docs, failures: Map(position -> error) } where position
+ is the index in `docs`.
+*/
+async function insertManyUnordered(Model, docs) {
+  const failures = new Map();
+  if (docs.length === 0) {
+    return { inserted: [], failures };
+  }
+
+  try {
+    await Model.insertMany(docs, { ordered: false, lean: true });
+  } catch (err) {
+    const writeErrors = getWriteErrors(err);
+    if (writeErrors.length === 0) {
+      throw err;
+    }
+    for (const writeError of writeErrors) {
+      failures.set(writeError.index, writeError);
+    }
+  }
+
+  return { inserted: docs.filter((doc, i) => !failures.has(i)), failures };
+}
+
+// Build the response of a bulk request: 201 when every item succeeded, 207 otherwise.
+function sendBulkResult(res, results) {
+  const inserted = results.filter((r) => r.status === 'created').length;
+  const failed = results.length - inserted;
+
+  return res.status(failed === 0 ? 201 : 207).json({
+    total: results.length,
+    inserted,
+    failed,
+    results
+  });
+}
+
+module.exports = { bulkConfig, insertManyUnordered, sendBulkResult };
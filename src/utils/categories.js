@@ -0,0 +1,4 @@
+// Shared list of cost categories allowed by the project specification.
+const CATEGORIES = ['food', 'health', 'housing', 'sports', 'education'];
+
+module.exports = CATEGORIES;
@@ -0,0 +1,146 @@
+// Response compression: negotiated brotli/gzip encoding of large response bodies (built on zlib).
+const zlib = require('zlib');
+const dotenv = require('dotenv');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+
+dotenv.config();
+
+/*
+ * Response Compression
+ *
+ * Bodies sent with res.send()/res.json() (and NDJSON streams, see ndjson.js)
+ * are compressed when the client accepts it and the body is at least
+ * COMPRESSION_THRESHOLD_BYTES large; small bodies are sent as they are, because
+ * the encoding overhead outweighs the saved bytes. Brotli is preferred when
+ * the client accepts both. Buffered bodies are compressed on the zlib thread
+ * pool (async), so large listings do not block the event loop.
+ *
+ * A strong ETag becomes weak when the body is compressed (the bytes differ
+ * from the identity representation). Responses that already carry a
+ * Content-Encoding or Cache-Control: no-transform are left untouched.
+ */
+const compressionConfig = {
+  enabled: process.env.COMPRESSION_ENABLED !== 'false',
+  thresholdBytes: Number(process.env.COMPRESSION_THRESHOLD_BYTES) || 1024,
+  brotli: process.env.COMPRESSION_BROTLI !== 'false',
+  // Brotli's default quality (11) is meant for static assets; 4 suits dynamic responses.
+  brotliQuality: Number(process.env.COMPRESSION_BROTLI_QUALITY) || 4,
+  gzipLevel: Number(process.env.COMPRESSION_GZIP_LEVEL) || zlib.constants.Z_DEFAULT_COMPRESSION
+};
+
+// Content types worth compressing (JSON, NDJSON, CSV, text, Prometheus metrics).
+const COMPRESSIBLE = /^\s*(application\/(json|x-ndjson)|text\/)/i;
+
+const compressedBytes = registry.counter('http_compressed_bytes_total', 'Response body bytes before/after compression by encoding');
+const stats = { compressed: 0, skippedSmall: 0, errors: 0 };
+
+// Pick the encoding for a request: 'br', 'gzip' or null (identity).
+function negotiateEncoding(req) {
+  const offered = compressionConfig.brotli ? ['br', 'gzip', 'identity'] : ['gzip', 'identity'];
+  const encoding = req.acceptsEncodings(offered);
+  return encoding === 'br' || encoding === 'gzip' ? encoding : null;
+}
+
+const brotliOptions = (sizeHint) => ({
+  params: {
+    [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+    [zlib.constants.BROTLI_PARAM_QUALITY]: compressionConfig.brotliQuality,
+    ...(sizeHint ? { [zlib.constants.BROTLI_PARAM_SIZE_HINT]: sizeHint } : {})
+  }
+});
+
+// Whether the response may be compressed at all (type, status, existing encoding).
+function isCompressible(res) {
+  const type = res.get('Content-Type');
+  return !res.get('Content-Encoding') &&
+    !/no-transform/i.test(res.get('Cache-Control') || '') &&
+    res.statusCode >= 200 && res.statusCode !== 204 && res.statusCode !== 304 &&
+    (!type || COMPRESSIBLE.test(type));
+}
+
+// Set the headers of a compressed representation.
+function setEncodingHeaders(res, encoding) {
+  res.set('Content-Encoding', encoding);
+  const etag = res.get('ETag');
+  if (etag && !etag.startsWith('W/')) {
+    res.set('ETag', `W/${etag}`);
+  }
+}
+
+/*
+ Return a compressing Transform for a streamed response (null when the client
+ does not accept compression), after setting the response headers.
+*/
+function compressStream(req, res) {
+  if (!compressionConfig.enabled || req.method === 'HEAD' || !isCompressible(res)) {
+    return null;
+  }
+  res.vary('Accept-Encoding');
+  const encoding = negotiateEncoding(req);
+  if (!encoding) {
+    return null;
+  }
+  setEncodingHeaders(res, encoding);
+  stats.compressed++;
+  return encoding === 'br'
+    ? zlib.createBrotliCompress(brotliOptions())
+    : zlib.createGzip({ level: compressionConfig.gzipLevel });
+}
+
+// Middleware: compress buffered bodies passed to res.send() (res.json() ends up there too).
+function compression() {
+  return (req, res, next) => {
+    if (!compressionConfig.enabled || req.method === 'HEAD') {
+      return next();
+    }
+
+    const send = res.send;
+    res.send = function (body) {
+      if ((typeof body !== 'string' && !Buffer.isBuffer(body)) || !isCompressible(this)) {
+        return send.call(this, body);
+      }
+
+      const size = Buffer.byteLength(body);
+      if (size < compressionConfig.thresholdBytes) {
+        stats.skippedSmall++;
+        return send.call(this, body);
+      }
+
+      this.vary('Accept-Encoding');
+      const encoding = negotiateEncoding(req);
+      if (!encoding) {
+        return send.call(this, body);
+      }
+
+      // A string sent without a type would become text/html in res.send(); keep that for the buffer.
+      if (typeof body === 'string' && !this.get('Content-Type')) {
+        this.type('html');
+      }
+
+      const done = (err, compressed) => {
+        if (err) {
+          stats.errors++;
+          console.error('Response compression failed:', err.message);
+          return send.call(this, body);
+        }
+        stats.compressed++;
+        compressedBytes.inc({ encoding, stage: 'in' }, size);
+        compressedBytes.inc({ encoding, stage: 'out' }, compressed.length);
+        setEncodingHeaders(this, encoding);
+        return send.call(this, compressed);
+      };
+      if (encoding === 'br') {
+        zlib.brotliCompress(body, brotliOptions(size), done);
+      } else {
+        zlib.gzip(body, { level: compressionConfig.gzipLevel }, done);
+      }
+      return this;
+    };
+    return next();
+  };
+}
+
+registerStats('compression', () => ({ ...compressionConfig, ...stats }));
+
+module.exports = { compressionConfig, compression, compressStream, negotiateEncoding };
@@ -1,5 +1,7 @@
 const mongoose = require('mongoose');
 const dotenv = require('dotenv');
+const { onShutdown, ORDER } = require('./shutdown');
+const { instrumentMongoPool } = require('./metrics');
 
 dotenv.config();
 
@@ -24,25 +26,108 @@ if (!MONGODB_URI) {
 }
 
 /*
-//
+ * Connection Settings
+ *
+ * Every option can be set globally (MONGODB_<OPTION>) or per service
+ * (MONGODB_<SERVICE>_<OPTION>, e.g. MONGODB_LOGS_READ_PREFERENCE), so a
+ * read-heavy service can use a larger pool or read from secondaries while
+ * the others keep the defaults. Unset options keep the driver defaults.
+ */
+const readSetting = (service, option) => {
+  const scoped = service ? process.env[`MONGODB_${service.toUpperCase()}_${option}`] : undefined;
+  const value = scoped !== undefined && scoped !== '' ? scoped : process.env[`MONGODB_${option}`];
+  return value === undefined || value === '' ? undefined : value;
+};
+
+const readNumber = (service, option) => {
+  const value = Number(readSetting(service, option));
+  return Number.isFinite(value) ? value : undefined;
+};
+
+// Build the mongoose.connect options of a service (undefined values are dropped).
+function buildConnectOptions(service) {
+  const compressors = readSetting(service, 'COMPRESSORS');
+  const options = {
+    serverSelectionTimeoutMS: readNumber(service, 'SERVER_SELECTION_TIMEOUT_MS') || 5000,
+    maxPoolSize: readNumber(service, 'MAX_POOL_SIZE'),
+    minPoolSize: readNumber(service, 'MIN_POOL_SIZE'),
+    maxIdleTimeMS: readNumber(service, 'MAX_IDLE_TIME_MS'),
+    socketTimeoutMS: readNumber(service, 'SOCKET_TIMEOUT_MS'),
+    // zlib is built in; snappy/zstd need their optional driver packages.
+    compressors: compressors ? compressors.split(',').map((c) => c.trim()).filter(Boolean) : undefined,
+    readPreference: readSetting(service, 'READ_PREFERENCE')
+  };
+  return Object.fromEntries(Object.entries(options).filter(([, value]) => value !== undefined));
+}
+
+// Startup retry policy: exponential backoff between attempts, capped per wait.
+const retryConfig = {
+  retries: Number(process.env.MONGODB_CONNECT_RETRIES) || 5,
+  backoffMs: Number(process.env.MONGODB_CONNECT_BACKOFF_MS) || 1000,
+  maxBackoffMs: Number(process.env.MONGODB_CONNECT_MAX_BACKOFF_MS) || 30000
+};
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Log connection state changes after startup (the driver reconnects on its own).
+let listenersInstalled = false;
+function watchConnection() {
+  if (listenersInstalled) return;
+  listenersInstalled = true;
+  mongoose.connection.on('disconnected', () => console.error('MongoDB disconnected'));
+  mongoose.connection.on('reconnected', () => console.log('MongoDB reconnected'));
+}
+
+/*
+ Open a driver client with its pool metrics attached before connecting, so the
+ connections created during the handshake are counted too, and hand it to
+ the default mongoose connection. A failed attempt closes its client.
+*/
+async function openClient(options) {
+  const client = new mongoose.mongo.MongoClient(MONGODB_URI, options);
+  instrumentMongoPool(client);
+  try {
+    await client.connect();
+  } catch (err) {
+    await client.close().catch(() => {});
+    throw err;
+  }
+  mongoose.connection.setClient(client);
+}
+
+/*
  * Connect to MongoDB using Mongoose.
  *
- * - Uses async/await for clean asynchronous flow
- * - Wrapped in try/catch to handle connection errors gracefully
- * - Throws the error so the calling service can fail explicitly
+ * - `service` selects per-service connection settings (users, costs, logs, admin, gateway)
+ * - Failed attempts are retried with exponential backoff (MONGODB_CONNECT_RETRIES)
+ * - Pool usage (in-use/available connections, checkout wait) is tracked for /metrics
+ * - Throws the last error so the calling service can fail explicitly
  */
-const connectDb = async () => {
+const connectDb = async (service) => {
   try {
-//
     if (!MONGODB_URI) {
       throw new Error('Missing MONGODB_URI');
     }
 
-  await mongoose.connect(MONGODB_URI, {
-  serverSelectionTimeoutMS: 5000
-});
+    const options = buildConnectOptions(service);
+    for (let attempt = 0; ; attempt++) {
+      try {
+        await openClient(options);
+        break;
+      } catch (err) {
+        if (attempt >= retryConfig.retries) {
+          throw err;
+        }
+        const delay = Math.min(retryConfig.backoffMs * 2 ** attempt, retryConfig.maxBackoffMs);
+        console.error(`MongoDB connection attempt ${attempt + 1} failed (${err.message}), retrying in ${delay}ms`);
+        await sleep(delay);
+      }
+    }
+
+    watchConnection();
 
-//
+    // Close the connection last during graceful shutdown.
+    onShutdown('mongodb', () => mongoose.disconnect(), ORDER.DATABASE);
 
     console.log('MongoDB connected successfully');
   } catch (error) {
@@ -51,5 +136,10 @@ const connectDb = async () => {
   }
 };
 
+// Readiness of the shared connection (1 = connected).
+const isDbConnected = () => mongoose.connection.readyState === 1;
+
 //
 module.exports = connectDb;
+module.exports.buildConnectOptions = buildConnectOptions;
+module.exports.isDbConnected = isDbConnected;
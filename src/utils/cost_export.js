@@ -0,0 +1,150 @@
+// Cost export: streams cost items as CSV or NDJSON from a MongoDB cursor (optionally gzip-compressed).
+const zlib = require('zlib');
+const dotenv = require('dotenv');
+const { Transform, pipeline } = require('stream');
+const Cost = require('../models/cost_model');
+const { costSource } = require('./cost_storage');
+const { toNdjson } = require('./ndjson');
+const { serializers } = require('./serializers');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+
+dotenv.config();
+
+/*
+ * Cost Export (GET /api/export)
+ *
+ * The full history of one user (or of all users) is read with a single
+ * aggregation cursor, ordered along the compound cost index
+ * { userid, year, month } so MongoDB never sorts in memory. Rows flow through
+ * stream.pipeline (cursor -> CSV/NDJSON transform -> gzip -> response), which
+ * pauses the cursor whenever the client reads slower than the database
+ * delivers. Memory use is bounded by the cursor batch and the stream buffers,
+ * regardless of the number of rows, and every row is serialized in its own
+ * small step so other requests keep being served.
+ */
+const exportConfig = {
+  batchSize: Number(process.env.EXPORT_BATCH_SIZE) || 1000,
+  gzip: process.env.EXPORT_GZIP !== 'false',
+  gzipLevel: Number(process.env.EXPORT_GZIP_LEVEL) || zlib.constants.Z_DEFAULT_COMPRESSION
+};
+
+const FORMATS = ['csv', 'ndjson'];
+
+// Exported columns (same fields and order as the cost serializer).
+const COLUMNS = ['userid', 'createdAt', 'year', 'month', 'day', 'description', 'category', 'sum'];
+
+const exportCount = registry.counter('cost_exports_total', 'Cost exports by format and outcome');
+const exportedRows = registry.counter('cost_export_rows_total', 'Cost rows written by exports');
+let active = 0;
+
+/*
+ Build the export pipeline for an optional user and [from, to) createdAt range.
+ The year bounds let the index skip other years (and whole buckets in bucket mode);
+ the exact range is applied to createdAt.
+*/
+function buildExportPipeline({ userId, from, to }, source = costSource()) {
+  const match = {};
+  if (userId !== undefined) {
+    match.userid = userId;
+  }
+  if (from || to) {
+    match.year = {};
+    if (from) match.year.$gte = Cost.deriveDateParts(from).year;
+    if (to) match.year.$lte = Cost.deriveDateParts(to).year;
+  }
+
+  const createdAt = source.field('createdAt').slice(1);
+  const range = {};
+  if (from) range.$gte = from;
+  if (to) range.$lt = to;
+
+  return [
+    { $match: match },
+    { $sort: { userid: 1, year: 1, month: 1 } },
+    ...source.unwind,
+    ...(from || to ? [{ $match: { [createdAt]: range } }] : []),
+    {
+      $project: {
+        _id: 0,
+        userid: 1,
+        createdAt: source.field('createdAt'),
+        year: 1,
+        month: 1,
+        day: source.field('day'),
+        description: source.field('description'),
+        category: source.field('category'),
+        sum: source.field('sum')
+      }
+    }
+  ];
+}
+
+// Quote a CSV field when it contains a separator, quote or line break (RFC 4180).
+function csvField(value) {
+  if (value === undefined || value === null) return '';
+  const text = value instanceof Date ? value.toISOString() : String(value);
+  return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+}
+
+// Create a Transform stream that writes a header line and one CSV line per row.
+function toCsv() {
+  let header = false;
+  return new Transform({
+    writableObjectMode: true,
+    transform(row, encoding, callback) {
+      let line = header ? '' : `${COLUMNS.join(',')}\r\n`;
+      header = true;
+      line += COLUMNS.map((column) => csvField(row[column])).join(',') + '\r\n';
+      callback(null, line);
+    },
+    flush(callback) {
+      // An empty export still gets its header line.
+      callback(null, header ? '' : `${COLUMNS.join(',')}\r\n`);
+    }
+  });
+}
+
+// Count rows passing through without touching them.
+const countRows = () => new Transform({
+  objectMode: true,
+  transform(row, encoding, callback) {
+    exportedRows.inc();
+    callback(null, row);
+  }
+});
+
+/*
+ Stream an export to the response.
+ Options: { userId, from, to, format: 'csv' | 'ndjson', gzip, filename }.
+*/
+function streamExport(res, options) {
+  const cursor = costSource().Model
+    .aggregate(buildExportPipeline(options))
+    .allowDiskUse(true)
+    .cursor({ batchSize: exportConfig.batchSize });
+
+  const stages = [cursor, countRows(), options.format === 'csv' ? toCsv() : toNdjson(serializers.cost)];
+  res.status(200).type(options.format === 'csv' ? 'text/csv' : 'application/x-ndjson');
+  res.set('Content-Disposition', `attachment; filename="${options.filename}"`);
+  res.vary('Accept-Encoding');
+  if (options.gzip) {
+    res.set('Content-Encoding', 'gzip');
+    stages.push(zlib.createGzip({ level: exportConfig.gzipLevel }));
+  }
+
+  active++;
+  pipeline(...stages, res, (err) => {
+    active--;
+    exportCount.inc({ format: options.format, outcome: err ? 'aborted' : 'completed' });
+    if (err) {
+      // Headers are already sent; the truncated stream signals the failure.
+      console.error('Cost export stream failed:', err.message);
+      cursor.close().catch(() => {});
+    }
+  });
+}
+
+registerStats('costExport', () => ({ ...exportConfig, active }));
+
+module.exports = { FORMATS, exportConfig, buildExportPipeline, streamExport };
@@ -0,0 +1,207 @@
+// Cost storage: writes and reads cost items as single documents or in per-user-month buckets.
+const dotenv = require('dotenv');
+const mongoose = require('mongoose');
+const Cost = require('../models/cost_model');
+const CostBucket = require('../models/cost_bucket_model');
+const { insertManyUnordered } = require('./bulk_insert');
+
+dotenv.config();
+
+/*
+ * Storage Modes (COST_STORAGE_MODE)
+ *
+ * - documents (default)  one document per cost item in "costs"
+ * - buckets              items appended to "cost_buckets", one bucket per
+ *                        (userid, year, month) with up to COST_BUCKET_SIZE items
+ *
+ * The services only use the functions below and the aggregation source
+ * (costSource), so the public API responses are identical in both modes.
+ * Existing data is moved with src/scripts/migrate_costs_to_buckets.js.
+ */
+const costStorage = {
+  mode: process.env.COST_STORAGE_MODE === 'buckets' ? 'buckets' : 'documents',
+  bucketSize: Number(process.env.COST_BUCKET_SIZE) || 200
+};
+
+const isBucketMode = () => costStorage.mode === 'buckets';
+
+/*
+ Where aggregations read cost items from: the model, the stages that turn the
+ stored documents into one row per item, and the path of an item field.
+ `totalField` and `countField` sum all items of the stored documents (user totals).
+ Defaults to the configured mode; the query plan audit asks for both.
+*/
+function costSource(mode = costStorage.mode) {
+  if (mode === 'buckets') {
+    return {
+      Model: CostBucket,
+      unwind: [{ $unwind: '$items' }],
+      field: (name) => `$items.${name}`,
+      totalField: '$total',
+      countField: '$count'
+    };
+  }
+  return {
+    Model: Cost,
+    unwind: [],
+    field: (name) => `$${name}`,
+    totalField: '$sum',
+    countField: 1
+  };
+}
+
+// Turn a bucket item back into the cost shape of the API.
+const toCost = (bucket, item) => ({
+  _id: item._id,
+  userid: bucket.userid,
+  createdAt: item.createdAt,
+  year: bucket.year,
+  month: bucket.month,
+  day: item.day,
+  description: item.description,
+  category: item.category,
+  sum: item.sum
+});
+
+// $inc document for items added to (direction 1) or removed from (-1) a bucket.
+function bucketIncrements(items, direction = 1) {
+  const inc = { count: 0, total: 0 };
+  for (const item of items) {
+    inc.count += direction;
+    inc.total += item.sum * direction;
+    inc[`categories.${item.category}.total`] = (inc[`categories.${item.category}.total`] || 0) + item.sum * direction;
+    inc[`categories.${item.category}.count`] = (inc[`categories.${item.category}.count`] || 0) + direction;
+  }
+  return inc;
+}
+
+/*
+ Build bucket append operations for complete cost documents (with year/month/day).
+ Items are grouped per user-month and cut into chunks that fit into one bucket;
+ each chunk is pushed into a bucket with enough free space, or upserts a new one.
+ Returns [{ op, positions }] where positions are the indexes of the chunk's items.
+*/
+function buildAppendOps(costs) {
+  const groups = new Map();
+  costs.forEach((cost, position) => {
+    const key = `${cost.userid}:${cost.year}:${cost.month}`;
+    if (!groups.has(key)) groups.set(key, []);
+    groups.get(key).push(position);
+  });
+
+  const ops = [];
+  for (const positions of groups.values()) {
+    const { userid, year, month } = costs[positions[0]];
+    for (let i = 0; i < positions.length; i += costStorage.bucketSize) {
+      const chunk = positions.slice(i, i + costStorage.bucketSize);
+      const items = chunk.map((p) => {
+        const { _id, description, category, sum, createdAt, day } = costs[p];
+        return { _id, description, category, sum, createdAt, day };
+      });
+      ops.push({
+        positions: chunk,
+        op: {
+          updateOne: {
+            filter: { userid, year, month, count: { $lte: costStorage.bucketSize - items.length } },
+            update: { $push: { items: { $each: items } }, $inc: bucketIncrements(items) },
+            upsert: true,
+            setDefaultsOnInsert: false
+          }
+        }
+      });
+    }
+  }
+  return ops;
+}
+
+// Insert one validated cost item; returns the stored item in the cost shape.
+async function insertCost(value) {
+  if (!isBucketMode()) {
+    return Cost.create(value);
+  }
+
+  const createdAt = value.createdAt || new Date();
+  const cost = { _id: new mongoose.Types.ObjectId(), ...value, createdAt, ...Cost.deriveDateParts(createdAt) };
+  // $push runs no schema validators: validate against the cost schema like Cost.create() does.
+  await new Cost(cost).validate();
+  const [{ op }] = buildAppendOps([cost]);
+  await CostBucket.updateOne(op.updateOne.filter, op.updateOne.update, {
+    upsert: true,
+    setDefaultsOnInsert: false
+  });
+  return cost;
+}
+
+/*
+ Insert complete cost documents (bulk endpoint).
+ Same contract as insertManyUnordered: { inserted, failures: Map(position -> error) }.
+*/
+async function insertCosts(costs) {
+  // Ids are assigned up front, so the inserted items can be referenced (totals top list).
+  const docs = costs.map((cost) => ({ _id: new mongoose.Types.ObjectId(), ...cost }));
+  if (!isBucketMode()) {
+    return insertManyUnordered(Cost, docs);
+  }
+
+  const failures = new Map();
+  if (docs.length === 0) {
+    return { inserted: [], failures };
+  }
+
+  const ops = buildAppendOps(docs);
+  try {
+    await CostBucket.bulkWrite(ops.map((o) => o.op), { ordered: false });
+  } catch (err) {
+    const writeErrors = err.writeErrors || (err.result && err.result.getWriteErrors && err.result.getWriteErrors());
+    if (!writeErrors || writeErrors.length === 0) {
+      throw err;
+    }
+    // A failed append fails every item of its chunk.
+    for (const writeError of [].concat(writeErrors)) {
+      for (const position of ops[writeError.index].positions) {
+        failures.set(position, writeError);
+      }
+    }
+  }
+  return { inserted: docs.filter((doc, i) => !failures.has(i)), failures };
+}
+
+// Remove one cost item by id; returns the removed item (cost shape) or null.
+async function removeCost(id) {
+  if (!isBucketMode()) {
+    return Cost.findOneAndDelete({ _id: id });
+  }
+
+  if (!mongoose.isValidObjectId(id)) {
+    return null;
+  }
+  const itemId = new mongoose.Types.ObjectId(id);
+  const bucket = await CostBucket.findOne({ 'items._id': itemId })
+    .select({ userid: 1, year: 1, month: 1, items: { $elemMatch: { _id: itemId } } })
+    .lean();
+  if (!bucket || !bucket.items || bucket.items.length === 0) {
+    return null;
+  }
+
+  const [item] = bucket.items;
+  const result = await CostBucket.updateOne(
+    { _id: bucket._id, 'items._id': itemId },
+    { $pull: { items: { _id: itemId } }, $inc: bucketIncrements([item], -1) }
+  );
+  return result.modifiedCount === 1 ? toCost(bucket, item) : null;
+}
+
+// Remove all cost items of a user (test cleanup); buckets carry the userid too.
+async function removeUserCosts(userId) {
+  await costSource().Model.deleteMany({ userid: userId });
+}
+
+module.exports = {
+  costStorage,
+  costSource,
+  buildAppendOps,
+  insertCost,
+  insertCosts,
+  removeCost,
+  removeUserCosts
+};
@@ -0,0 +1,77 @@
+// Cost validation: shared input rules for single and bulk cost insertion.
+const CATEGORIES = require('./categories');
+
+// Scalar values Mongoose would cast to a String path (objects and arrays are rejected).
+const isStringLike = (value) => ['string', 'number', 'boolean'].includes(typeof value);
+
+/*
+ * Validate a raw cost item from a request body.
+ * Covers the rules of the cost schema too (string description, sum >= 0), because
+ * the bulk endpoint inserts the normalized items without schema validation.
+ * Returns { value } with normalized fields, or { error } with a client-facing
+ * message. The user-existence check is done separately by the callers, because
+ * bulk requests resolve all referenced users with a single query.
+ */
+function validateCostInput(body) {
+  if (!body || typeof body !== 'object' || Array.isArray(body)) {
+    return { error: 'Invalid cost item' };
+  }
+
+  // Support both userid and user_id.
+  const { description, category, userid, user_id, sum, createdAt } = body;
+  const rawUserId = userid ?? user_id;
+
+  // Validate presence of mandatory fields before any processing.
+  if (!description || !category || rawUserId === undefined || sum === undefined) {
+    return { error: 'Missing required fields' };
+  }
+
+  // Convert user id and sum to numbers and validate numeric correctness.
+  const numericUserId = Number(rawUserId);
+  const numericSum = Number(sum);
+
+  if (!Number.isFinite(numericUserId) || !Number.isFinite(numericSum)) {
+    return { error: 'Invalid numeric fields' };
+  }
+
+  // Same rules as the cost schema: description is a string and sum is not negative.
+  if (!isStringLike(description)) {
+    return { error: 'Invalid description' };
+  }
+  if (numericSum < 0) {
+    return { error: 'Sum cannot be negative' };
+  }
+
+  // Validate category against the predefined list required by the assignment.
+  if (!CATEGORIES.includes(category)) {
+    return { error: 'Invalid category' };
+  }
+
+  // Optional createdAt handling: validate date and ensure it is not in the past.
+  let parsedCreatedAt;
+  if (createdAt) {
+    parsedCreatedAt = new Date(createdAt);
+    if (isNaN(parsedCreatedAt.getTime())) {
+      return { error: 'Invalid createdAt' };
+    }
+
+    const today = new Date();
+    today.setHours(0, 0, 0, 0);
+
+    if (parsedCreatedAt < today) {
+      return { error: 'Cannot add cost in the past' };
+    }
+  }
+
+  return {
+    value: {
+      description: String(description),
+      category,
+      userid: numericUserId,
+      sum: numericSum,
+      ...(parsedCreatedAt ? { createdAt: parsedCreatedAt } : {})
+    }
+  };
+}
+
+module.exports = { validateCostInput };
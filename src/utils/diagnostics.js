@@ -0,0 +1,67 @@
+// Diagnostics utility: collects runtime statistics from shared components and exposes them per service.
+const { registry, requestMetrics, getPoolState } = require('./metrics');
+const { isDbConnected } = require('./connect_db');
+const { isShuttingDown } = require('./shutdown');
+
+/*
+ * Components (log sink, caches, ...) register a named stats source once.
+ * Every service mounts:
+ * - GET /internal/stats  JSON snapshot of all sources registered in the process
+ * - GET /metrics         Prometheus text format of the metrics registry
+ * - GET /healthz         liveness: the process is up and serving requests
+ * - GET /readyz          readiness: 503 while the MongoDB connection is down or
+ *                        the process is shutting down (load balancers stop routing)
+ */
+const sources = new Map();
+
+// Register (or replace) a named stats source returning a plain object.
+function registerStats(name, fn) {
+  sources.set(name, fn);
+}
+
+// Build a snapshot of all registered sources.
+function collectStats() {
+  const snapshot = {};
+  for (const [name, fn] of sources) {
+    snapshot[name] = fn();
+  }
+  return snapshot;
+}
+
+// Mount the liveness and readiness endpoints (also used by the gateway root).
+function mountHealthChecks(app) {
+  app.get('/healthz', (req, res) => {
+    res.json({ status: 'ok', uptimeSec: Math.round(process.uptime()) });
+  });
+
+  app.get('/readyz', (req, res) => {
+    const database = isDbConnected() ? 'connected' : 'disconnected';
+    const ready = database === 'connected' && !isShuttingDown();
+    res.status(ready ? 200 : 503).json({
+      status: ready ? 'ready' : 'not ready',
+      database,
+      shuttingDown: isShuttingDown(),
+      pool: getPoolState()
+    });
+  });
+}
+
+// Mount request metrics and the diagnostics endpoints on an Express application.
+function mountDiagnostics(app) {
+  app.use(requestMetrics);
+  mountHealthChecks(app);
+
+  app.get('/metrics', (req, res) => {
+    res.type('text/plain; version=0.0.4').send(registry.render());
+  });
+
+  app.get('/internal/stats', (req, res) => {
+    res.json({
+      pid: process.pid,
+      uptimeSec: Math.round(process.uptime()),
+      ...collectStats()
+    });
+  });
+}
+
+module.exports = { registerStats, collectStats, mountDiagnostics, mountHealthChecks };
@@ -0,0 +1,70 @@
+// Conditional GET helpers: ETag values and If-None-Match handling (304 Not Modified).
+const dotenv = require('dotenv');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+
+dotenv.config();
+
+/*
+ * Conditional Requests
+ *
+ * Endpoints whose content has a cheap validator set their own ETag:
+ * - strong ETags for immutable documents (persisted reports, keyed by _id);
+ * - weak, version-based ETags for data that changes with every cost item
+ *   (the "version" counter of user_totals / monthly_totals, see user_totals.js).
+ * A request whose If-None-Match matches the current validator is answered with
+ * 304 before the response body is loaded or computed. Other responses keep
+ * Express' default ETag (a hash of the sent body).
+ */
+const etagConfig = {
+  enabled: process.env.ETAG_ENABLED !== 'false'
+};
+
+const notModified = registry.counter('http_not_modified_total', 'Conditional requests answered with 304 by resource');
+const stats = { checked: 0, notModified: 0 };
+
+const strongEtag = (value) => `"${value}"`;
+const weakEtag = (value) => `W/"${value}"`;
+
+// Strip the weak prefix (If-None-Match uses the weak comparison, RFC 9110 13.1.2).
+const opaqueTag = (etag) => etag.trim().replace(/^W\//, '');
+
+// Whether the request's If-None-Match header lists the given ETag (or "*").
+function matchesIfNoneMatch(req, etag) {
+  const header = req.get('If-None-Match');
+  if (!header || !etag) {
+    return false;
+  }
+  const tag = opaqueTag(etag);
+  return header.split(',').some((candidate) => candidate.trim() === '*' || opaqueTag(candidate) === tag);
+}
+
+// Whether a validator lookup is worth doing (ETags enabled and the client sent If-None-Match).
+const isConditional = (req) => etagConfig.enabled && req.get('If-None-Match') !== undefined;
+
+/*
+ Answer with 304 when If-None-Match matches `etag`. Returns true when the
+ response was sent, so the handler can stop before loading the body.
+*/
+function sendNotModified(req, res, etag, resource) {
+  stats.checked++;
+  if (!matchesIfNoneMatch(req, etag)) {
+    return false;
+  }
+  stats.notModified++;
+  notModified.inc({ resource });
+  res.set('ETag', etag);
+  res.status(304).end();
+  return true;
+}
+
+// Set the ETag of a 200 response (ignored when ETags are disabled).
+function setEtag(res, etag) {
+  if (etagConfig.enabled && etag) {
+    res.set('ETag', etag);
+  }
+}
+
+registerStats('etag', () => ({ ...etagConfig, ...stats }));
+
+module.exports = { etagConfig, strongEtag, weakEtag, matchesIfNoneMatch, isConditional, sendNotModified, setEtag };
@@ -1,6 +1,7 @@
 // Utility function: computes or retrieves a monthly cost report for a user.
 const Report = require('../models/report_model');
-const Cost = require('../models/cost_model');
+const { computeMonthlyCosts } = require('./report_engine');
+const { getMonthVersion } = require('./user_totals');
 
 /*
  * Computed Design Pattern (Project Requirement)
@@ -8,12 +9,48 @@ const Cost = require('../models/cost_model');
  * The monthly report is computed on demand from the "costs" collection:
  * 1) If a report already exists in the "reports" collection, return it.
  * 2) Otherwise, compute it by grouping cost items by category and mapping each
- *    item to { sum, description, day }.
+ *    item to { sum, description, day } (server-side, see report_engine.js).
  *
  * To reduce recomputation, the server caches reports ONLY for past months,
  * because the server does not allow adding costs with dates in the past.
+ * Past months are usually precomputed by the report materializer; on a miss the
+ * report is stored with an atomic upsert, so concurrent first requests for the
+ * same month do not fail on the unique {userid, year, month} index.
+ *
+ * A computed report carries the version of its month read before the
+ * computation (ETag validator, see report_cache.js); stored reports carry their _id.
  */
 
+// Whether a report refers to a month before the current one.
+function isPastMonth(year, month) {
+  const now = new Date();
+  return (year < now.getFullYear()) || (year === now.getFullYear() && month < (now.getMonth() + 1));
+}
+
+/*
+ Insert a computed report unless another request stored it first; returns the
+ _id of the stored report (its strong ETag, see report_cache.js).
+ Two concurrent upserts can both miss and insert; the loser gets a duplicate-key
+ error and reads the winner's _id (both computed the same closed month).
+*/
+async function storeReport(report) {
+  const filter = { userid: report.userid, year: report.year, month: report.month };
+  try {
+    const stored = await Report.findOneAndUpdate(
+      filter,
+      { $setOnInsert: { costs: report.costs } },
+      { upsert: true, new: true, projection: { _id: 1 } }
+    ).lean();
+    return stored._id;
+  } catch (err) {
+    if (err.code !== 11000) {
+      throw err;
+    }
+    const stored = await Report.findOne(filter).select('_id').lean();
+    return stored ? stored._id : undefined;
+  }
+}
+
 async function getOrCreateReport(userId, year, month) {
   // Coerce input values to numbers to avoid string/number mismatches.
   const uid = Number(userId);
@@ -26,44 +63,30 @@ async function getOrCreateReport(userId, year, month) {
   }
 
   // Attempt to retrieve a cached report for the given user, year, and month.
-  let report = await Report.findOne({ userid: uid, year: y, month: m });
+  let report = await Report.findOne({ userid: uid, year: y, month: m })
+    .select('userid year month costs')
+    .lean();
 
   // If no cached report exists, compute it from the costs collection.
   if (!report) {
-    // Retrieve all cost items for the specified user and month.
-    const costs = await Cost.find({ userid: uid, year: y, month: m });
+    // Read the version first, so the computed content is at least as new as it.
+    const version = await getMonthVersion(uid, y, m);
 
-    // List of allowed categories as defined by the project requirements.
-    const categories = ['food', 'health', 'housing', 'sports', 'education'];
+    // Group the month's cost items by category inside MongoDB.
+    const formattedCosts = await computeMonthlyCosts(uid, y, m);
 
-    // Build the required JSON structure: an array of category-based cost objects.
-    const formattedCosts = categories.map((cat) => ({
-      [cat]: costs
-        .filter((c) => c.category === cat)
-        .map((c) => ({
-          sum: c.sum,
-          description: c.description,
-          day: c.day
-        }))
-    }));
-
-    // Create a new report instance with the computed data.
-    report = new Report({
+    report = {
       userid: uid,
       year: y,
       month: m,
-      costs: formattedCosts
-    });
-
-    // Determine whether the requested report refers to a past month.
-    const now = new Date();
-    const isPastMonth =
-      (y < now.getFullYear()) ||
-      (y === now.getFullYear() && m < (now.getMonth() + 1));
+      costs: formattedCosts,
+      version
+    };
 
-    // Cache the report only if it refers to a past month.
-    if (isPastMonth) {
-      await report.save();
+    // Cache the report only if it refers to a past month; it is then tagged
+    // by its stored _id, like a report read from the collection.
+    if (isPastMonth(y, m)) {
+      report._id = await storeReport(report);
     }
   }
 
@@ -72,3 +95,4 @@ async function getOrCreateReport(userId, year, month) {
 }
 
 module.exports = getOrCreateReport;
+module.exports.isPastMonth = isPastMonth;
@@ -0,0 +1,182 @@
+// Idempotency middleware: replays the stored response of a retried POST with the same Idempotency-Key.
+const crypto = require('crypto');
+const dotenv = require('dotenv');
+const LruCache = require('./lru_cache');
+const IdempotencyKey = require('../models/idempotency_key_model');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+
+dotenv.config();
+
+/*
+ * Idempotency Keys
+ *
+ * A client that retries a POST after a timeout sends the same Idempotency-Key
+ * header again. The first request claims the key in MongoDB ("pending"), runs
+ * the handler and stores its response ("done"); retries receive that stored
+ * response (header Idempotent-Replayed: true) without running the handler.
+ *
+ * - Completed keys are also kept in a bounded in-memory LRU, so retries that
+ *   reach the same instance are answered without a database round trip.
+ * - The "idempotency_keys" collection (TTL index) makes keys work across instances.
+ * - A retry while the first request is still running gets 409; a key reused
+ *   with a different body gets 422.
+ * - 5xx responses are not stored, so the client can retry them.
+ */
+const idempotencyConfig = {
+  enabled: process.env.IDEMPOTENCY_ENABLED !== 'false',
+  ttlSeconds: Number(process.env.IDEMPOTENCY_TTL_SECONDS) || 24 * 60 * 60,
+  cacheMaxEntries: Number(process.env.IDEMPOTENCY_CACHE_MAX_ENTRIES) || 10000,
+  // A pending key older than this is treated as abandoned (crashed instance).
+  pendingTimeoutMs: Number(process.env.IDEMPOTENCY_PENDING_TIMEOUT_MS) || 60000
+};
+
+const MAX_KEY_LENGTH = 255;
+
+const cache = new LruCache({
+  maxEntries: idempotencyConfig.cacheMaxEntries,
+  ttlMs: idempotencyConfig.ttlSeconds * 1000
+});
+
+const requests = registry.counter('idempotency_requests_total', 'Requests with an Idempotency-Key by scope and outcome');
+
+// Hash of the parts of a request that must match for a replay.
+const fingerprintOf = (req) => crypto
+  .createHash('sha256')
+  .update(`${req.method} ${req.baseUrl}${req.path}\n${JSON.stringify(req.body === undefined ? null : req.body)}`)
+  .digest('hex');
+
+// Send a stored response.
+function replay(res, stored) {
+  res.set('Idempotent-Replayed', 'true');
+  return res.status(stored.statusCode).type('json').send(stored.body);
+}
+
+/*
+ Claim a key in MongoDB. Returns { claimed: true } for the first request,
+ or { stored } / { pending: true } when another request already holds it,
+ or { mismatch: true } when a pending key belongs to a different request.
+*/
+async function claimKey(id, fingerprint) {
+  const now = new Date();
+  try {
+    await IdempotencyKey.create({ _id: id, fingerprint, status: 'pending', lockedAt: now });
+    return { claimed: true };
+  } catch (err) {
+    if (err.code !== 11000) {
+      throw err;
+    }
+  }
+
+  const existing = await IdempotencyKey.findById(id).lean();
+  if (!existing) {
+    // Expired between the insert attempt and the read; let the client retry.
+    return { pending: true };
+  }
+  if (existing.status === 'done') {
+    return { stored: existing };
+  }
+  // Only a retry of the same request may wait for or take over a pending key.
+  if (existing.fingerprint !== fingerprint) {
+    return { mismatch: true };
+  }
+
+  // Take over a key abandoned by a crashed request (compare-and-set on lockedAt).
+  if (now - existing.lockedAt > idempotencyConfig.pendingTimeoutMs) {
+    const result = await IdempotencyKey.updateOne(
+      { _id: id, status: 'pending', fingerprint, lockedAt: existing.lockedAt },
+      { $set: { lockedAt: now } }
+    );
+    if (result.modifiedCount === 1) {
+      return { claimed: true };
+    }
+  }
+  return { pending: true };
+}
+
+// Capture the body passed to res.send() and store it once the response finished.
+function recordResponse(res, id, fingerprint) {
+  let body;
+  const send = res.send;
+  res.send = function (payload) {
+    if (body === undefined) {
+      body = Buffer.isBuffer(payload) ? payload.toString('utf8') : String(payload);
+    }
+    return send.apply(this, arguments);
+  };
+
+  let settled = false;
+  const settle = async (finished) => {
+    if (settled) return;
+    settled = true;
+    try {
+      if (finished && res.statusCode < 500 && body !== undefined) {
+        const stored = { statusCode: res.statusCode, body, fingerprint };
+        cache.set(id, stored);
+        await IdempotencyKey.updateOne({ _id: id }, { $set: { status: 'done', ...stored } });
+      } else {
+        // Failed or aborted: release the key so the client can retry.
+        await IdempotencyKey.deleteOne({ _id: id, status: 'pending' });
+      }
+    } catch (err) {
+      console.error('Failed to store idempotent response:', err.message);
+    }
+  };
+  res.on('finish', () => settle(true));
+  res.on('close', () => settle(res.writableFinished));
+}
+
+// Create the middleware for one service ("scope" keeps keys of the services apart).
+function idempotency(scope) {
+  return async (req, res, next) => {
+    const key = req.get('Idempotency-Key');
+    if (!idempotencyConfig.enabled || key === undefined) {
+      return next();
+    }
+    if (key.length === 0 || key.length > MAX_KEY_LENGTH) {
+      return res.status(400).json({ id: 400, message: `Idempotency-Key must be 1-${MAX_KEY_LENGTH} characters` });
+    }
+
+    const id = `${scope}:${key}`;
+    const fingerprint = fingerprintOf(req);
+    const count = (outcome) => requests.inc({ scope, outcome });
+    const mismatch = () => {
+      count('mismatch');
+      return res.status(422).json({ id: 422, message: 'Idempotency-Key was already used with a different request' });
+    };
+
+    try {
+      let stored = cache.get(id);
+      if (!stored) {
+        const claim = await claimKey(id, fingerprint);
+        if (claim.mismatch) {
+          return mismatch();
+        }
+        if (claim.pending) {
+          count('in_progress');
+          return res.status(409).json({ id: 409, message: 'A request with this Idempotency-Key is still in progress' });
+        }
+        if (claim.claimed) {
+          count('new');
+          recordResponse(res, id, fingerprint);
+          return next();
+        }
+        stored = claim.stored;
+        cache.set(id, { statusCode: stored.statusCode, body: stored.body, fingerprint: stored.fingerprint });
+      }
+
+      if (stored.fingerprint !== fingerprint) {
+        return mismatch();
+      }
+      count('replayed');
+      return replay(res, stored);
+    } catch (err) {
+      console.error(err);
+      return res.status(500).json({ id: 500, message: err.message });
+    }
+  };
+}
+
+registerStats('idempotency', () => ({ ...idempotencyConfig, cache: cache.stats() }));
+
+module.exports = { idempotency, idempotencyConfig };
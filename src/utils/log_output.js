@@ -0,0 +1,74 @@
+// Log output: builds the pino stdout logger for the configured logging mode.
+const pino = require('pino');
+const dotenv = require('dotenv');
+
+dotenv.config();
+
+/*
+ * Logging Modes (LOG_MODE)
+ *
+ * - sync    writes every line synchronously to stdout (simple, nothing is lost on a crash)
+ * - async   buffers lines and writes them in chunks of LOG_BUFFER_BYTES (least CPU on the
+ *           request path; the buffer is flushed on graceful shutdown)
+ * - worker  hands lines to a worker thread that writes stdout (pino transport)
+ * - pretty  human-readable output formatted in a worker thread (pino-pretty, development)
+ *
+ * Without LOG_MODE, NODE_ENV=development uses "pretty" and everything else "sync",
+ * so environments that simply leave NODE_ENV unset no longer pretty-print.
+ *
+ * LOG_SAMPLE_RATE (0..1) keeps only a share of the stdout lines of successful (2xx)
+ * requests; other responses are always logged. Requests are still stored in MongoDB.
+ */
+const MODES = ['sync', 'async', 'worker', 'pretty'];
+
+const defaultMode = process.env.NODE_ENV === 'development' ? 'pretty' : 'sync';
+const sampleRate = Number(process.env.LOG_SAMPLE_RATE);
+
+const outputConfig = {
+  mode: MODES.includes(process.env.LOG_MODE) ? process.env.LOG_MODE : defaultMode,
+  level: process.env.LOG_LEVEL || 'info',
+  bufferBytes: Number(process.env.LOG_BUFFER_BYTES) || 4096,
+  sampleRate: Number.isFinite(sampleRate) ? Math.min(1, Math.max(0, sampleRate)) : 1
+};
+
+if (process.env.LOG_MODE && !MODES.includes(process.env.LOG_MODE)) {
+  console.error(`Unknown LOG_MODE "${process.env.LOG_MODE}", using "${outputConfig.mode}"`);
+}
+
+/*
+ Create a pino logger for a mode. `destination` defaults to stdout (fd 1);
+ the benchmark passes a file path to measure the modes without a terminal.
+*/
+function createLogger({ mode = outputConfig.mode, level = outputConfig.level, destination = 1, bufferBytes = outputConfig.bufferBytes } = {}) {
+  switch (mode) {
+    case 'async':
+      return pino({ level }, pino.destination({ dest: destination, sync: false, minLength: bufferBytes }));
+    case 'worker':
+      return pino({ level }, pino.transport({ target: 'pino/file', options: { destination } }));
+    case 'pretty':
+      return pino({ level }, pino.transport({ target: 'pino-pretty', options: { destination } }));
+    default:
+      return pino({ level }, pino.destination({ dest: destination, sync: true }));
+  }
+}
+
+// Whether the stdout line of a finished request is written (errors are never sampled out).
+function shouldLogRequest(statusCode, rate = outputConfig.sampleRate) {
+  if (statusCode < 200 || statusCode >= 300 || rate >= 1) {
+    return true;
+  }
+  return Math.random() < rate;
+}
+
+// Write buffered lines (async mode) or hand them to the worker before exit.
+function flushLogger(logger) {
+  return new Promise((resolve) => {
+    try {
+      logger.flush(() => resolve());
+    } catch (err) {
+      resolve();
+    }
+  });
+}
+
+module.exports = { MODES, outputConfig, createLogger, shouldLogRequest, flushLogger };
@@ -0,0 +1,185 @@
+// Log rollup job: compacts raw log entries into per-minute aggregates per route.
+const Log = require('../models/log_model');
+const LogRollup = require('../models/log_rollup_model');
+const Checkpoint = require('../models/checkpoint_model');
+const logStorage = require('./log_storage');
+const { onShutdown, ORDER } = require('./shutdown');
+
+/*
+ * Rollup Job
+ *
+ * Raw entries are grouped by (minute, method, route) entirely inside MongoDB:
+ * percentiles with the $percentile accumulator (approximate method, bounded
+ * memory per group; MongoDB 7.0+) and the status-code histogram with a count
+ * per (group, status code), joined into one document per group. No raw values
+ * are collected into arrays, so the memory of a window does not grow with the
+ * number of requests of a route. Results are read with a cursor and written in
+ * bounded batches.
+ * Progress is stored in the "checkpoints" collection, so each minute is
+ * rolled up once and a restarted process resumes from the last window.
+ * Upserts with $set make re-running a window idempotent.
+ */
+const JOB_NAME = 'log-rollup';
+const MINUTE_MS = 60 * 1000;
+
+// Number of minutes aggregated per pipeline run (bounds memory per window).
+const WINDOW_MINUTES = 60;
+
+// Rollup upserts sent per bulkWrite call.
+const WRITE_BATCH_SIZE = 500;
+
+const floorToMinute = (date) => new Date(Math.floor(date.getTime() / MINUTE_MS) * MINUTE_MS);
+
+// Turn one aggregation result into a rollup upsert operation.
+function toRollupOp(group) {
+  const [p50, p95, p99] = group.latency || [];
+  return {
+    updateOne: {
+      filter: { minute: group._id.minute, method: group._id.method, route: group._id.route },
+      update: {
+        $set: {
+          count: group.count,
+          p50: p50 ?? null,
+          p95: p95 ?? null,
+          p99: p99 ?? null,
+          max: group.max ?? null,
+          statusCodes: group.statusCodes || {}
+        }
+      },
+      upsert: true
+    }
+  };
+}
+
+// Rollup key of a raw entry: (minute, method, route).
+function rollupKey() {
+  // Entries written before method/route were recorded fall back to parsing "METHOD /path?query".
+  const msgParts = { $split: ['$msg', ' '] };
+  return {
+    minute: { $subtract: ['$time', { $mod: [{ $toLong: '$time' }, MINUTE_MS] }] },
+    method: { $ifNull: ['$method', { $arrayElemAt: [msgParts, 0] }] },
+    route: {
+      $ifNull: [
+        '$route',
+        { $arrayElemAt: [{ $split: [{ $arrayElemAt: [msgParts, 1] }, '?'] }, 0] }
+      ]
+    }
+  };
+}
+
+/*
+ Pipeline producing one document per (minute, method, route) of [start, end):
+ { _id, count, latency: [p50, p95, p99], max, statusCodes: { "<code>": n } }.
+ The latency part and the status part ($unionWith) are merged per key.
+*/
+function buildRollupPipeline(start, end) {
+  const match = { $match: { time: { $gte: start, $lt: end } } };
+  return [
+    match,
+    {
+      $group: {
+        _id: rollupKey(),
+        count: { $sum: 1 },
+        latency: { $percentile: { input: '$responseTimeMs', p: [0.5, 0.95, 0.99], method: 'approximate' } },
+        max: { $max: '$responseTimeMs' }
+      }
+    },
+    {
+      $unionWith: {
+        coll: Log.collection.name,
+        pipeline: [
+          match,
+          { $match: { statusCode: { $ne: null } } },
+          { $group: { _id: { key: rollupKey(), status: '$statusCode' }, n: { $sum: 1 } } },
+          { $group: { _id: '$_id.key', codes: { $push: { k: { $toString: '$_id.status' }, v: '$n' } } } },
+          { $project: { statusCodes: { $arrayToObject: '$codes' } } }
+        ]
+      }
+    },
+    { $group: { _id: '$_id', rollup: { $mergeObjects: '$$ROOT' } } },
+    { $replaceWith: '$rollup' }
+  ];
+}
+
+// Aggregate raw entries in [start, end) and upsert the resulting rollups in batches.
+async function rollupWindow(start, end) {
+  const cursor = Log.aggregate(buildRollupPipeline(start, end)).allowDiskUse(true).cursor();
+  let ops = [];
+  let rollups = 0;
+  for await (const group of cursor) {
+    ops.push(toRollupOp(group));
+    if (ops.length >= WRITE_BATCH_SIZE) {
+      await LogRollup.bulkWrite(ops, { ordered: false });
+      rollups += ops.length;
+      ops = [];
+    }
+  }
+  if (ops.length > 0) {
+    await LogRollup.bulkWrite(ops, { ordered: false });
+    rollups += ops.length;
+  }
+  return rollups;
+}
+
+/*
+ Roll up every complete minute between the checkpoint and (now - delay).
+ Returns the number of processed minutes and written rollup documents.
+*/
+async function runLogRollup(now = new Date()) {
+  const until = floorToMinute(new Date(now.getTime() - logStorage.rollup.delayMinutes * MINUTE_MS));
+
+  const checkpoint = await Checkpoint.findOne({ job: JOB_NAME }).lean();
+  let start = checkpoint && checkpoint.value ? new Date(checkpoint.value) : null;
+
+  // First run: start at the oldest raw entry.
+  if (!start) {
+    const oldest = await Log.findOne({}).sort({ time: 1 }).select('time').lean();
+    if (!oldest) return { minutes: 0, rollups: 0 };
+    start = floorToMinute(oldest.time);
+  }
+
+  let minutes = 0;
+  let rollups = 0;
+  while (start < until) {
+    const end = new Date(Math.min(start.getTime() + WINDOW_MINUTES * MINUTE_MS, until.getTime()));
+    rollups += await rollupWindow(start, end);
+
+    await Checkpoint.updateOne(
+      { job: JOB_NAME },
+      { $set: { value: end, updatedAt: new Date() } },
+      { upsert: true }
+    );
+
+    // Compaction: raw entries of rolled-up minutes are no longer needed.
+    if (logStorage.rollup.deleteRaw) {
+      await Log.deleteMany({ time: { $gte: start, $lt: end } });
+    }
+
+    minutes += (end - start) / MINUTE_MS;
+    start = end;
+  }
+
+  return { minutes, rollups };
+}
+
+// Run the rollup periodically in the background (one run at a time).
+function startLogRollup() {
+  let running = false;
+
+  const timer = setInterval(async () => {
+    if (running) return;
+    running = true;
+    try {
+      await runLogRollup();
+    } catch (err) {
+      console.error('Log rollup failed:', err);
+    } finally {
+      running = false;
+    }
+  }, logStorage.rollup.intervalMs);
+  timer.unref();
+
+  onShutdown('log rollup', () => clearInterval(timer), ORDER.BACKGROUND);
+}
+
+module.exports = { buildRollupPipeline, runLogRollup, startLogRollup };
@@ -0,0 +1,141 @@
+// Log sink: buffers log entries in memory and persists them in batches with insertMany.
+
+/*
+ * Buffered Log Persistence
+ *
+ * Instead of one Log.create() round trip per HTTP request, entries are queued
+ * and flushed with a single unordered insertMany when either
+ * - the queue reaches `maxBatchSize` entries, or
+ * - `flushIntervalMs` elapsed since the last flush.
+ *
+ * Only one flush is in flight at a time (backpressure). While MongoDB is slow
+ * the queue keeps growing up to `maxQueueSize`; entries beyond that bound are
+ * dropped and counted instead of growing memory without limit.
+ */
+class LogSink {
+  constructor(model, options = {}) {
+    this.model = model;
+    this.maxBatchSize = options.maxBatchSize || 500;
+    this.flushIntervalMs = options.flushIntervalMs || 1000;
+    this.maxQueueSize = options.maxQueueSize || 10000;
+    // Optional callback (batchSize, elapsedMs, persisted) invoked after every flush.
+    this.onFlush = options.onFlush || null;
+
+    this.queue = [];
+    this.timer = null;
+    this.flushing = null;
+    this.closed = false;
+
+    this.counters = {
+      enqueued: 0,
+      persisted: 0,
+      dropped: 0,
+      failed: 0,
+      flushes: 0,
+      lastBatchSize: 0,
+      maxBatchSize: 0,
+      lastFlushMs: 0,
+      maxFlushMs: 0,
+      totalFlushMs: 0
+    };
+  }
+
+  // Start the periodic flush timer (does not keep the process alive).
+  start() {
+    if (!this.timer) {
+      this.timer = setInterval(() => this.flush(), this.flushIntervalMs);
+      this.timer.unref();
+    }
+    return this;
+  }
+
+  // Queue a log entry. Returns false when the entry was dropped.
+  push(entry) {
+    if (this.closed || this.queue.length >= this.maxQueueSize) {
+      this.counters.dropped++;
+      return false;
+    }
+
+    this.queue.push(entry);
+    this.counters.enqueued++;
+
+    if (this.queue.length >= this.maxBatchSize) {
+      this.flush();
+    }
+    return true;
+  }
+
+  // Flush queued entries; concurrent callers share the in-flight flush.
+  flush() {
+    if (!this.flushing && this.queue.length > 0) {
+      this.flushing = this._flushLoop().finally(() => {
+        this.flushing = null;
+      });
+    }
+    return this.flushing || Promise.resolve();
+  }
+
+  // Write full batches until the queue is empty (or holds only a partial batch when not closing).
+  async _flushLoop() {
+    do {
+      const batch = this.queue.splice(0, this.maxBatchSize);
+      await this._writeBatch(batch);
+    } while (this.queue.length >= this.maxBatchSize || (this.closed && this.queue.length > 0));
+  }
+
+  async _writeBatch(batch) {
+    const start = process.hrtime.bigint();
+    let persisted = batch.length;
+
+    try {
+      await this.model.insertMany(batch, { ordered: false, lean: true });
+    } catch (err) {
+      // Unordered inserts keep going after a failed entry; count what was written.
+      const inserted = err.insertedDocs ? err.insertedDocs.length : (err.result && err.result.insertedCount);
+      persisted = Number.isFinite(inserted) ? inserted : 0;
+      console.error('Failed to write log batch:', err.message);
+    }
+
+    const elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+    const c = this.counters;
+    c.flushes++;
+    c.persisted += persisted;
+    c.failed += batch.length - persisted;
+    c.lastBatchSize = batch.length;
+    c.maxBatchSize = Math.max(c.maxBatchSize, batch.length);
+    c.lastFlushMs = elapsedMs;
+    c.maxFlushMs = Math.max(c.maxFlushMs, elapsedMs);
+    c.totalFlushMs += elapsedMs;
+
+    if (this.onFlush) {
+      this.onFlush(batch.length, elapsedMs, persisted);
+    }
+  }
+
+  // Stop accepting entries and persist everything still queued.
+  async drain() {
+    this.closed = true;
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+    if (this.flushing) {
+      await this.flushing;
+    }
+    await this.flush();
+  }
+
+  // Snapshot of queue state and counters (flush latency, batch size, dropped entries).
+  stats() {
+    const c = this.counters;
+    return {
+      ...c,
+      queued: this.queue.length,
+      maxQueueSize: this.maxQueueSize,
+      avgBatchSize: c.flushes ? (c.persisted + c.failed) / c.flushes : 0,
+      avgFlushMs: c.flushes ? c.totalFlushMs / c.flushes : 0
+    };
+  }
+}
+
+module.exports = LogSink;
@@ -0,0 +1,34 @@
+// Log storage policy: reads retention, capped-collection and rollup settings from the environment.
+const dotenv = require('dotenv');
+
+dotenv.config();
+
+/*
+ * Environment variables:
+ * - LOG_STORAGE_MODE=standard|capped   capped collections keep only the newest entries
+ * - LOG_CAPPED_SIZE_MB, LOG_CAPPED_MAX_DOCS   bounds of the capped collection
+ * - LOG_TTL_DAYS   expire raw entries after N days (standard mode only;
+ *                  MongoDB does not support TTL indexes on capped collections)
+ * - LOG_ROLLUP_ENABLED=true   run the per-minute rollup job in the logs service
+ * - LOG_ROLLUP_INTERVAL_MS    how often the rollup job runs
+ * - LOG_ROLLUP_DELAY_MINUTES  only minutes older than this are rolled up
+ *                             (leaves room for buffered, late-arriving entries)
+ * - LOG_ROLLUP_DELETE_RAW=true   delete raw entries once rolled up (standard mode only)
+ */
+const mode = process.env.LOG_STORAGE_MODE === 'capped' ? 'capped' : 'standard';
+
+const logStorage = {
+  mode,
+  ttlDays: mode === 'standard' ? Number(process.env.LOG_TTL_DAYS) || 0 : 0,
+  cappedSizeBytes: (Number(process.env.LOG_CAPPED_SIZE_MB) || 256) * 1024 * 1024,
+  cappedMaxDocs: Number(process.env.LOG_CAPPED_MAX_DOCS) || 0,
+
+  rollup: {
+    enabled: process.env.LOG_ROLLUP_ENABLED === 'true',
+    intervalMs: Number(process.env.LOG_ROLLUP_INTERVAL_MS) || 60000,
+    delayMinutes: Number(process.env.LOG_ROLLUP_DELAY_MINUTES) || 5,
+    deleteRaw: mode === 'standard' && process.env.LOG_ROLLUP_DELETE_RAW === 'true'
+  }
+};
+
+module.exports = logStorage;
@@ -1,23 +1,59 @@
 // Logger utility: configures pino and provides middleware for HTTP request logging.
-const pino = require('pino');
 const os = require('os');
 const Log = require('../models/log_model');
+const LogSink = require('./log_sink');
+const { onShutdown, ORDER } = require('./shutdown');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+const { outputConfig, createLogger, shouldLogRequest, flushLogger } = require('./log_output');
 
-// Create a pino logger instance.
-// In non-production environments, use pretty printing for readability.
-const logger = pino({
-  level: 'info',
-  ...(process.env.NODE_ENV !== 'production'
-    ? { transport: { target: 'pino-pretty' } }
-    : {})
+// Create the pino stdout logger for the configured mode (sync, async, worker or pretty).
+const logger = createLogger();
+
+// The hostname does not change while the process runs.
+const HOSTNAME = os.hostname();
+
+// Log sink metrics: flush latency and batch size histograms, queue and drop gauges.
+const flushDuration = registry.histogram('log_sink_flush_duration_seconds', 'Duration of log batch inserts');
+const batchSize = registry.histogram(
+  'log_sink_batch_size',
+  'Entries per log batch insert',
+  [1, 10, 50, 100, 250, 500, 1000, 5000]
+);
+const sinkQueue = registry.gauge('log_sink_queue_size', 'Log entries waiting to be persisted');
+const sinkEntries = registry.gauge('log_sink_entries', 'Log entries by outcome since process start');
+
+// Buffered sink that persists log entries with batched insertMany calls.
+const logSink = new LogSink(Log, {
+  maxBatchSize: Number(process.env.LOG_SINK_BATCH_SIZE) || 500,
+  flushIntervalMs: Number(process.env.LOG_SINK_FLUSH_INTERVAL_MS) || 1000,
+  maxQueueSize: Number(process.env.LOG_SINK_MAX_QUEUE) || 10000,
+  onFlush: (size, elapsedMs) => {
+    flushDuration.observe({}, elapsedMs / 1000);
+    batchSize.observe({}, size);
+  }
+}).start();
+
+registry.addCollector(() => {
+  const stats = logSink.stats();
+  sinkQueue.set({}, stats.queued);
+  sinkEntries.set({ outcome: 'persisted' }, stats.persisted);
+  sinkEntries.set({ outcome: 'dropped' }, stats.dropped);
+  sinkEntries.set({ outcome: 'failed' }, stats.failed);
 });
 
+// Persist queued entries and flush buffered stdout lines before the process exits.
+onShutdown('log sink', () => logSink.drain(), ORDER.LOG_SINK);
+onShutdown('stdout logger', () => flushLogger(logger), ORDER.LOG_SINK);
+registerStats('logSink', () => logSink.stats());
+registerStats('logOutput', () => ({ ...outputConfig }));
+
 /*
  * Logs every HTTP request and persists it in MongoDB.
  *
  * The middleware is intentionally non-blocking:
- * logging to the database is performed asynchronously so that
- * request handling and response times are not affected.
+ * entries are queued in the log sink and written in batches,
+ * so request handling and response times are not affected.
  */
 const logMiddleware = (req, res, next) => {
   // Capture the start time of the request to compute response duration.
@@ -27,21 +63,28 @@ const logMiddleware = (req, res, next) => {
   res.on('finish', () => {
     const responseTimeMs = Date.now() - startTime;
 
-    // Write a concise log entry to stdout using pino.
-    logger.info(`${req.method} ${req.originalUrl} ${res.statusCode} ${responseTimeMs}ms`);
+    // Write a structured entry to stdout (successful requests may be sampled).
+    if (shouldLogRequest(res.statusCode)) {
+      logger.info({
+        method: req.method,
+        url: req.originalUrl,
+        statusCode: res.statusCode,
+        responseTimeMs
+      }, 'request completed');
+    }
 
-    // Persist the log entry to MongoDB without blocking the HTTP response.
-    Log.create({
+    // Queue the log entry; the sink persists it to MongoDB in the background.
+    logSink.push({
       level: 'info',
       time: new Date(),
       msg: `${req.method} ${req.originalUrl}`,
       pid: process.pid,
-      hostname: os.hostname(),
+      hostname: HOSTNAME,
       statusCode: res.statusCode,
-      responseTimeMs
-    }).catch((err) => {
-      // Log database write failures to the console without interrupting execution.
-      console.error('Failed to write log:', err);
+      responseTimeMs,
+      method: req.method,
+      // Route pattern keeps rollups low-cardinality (ids are not part of the key).
+      route: req.route ? req.baseUrl + req.route.path : '(unmatched)'
     });
   });
 
@@ -49,5 +92,5 @@ const logMiddleware = (req, res, next) => {
   next();
 };
 
-// Export both the raw logger and the middleware for use across services.
-module.exports = { logger, logMiddleware };
+// Export the raw logger, the middleware and the sink for use across services.
+module.exports = { logger, logMiddleware, logSink };
@@ -0,0 +1,88 @@
+// LRU cache: bounded in-memory key/value store with per-entry TTL and hit/miss/eviction counters.
+
+/*
+ * A Map keeps insertion order, so re-inserting a key on every hit moves it
+ * to the "most recently used" end; the first key is always the eviction
+ * candidate. Expired entries are removed lazily when they are read.
+ */
+class LruCache {
+  constructor({ maxEntries = 1000, ttlMs = 60000 } = {}) {
+    this.maxEntries = maxEntries;
+    this.ttlMs = ttlMs;
+    this.map = new Map();
+    this.counters = { hits: 0, misses: 0, evictions: 0, expired: 0, invalidations: 0 };
+  }
+
+  // Return the cached value or undefined (counts a hit or a miss).
+  get(key) {
+    const entry = this.map.get(key);
+    if (!entry) {
+      this.counters.misses++;
+      return undefined;
+    }
+    if (entry.expiresAt <= Date.now()) {
+      this.map.delete(key);
+      this.counters.expired++;
+      this.counters.misses++;
+      return undefined;
+    }
+
+    // Refresh recency.
+    this.map.delete(key);
+    this.map.set(key, entry);
+    this.counters.hits++;
+    return entry.value;
+  }
+
+  // Return the value without touching recency or counters.
+  peek(key) {
+    const entry = this.map.get(key);
+    return entry && entry.expiresAt > Date.now() ? entry.value : undefined;
+  }
+
+  // Store a value, evicting the least recently used entries beyond maxEntries.
+  set(key, value, ttlMs = this.ttlMs) {
+    this.map.delete(key);
+    this.map.set(key, { value, expiresAt: Date.now() + ttlMs });
+
+    while (this.map.size > this.maxEntries) {
+      this.map.delete(this.map.keys().next().value);
+      this.counters.evictions++;
+    }
+  }
+
+  // Replace the value of an existing entry, keeping its expiry time.
+  replace(key, value) {
+    const entry = this.map.get(key);
+    if (entry) {
+      entry.value = value;
+    }
+  }
+
+  delete(key) {
+    if (this.map.delete(key)) {
+      this.counters.invalidations++;
+    }
+  }
+
+  clear() {
+    this.counters.invalidations += this.map.size;
+    this.map.clear();
+  }
+
+  get size() {
+    return this.map.size;
+  }
+
+  stats() {
+    const { hits, misses } = this.counters;
+    return {
+      ...this.counters,
+      size: this.map.size,
+      maxEntries: this.maxEntries,
+      hitRate: hits + misses ? hits / (hits + misses) : 0
+    };
+  }
+}
+
+module.exports = LruCache;
@@ -0,0 +1,274 @@
+// Metrics registry: in-process counters, gauges and histograms exposed in Prometheus text format.
+const { monitorEventLoopDelay } = require('perf_hooks');
+
+/*
+ * Metrics
+ *
+ * A minimal Prometheus-compatible registry without external dependencies.
+ * - Counter / Gauge / Histogram hold one series per label combination.
+ * - Collectors run right before each scrape to refresh gauges that mirror
+ *   state owned by other components (log queue, caches, connection pool).
+ * - render() produces the text exposition format served at GET /metrics.
+ */
+
+// Default latency buckets in seconds (1ms .. 10s).
+const DEFAULT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+// Serialize a label object as {a="1",b="2"} (sorted keys, escaped values).
+function formatLabels(labels) {
+  const keys = Object.keys(labels).sort();
+  if (keys.length === 0) return '';
+  const parts = keys.map((k) => `${k}="${String(labels[k]).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n')}"`);
+  return `{${parts.join(',')}}`;
+}
+
+class Metric {
+  constructor(name, help, type) {
+    this.name = name;
+    this.help = help;
+    this.type = type;
+    this.series = new Map();
+  }
+
+  // Return the series state for a label combination, creating it on first use.
+  _series(labels, init) {
+    const key = formatLabels(labels);
+    let entry = this.series.get(key);
+    if (!entry) {
+      entry = { labels, ...init() };
+      this.series.set(key, entry);
+    }
+    return entry;
+  }
+
+  header() {
+    return `# HELP ${this.name} ${this.help}\n# TYPE ${this.name} ${this.type}\n`;
+  }
+}
+
+class Counter extends Metric {
+  constructor(name, help) {
+    super(name, help, 'counter');
+  }
+
+  inc(labels = {}, value = 1) {
+    this._series(labels, () => ({ value: 0 })).value += value;
+  }
+
+  render() {
+    let out = this.header();
+    for (const [key, s] of this.series) out += `${this.name}${key} ${s.value}\n`;
+    return out;
+  }
+}
+
+class Gauge extends Metric {
+  constructor(name, help) {
+    super(name, help, 'gauge');
+  }
+
+  set(labels = {}, value = 0) {
+    this._series(labels, () => ({ value: 0 })).value = value;
+  }
+
+  inc(labels = {}, value = 1) {
+    this._series(labels, () => ({ value: 0 })).value += value;
+  }
+
+  dec(labels = {}, value = 1) {
+    this.inc(labels, -value);
+  }
+
+  render() {
+    let out = this.header();
+    for (const [key, s] of this.series) out += `${this.name}${key} ${s.value}\n`;
+    return out;
+  }
+}
+
+class Histogram extends Metric {
+  constructor(name, help, buckets = DEFAULT_BUCKETS) {
+    super(name, help, 'histogram');
+    this.buckets = [...buckets].sort((a, b) => a - b);
+  }
+
+  observe(labels = {}, value) {
+    const s = this._series(labels, () => ({ counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 }));
+    for (let i = 0; i < this.buckets.length; i++) {
+      if (value <= this.buckets[i]) {
+        s.counts[i]++;
+        break;
+      }
+    }
+    s.sum += value;
+    s.count++;
+  }
+
+  // Start a timer; calling the returned function observes the elapsed seconds.
+  startTimer(labels = {}) {
+    const start = process.hrtime.bigint();
+    return (extraLabels = {}) => {
+      this.observe({ ...labels, ...extraLabels }, Number(process.hrtime.bigint() - start) / 1e9);
+    };
+  }
+
+  render() {
+    let out = this.header();
+    for (const s of this.series.values()) {
+      let cumulative = 0;
+      this.buckets.forEach((le, i) => {
+        cumulative += s.counts[i];
+        out += `${this.name}_bucket${formatLabels({ ...s.labels, le })} ${cumulative}\n`;
+      });
+      out += `${this.name}_bucket${formatLabels({ ...s.labels, le: '+Inf' })} ${s.count}\n`;
+      out += `${this.name}_sum${formatLabels(s.labels)} ${s.sum}\n`;
+      out += `${this.name}_count${formatLabels(s.labels)} ${s.count}\n`;
+    }
+    return out;
+  }
+}
+
+class Registry {
+  constructor() {
+    this.metrics = new Map();
+    this.collectors = [];
+  }
+
+  // Register a metric once; later calls with the same name return the existing instance.
+  _register(name, create) {
+    if (!this.metrics.has(name)) this.metrics.set(name, create());
+    return this.metrics.get(name);
+  }
+
+  counter(name, help) {
+    return this._register(name, () => new Counter(name, help));
+  }
+
+  gauge(name, help) {
+    return this._register(name, () => new Gauge(name, help));
+  }
+
+  histogram(name, help, buckets) {
+    return this._register(name, () => new Histogram(name, help, buckets));
+  }
+
+  // Add a function that refreshes gauges right before every scrape.
+  addCollector(fn) {
+    this.collectors.push(fn);
+  }
+
+  render() {
+    for (const collect of this.collectors) {
+      try {
+        collect();
+      } catch (err) {
+        console.error('Metrics collector failed:', err.message);
+      }
+    }
+    return [...this.metrics.values()].map((m) => m.render()).join('');
+  }
+}
+
+const registry = new Registry();
+
+/*
+ * Process metrics: event-loop lag and memory usage.
+ */
+const eventLoopDelay = monitorEventLoopDelay({ resolution: 20 });
+eventLoopDelay.enable();
+
+const eventLoopLag = registry.gauge('nodejs_eventloop_lag_seconds', 'Event loop delay since the previous scrape');
+const memory = registry.gauge('nodejs_memory_bytes', 'Process memory usage by type');
+
+registry.addCollector(() => {
+  // perf_hooks reports nanoseconds.
+  eventLoopLag.set({ quantile: '0.5' }, eventLoopDelay.percentile(50) / 1e9);
+  eventLoopLag.set({ quantile: '0.99' }, eventLoopDelay.percentile(99) / 1e9);
+  eventLoopLag.set({ quantile: '1' }, eventLoopDelay.max / 1e9);
+  eventLoopDelay.reset();
+
+  const usage = process.memoryUsage();
+  memory.set({ type: 'heap_used' }, usage.heapUsed);
+  memory.set({ type: 'heap_total' }, usage.heapTotal);
+  memory.set({ type: 'rss' }, usage.rss);
+  memory.set({ type: 'external' }, usage.external);
+});
+
+/*
+ * HTTP request metrics (mounted for every service by mountDiagnostics).
+ */
+const httpDuration = registry.histogram(
+  'http_request_duration_seconds',
+  'HTTP request latency by method, route and status code'
+);
+
+const requestMetrics = (req, res, next) => {
+  const end = httpDuration.startTimer();
+  res.on('finish', () => {
+    end({
+      method: req.method,
+      route: req.route ? req.baseUrl + req.route.path : '(unmatched)',
+      status: res.statusCode
+    });
+  });
+  next();
+};
+
+/*
+ * MongoDB connection pool metrics from the driver's CMAP events.
+ * Checkout wait time is measured from "check out started" to "checked out";
+ * checkouts are served in FIFO order, so the oldest pending start is matched.
+ */
+const poolConnections = registry.gauge('mongodb_pool_connections', 'Connections in the MongoDB pool by state');
+const poolWaitQueue = registry.gauge('mongodb_pool_wait_queue', 'Operations waiting for a pooled connection');
+const poolWait = registry.histogram('mongodb_pool_wait_seconds', 'Time spent waiting for a pooled connection');
+
+const poolState = { total: 0, inUse: 0, pendingStarts: [], lastWaitMs: 0, lastWaitAt: 0 };
+
+function instrumentMongoPool(client) {
+  client.on('connectionCreated', () => { poolState.total++; });
+  client.on('connectionClosed', () => { poolState.total = Math.max(0, poolState.total - 1); });
+  client.on('connectionCheckOutStarted', () => { poolState.pendingStarts.push(process.hrtime.bigint()); });
+
+  const finishCheckout = (success) => {
+    const start = poolState.pendingStarts.shift();
+    if (start !== undefined) {
+      const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+      poolState.lastWaitMs = seconds * 1000;
+      poolState.lastWaitAt = Date.now();
+      poolWait.observe({ outcome: success ? 'ok' : 'failed' }, seconds);
+    }
+  };
+  client.on('connectionCheckedOut', () => {
+    poolState.inUse++;
+    finishCheckout(true);
+  });
+  client.on('connectionCheckOutFailed', () => finishCheckout(false));
+  client.on('connectionCheckedIn', () => { poolState.inUse = Math.max(0, poolState.inUse - 1); });
+}
+
+registry.addCollector(() => {
+  poolConnections.set({ state: 'in_use' }, poolState.inUse);
+  poolConnections.set({ state: 'available' }, Math.max(0, poolState.total - poolState.inUse));
+  poolWaitQueue.set({}, poolState.pendingStarts.length);
+});
+
+// Snapshot of the pool state (used by readiness and admission checks).
+const getPoolState = () => ({
+  total: poolState.total,
+  inUse: poolState.inUse,
+  waiting: poolState.pendingStarts.length,
+  lastWaitMs: poolState.lastWaitMs,
+  lastWaitAt: poolState.lastWaitAt,
+  // How long the oldest pending checkout has been waiting so far.
+  oldestWaitMs: poolState.pendingStarts.length
+    ? Number(process.hrtime.bigint() - poolState.pendingStarts[0]) / 1e6
+    : 0
+});
+
+module.exports = {
+  registry,
+  requestMetrics,
+  instrumentMongoPool,
+  getPoolState
+};
@@ -0,0 +1,58 @@
+// NDJSON helpers: stream a MongoDB cursor to an HTTP response as newline-delimited JSON.
+const readline = require('readline');
+const { Transform, pipeline } = require('stream');
+const { compressStream } = require('./compression');
+
+/*
+ * The cursor is piped through a Transform that writes one serialized document
+ * per line (precompiled serializers, see serializers.js). stream.pipeline
+ * propagates backpressure, so only a small window of documents is in memory.
+ * The stream is compressed when the client accepts it (see compression.js).
+ */
+
+// Create a Transform stream that writes each document as one JSON line.
+function toNdjson(serialize = JSON.stringify) {
+  return new Transform({
+    writableObjectMode: true,
+    transform(doc, encoding, callback) {
+      callback(null, serialize(doc) + '\n');
+    }
+  });
+}
+
+// Pipe a cursor to the response as application/x-ndjson.
+function streamNdjson(res, cursor, serialize) {
+  res.status(200).type('application/x-ndjson');
+
+  const compressor = compressStream(res.req, res);
+  const stages = [cursor, toNdjson(serialize), ...(compressor ? [compressor] : [])];
+  pipeline(...stages, res, (err) => {
+    if (err) {
+      // Headers are already sent; the truncated stream signals the failure.
+      console.error('NDJSON stream failed:', err.message);
+      cursor.close().catch(() => {});
+    }
+  });
+}
+
+/*
+ Read a request body as newline-delimited JSON, one parsed value per line.
+ Yields { value } or { error } per non-empty line, so callers can report
+ per-line parse failures without aborting the whole upload.
+*/
+async function * readNdjson(readable) {
+  const lines = readline.createInterface({ input: readable, crlfDelay: Infinity });
+  for await (const line of lines) {
+    if (!line.trim()) continue;
+    try {
+      yield { value: JSON.parse(line) };
+    } catch (err) {
+      yield { error: 'Invalid JSON line' };
+    }
+  }
+}
+
+// Whether a request body is sent as NDJSON.
+const isNdjsonRequest = (req) => Boolean(req.is(['application/x-ndjson', 'application/ndjson']));
+
+module.exports = { toNdjson, streamNdjson, readNdjson, isNdjsonRequest };
@@ -0,0 +1,34 @@
+// Pagination helpers: page-size parsing and opaque keyset cursors.
+
+/*
+ * Keyset (cursor) pagination
+ *
+ * A cursor encodes the sort key of the last returned item as base64url JSON.
+ * The next page continues strictly after that key, so every page is an
+ * index range scan regardless of how deep the client paginates.
+ */
+
+// Parse a "limit" query value and clamp it to [1, max]; returns null when invalid.
+function parseLimit(value, defaultLimit, maxLimit) {
+  if (value === undefined || value === '') return defaultLimit;
+  const n = Number(value);
+  if (!Number.isInteger(n) || n < 1) return null;
+  return Math.min(n, maxLimit);
+}
+
+// Encode a plain object as an opaque cursor string.
+function encodeCursor(obj) {
+  return Buffer.from(JSON.stringify(obj)).toString('base64url');
+}
+
+// Decode a cursor string; returns null when it is malformed.
+function decodeCursor(cursor) {
+  try {
+    const obj = JSON.parse(Buffer.from(String(cursor), 'base64url').toString('utf8'));
+    return obj && typeof obj === 'object' ? obj : null;
+  } catch (err) {
+    return null;
+  }
+}
+
+module.exports = { parseLimit, encodeCursor, decodeCursor };
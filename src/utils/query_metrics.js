@@ -0,0 +1,63 @@
+// Mongoose plugin: records the duration of every query, aggregation and insert in a histogram.
+const { registry } = require('./metrics');
+
+/*
+ * Applied to every schema (schema.plugin(queryMetrics)) before the model is compiled.
+ * Batched inserts are measured by their callers (e.g. the log sink flush latency).
+ * Pre hooks store a start time on the query/aggregate/model object; post hooks
+ * (success and error variants) observe the elapsed time labelled by model,
+ * operation and outcome.
+ */
+const queryDuration = registry.histogram(
+  'mongodb_query_duration_seconds',
+  'MongoDB operation latency by model, operation and outcome'
+);
+
+const QUERY_OPS = [
+  'count', 'countDocuments', 'estimatedDocumentCount', 'distinct',
+  'find', 'findOne', 'findOneAndDelete', 'findOneAndReplace', 'findOneAndUpdate',
+  'deleteMany', 'deleteOne', 'replaceOne', 'updateMany', 'updateOne'
+];
+
+const START = Symbol('queryMetricsStart');
+
+function observe(target, modelName, op, outcome) {
+  const start = target[START];
+  if (start === undefined) return;
+  target[START] = undefined;
+  queryDuration.observe({ model: modelName, op, outcome }, Number(process.hrtime.bigint() - start) / 1e9);
+}
+
+function queryMetrics(schema) {
+  const markStart = function () {
+    this[START] = process.hrtime.bigint();
+  };
+
+  // Queries: "this" is the Query.
+  schema.pre(QUERY_OPS, markStart);
+  schema.post(QUERY_OPS, function () {
+    observe(this, this.model.modelName, this.op, 'ok');
+  });
+  schema.post(QUERY_OPS, function (err, res, next) {
+    observe(this, this.model.modelName, this.op, 'error');
+    next(err);
+  });
+
+  // Aggregations: "this" is the Aggregate.
+  schema.pre('aggregate', markStart);
+  schema.post('aggregate', function () {
+    observe(this, this._model.modelName, 'aggregate', 'ok');
+  });
+  schema.post('aggregate', function (err, res, next) {
+    observe(this, this._model.modelName, 'aggregate', 'error');
+    next(err);
+  });
+
+  // Document saves (Model.create): "this" is the document.
+  schema.pre('save', markStart);
+  schema.post('save', function () {
+    observe(this, this.constructor.modelName, 'save', 'ok');
+  });
+}
+
+module.exports = queryMetrics;
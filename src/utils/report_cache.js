@@ -0,0 +1,206 @@
+// Report cache: in-process LRU cache of monthly reports for the costs service.
+const dotenv = require('dotenv');
+const LruCache = require('./lru_cache');
+const SingleFlight = require('./single_flight');
+const getOrCreateReport = require('./get_or_create_report');
+const Cost = require('../models/cost_model');
+const Report = require('../models/report_model');
+const CostBucket = require('../models/cost_bucket_model');
+const { costStorage } = require('./cost_storage');
+const { getMonthVersion } = require('./user_totals');
+const { strongEtag, weakEtag } = require('./etag');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+const { onShutdown, ORDER } = require('./shutdown');
+
+dotenv.config();
+
+/*
+ * Report Cache
+ *
+ * Reports are cached per (userid, year, month), bounded by REPORT_CACHE_MAX_ENTRIES
+ * and REPORT_CACHE_TTL_MS. When a cost is inserted, the matching cached report is
+ * patched in place (the item is appended to its category), so polling dashboards
+ * keep hitting the cache for the current month.
+ *
+ * Computations in flight are tracked per key; an insert marks them stale, so a
+ * report computed before a concurrent insert is returned but never cached.
+ * Concurrent misses for the same key share one computation (single-flight);
+ * an insert detaches it, so requests arriving afterwards compute a fresh report.
+ *
+ * With several instances, REPORT_CACHE_CHANGE_STREAM=true invalidates entries from
+ * a MongoDB change stream on "costs" or "cost_buckets" (requires a replica set, e.g. Atlas).
+ *
+ * ETags: a persisted report never changes and is tagged with its _id (strong);
+ * a computed one with the month version it was computed from (weak). A patched
+ * entry keeps its older version, so its ETag can only miss, never match wrongly.
+ */
+const cacheConfig = {
+  enabled: process.env.REPORT_CACHE_ENABLED !== 'false',
+  maxEntries: Number(process.env.REPORT_CACHE_MAX_ENTRIES) || 1000,
+  ttlMs: Number(process.env.REPORT_CACHE_TTL_MS) || 60000,
+  changeStream: process.env.REPORT_CACHE_CHANGE_STREAM === 'true'
+};
+
+const cache = new LruCache({ maxEntries: cacheConfig.maxEntries, ttlMs: cacheConfig.ttlMs });
+const inFlight = new Map();
+const reportFlight = new SingleFlight('report');
+let changeStreamEvents = 0;
+
+const keyOf = (userid, year, month) => `${userid}:${year}:${month}`;
+
+// Mark computations in flight for a key as stale so they do not overwrite newer data.
+function markStale(key) {
+  reportFlight.forget(key);
+  const tokens = inFlight.get(key);
+  if (tokens) {
+    tokens.forEach((token) => { token.stale = true; });
+  }
+}
+
+// Return a report from the cache, or compute it (and cache it) on a miss.
+async function getReport(userId, year, month) {
+  const key = keyOf(Number(userId), Number(year), Number(month));
+  const compute = () => reportFlight.do(key, () => getOrCreateReport(userId, year, month));
+
+  if (!cacheConfig.enabled) {
+    return compute();
+  }
+
+  const cached = cache.get(key);
+  if (cached) {
+    return cached;
+  }
+
+  const token = { stale: false };
+  const tokens = inFlight.get(key) || new Set();
+  tokens.add(token);
+  inFlight.set(key, tokens);
+
+  try {
+    const report = await compute();
+    if (!token.stale) {
+      cache.set(key, report);
+    }
+    return report;
+  } finally {
+    tokens.delete(token);
+    if (tokens.size === 0) {
+      inFlight.delete(key);
+    }
+  }
+}
+
+// Drop the cached report of a user-month.
+function invalidateReport(userid, year, month) {
+  const key = keyOf(userid, year, month);
+  markStale(key);
+  cache.delete(key);
+}
+
+/*
+ Apply a newly inserted cost to the cached report of its month (copy-on-write),
+ so the cached entry stays valid without recomputation.
+*/
+function patchReport(cost) {
+  const key = keyOf(cost.userid, cost.year, cost.month);
+  markStale(key);
+
+  const cached = cache.peek(key);
+  if (!cached) {
+    return;
+  }
+
+  const item = { sum: cost.sum, description: cost.description, day: cost.day };
+  const costs = cached.costs.map((entry) =>
+    entry[cost.category] ? { [cost.category]: [...entry[cost.category], item] } : entry
+  );
+  cache.replace(key, { ...cached, costs });
+}
+
+// ETag of a report returned by getReport().
+function reportEtag(report) {
+  return report._id
+    ? strongEtag(report._id)
+    : weakEtag(`${report.userid}-${report.year}-${report.month}-v${report.version || 0}`);
+}
+
+/*
+ Current ETag of a report without loading or computing it: from a cached
+ persisted report, the stored report's _id (past months) or the month version.
+*/
+async function currentReportEtag(userId, year, month) {
+  const cached = cacheConfig.enabled ? cache.peek(keyOf(userId, year, month)) : undefined;
+  if (cached && cached._id) {
+    return reportEtag(cached);
+  }
+  if (getOrCreateReport.isPastMonth(year, month)) {
+    const stored = await Report.findOne({ userid: userId, year, month }).select('_id').lean();
+    if (stored) {
+      return strongEtag(stored._id);
+    }
+  }
+  const version = await getMonthVersion(userId, year, month);
+  return reportEtag({ userid: userId, year, month, version });
+}
+
+// Invalidate entries for costs inserted or removed by any instance (change stream mode).
+function startChangeStreamInvalidation() {
+  // Bucket appends are updates; the looked-up bucket tells which user-month changed.
+  const stream = costStorage.mode === 'buckets'
+    ? CostBucket.watch(
+      [
+        { $match: { operationType: { $in: ['insert', 'update', 'delete'] } } },
+        { $project: { 'fullDocument.items': 0 } }
+      ],
+      { fullDocument: 'updateLookup' }
+    )
+    : Cost.watch([{ $match: { operationType: { $in: ['insert', 'delete'] } } }]);
+
+  stream.on('change', (event) => {
+    changeStreamEvents++;
+    const doc = event.fullDocument;
+    if (doc) {
+      invalidateReport(doc.userid, doc.year, doc.month);
+    } else {
+      // Delete events only carry the _id; drop everything to stay correct.
+      inFlight.forEach((tokens, key) => markStale(key));
+      cache.clear();
+    }
+  });
+
+  stream.on('error', (err) => {
+    // Entries still expire by TTL; the cache is never served stale longer than that.
+    console.error('Report cache change stream failed:', err.message);
+  });
+
+  onShutdown('report cache change stream', () => stream.close(), ORDER.BACKGROUND);
+}
+
+registerStats('reportCache', () => ({
+  enabled: cacheConfig.enabled,
+  changeStream: cacheConfig.changeStream,
+  changeStreamEvents,
+  ...cache.stats()
+}));
+
+const cacheEntries = registry.gauge('report_cache_entries', 'Reports currently held in the cache');
+const cacheEvents = registry.gauge('report_cache_events', 'Report cache lookups and removals by type since process start');
+
+registry.addCollector(() => {
+  const stats = cache.stats();
+  cacheEntries.set({}, stats.size);
+  for (const type of ['hits', 'misses', 'evictions', 'expired', 'invalidations']) {
+    cacheEvents.set({ type }, stats[type]);
+  }
+});
+
+module.exports = {
+  cacheConfig,
+  getReport,
+  invalidateReport,
+  patchReport,
+  reportEtag,
+  currentReportEtag,
+  startChangeStreamInvalidation
+};
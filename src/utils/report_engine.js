@@ -0,0 +1,162 @@
+// Report engine: builds monthly cost reports with a MongoDB aggregation pipeline.
+const CATEGORIES = require('./categories');
+const { costSource } = require('./cost_storage');
+
+/*
+ * Aggregation-based report computation.
+ *
+ * Instead of hydrating every cost document and filtering it once per category
+ * in JavaScript, MongoDB groups the month's costs by category and returns only
+ * { sum, description, day } per item. A range of months is computed with the
+ * same pipeline in a single round trip (grouped by year, month and category).
+ * In bucket storage mode the pipeline reads the month's buckets and unwinds
+ * their items, so the result is the same in both storage modes.
+ */
+
+// Upper bound for the number of months a single range request may cover.
+const MAX_RANGE_MONTHS = 120;
+
+// Convert { year, month } into a month index that is easy to compare and iterate.
+const toMonthIndex = ({ year, month }) => year * 12 + (month - 1);
+const fromMonthIndex = (index) => ({ year: Math.floor(index / 12), month: (index % 12) + 1 });
+
+// Build a $match filter for all months between from and to (inclusive); userId may also be a condition ({ $in: ids }).
+function buildRangeMatch(userId, from, to) {
+  if (from.year === to.year) {
+    return { userid: userId, year: from.year, month: { $gte: from.month, $lte: to.month } };
+  }
+
+  const clauses = [
+    { year: from.year, month: { $gte: from.month } },
+    { year: to.year, month: { $lte: to.month } }
+  ];
+  if (to.year - from.year > 1) {
+    clauses.push({ year: { $gt: from.year, $lt: to.year } });
+  }
+  return { userid: userId, $or: clauses };
+}
+
+// The { sum, description, day } projection of a report item.
+const reportItemFields = (source) => ({
+  sum: source.field('sum'),
+  description: source.field('description'),
+  day: source.field('day')
+});
+
+// Convert a category -> items map into the required report "costs" array shape.
+function formatReportCosts(itemsByCategory = {}) {
+  return CATEGORIES.map((cat) => ({ [cat]: itemsByCategory[cat] || [] }));
+}
+
+// Grouping pipeline of a user's month range: report items per (year, month, category).
+function buildRangePipeline(userId, from, to, source = costSource()) {
+  return [
+    { $match: buildRangeMatch(userId, from, to) },
+    // Preserve insertion order of items inside each category.
+    { $sort: { _id: 1 } },
+    ...source.unwind,
+    {
+      $group: {
+        _id: { year: '$year', month: '$month', category: source.field('category') },
+        items: { $push: reportItemFields(source) }
+      }
+    }
+  ];
+}
+
+// Grouping pipeline of one month for several users: report items per (userid, category).
+function buildUsersMonthPipeline(userIds, year, month, source = costSource()) {
+  return [
+    { $match: { userid: { $in: userIds }, year, month } },
+    { $sort: { _id: 1 } },
+    ...source.unwind,
+    {
+      $group: {
+        _id: { userid: '$userid', category: source.field('category') },
+        items: { $push: reportItemFields(source) }
+      }
+    }
+  ];
+}
+
+/*
+ Run the grouping pipeline for a user and a month range.
+ Returns a Map keyed by "year-month" holding category -> items maps.
+*/
+async function aggregateRange(userId, from, to) {
+  const source = costSource();
+  const groups = await source.Model.aggregate(buildRangePipeline(userId, from, to, source)).allowDiskUse(true);
+
+  const byMonth = new Map();
+  for (const g of groups) {
+    const key = `${g._id.year}-${g._id.month}`;
+    const cats = byMonth.get(key) || {};
+    cats[g._id.category] = g.items;
+    byMonth.set(key, cats);
+  }
+  return byMonth;
+}
+
+// Compute the "costs" array of a single monthly report.
+async function computeMonthlyCosts(userId, year, month) {
+  const byMonth = await aggregateRange(userId, { year, month }, { year, month });
+  return formatReportCosts(byMonth.get(`${year}-${month}`));
+}
+
+/*
+ Compute the "costs" arrays of one month for several users with one aggregation.
+ Returns a Map(userid -> costs array); users without costs get empty categories.
+*/
+async function computeMonthlyCostsForUsers(userIds, year, month) {
+  const source = costSource();
+  const groups = await source.Model.aggregate(buildUsersMonthPipeline(userIds, year, month, source)).allowDiskUse(true);
+
+  const byUser = new Map(userIds.map((id) => [id, {}]));
+  for (const g of groups) {
+    byUser.get(g._id.userid)[g._id.category] = g.items;
+  }
+  return new Map([...byUser].map(([id, cats]) => [id, formatReportCosts(cats)]));
+}
+
+/*
+ Compute reports for every month in [from, to] with one aggregation.
+ Months without costs are included with empty category arrays.
+*/
+async function computeReportRange(userId, from, to) {
+  const start = toMonthIndex(from);
+  const end = toMonthIndex(to);
+
+  if (end < start) {
+    throw new Error('Invalid report range');
+  }
+  if (end - start + 1 > MAX_RANGE_MONTHS) {
+    throw new Error(`Report range cannot exceed ${MAX_RANGE_MONTHS} months`);
+  }
+
+  const byMonth = await aggregateRange(userId, from, to);
+
+  const reports = [];
+  for (let i = start; i <= end; i++) {
+    const { year, month } = fromMonthIndex(i);
+    reports.push({
+      userid: userId,
+      year,
+      month,
+      costs: formatReportCosts(byMonth.get(`${year}-${month}`))
+    });
+  }
+  return reports;
+}
+
+module.exports = {
+  MAX_RANGE_MONTHS,
+  toMonthIndex,
+  fromMonthIndex,
+  buildRangeMatch,
+  buildRangePipeline,
+  buildUsersMonthPipeline,
+  computeMonthlyCosts,
+  computeMonthlyCostsForUsers,
+  computeReportRange,
+  formatReportCosts
+};
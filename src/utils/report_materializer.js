@@ -0,0 +1,154 @@
+// Report materializer: precomputes the reports of a closed month for every user with costs.
+const dotenv = require('dotenv');
+const Report = require('../models/report_model');
+const MonthlyTotal = require('../models/monthly_total_model');
+const Checkpoint = require('../models/checkpoint_model');
+const { computeMonthlyCostsForUsers } = require('./report_engine');
+const { registerStats } = require('./diagnostics');
+const { onShutdown, ORDER } = require('./shutdown');
+
+dotenv.config();
+
+/*
+ * Report Materialization
+ *
+ * After a month is closed (no cost can be added to it anymore), its reports are
+ * computed ahead of the first request and upserted into "reports":
+ * - users are read from monthly_totals in userid order, one page at a time;
+ * - each page is split into batches computed with one aggregation each, and at
+ *   most `concurrency` batches run at the same time;
+ * - the last processed userid is stored in "checkpoints", so an interrupted
+ *   run resumes after the last completed page.
+ * Upserts with $set make re-running a month idempotent.
+ */
+const JOB_NAME = 'report-materializer';
+
+const materializerConfig = {
+  enabled: process.env.REPORT_MATERIALIZER_ENABLED === 'true',
+  intervalMs: Number(process.env.REPORT_MATERIALIZER_INTERVAL_MS) || 60 * 60 * 1000,
+  batchSize: Number(process.env.REPORT_MATERIALIZER_BATCH_SIZE) || 200,
+  concurrency: Number(process.env.REPORT_MATERIALIZER_CONCURRENCY) || 4
+};
+
+const lastRun = { year: null, month: null, users: 0, finishedAt: null, durationMs: 0 };
+
+// The most recent closed month relative to `now`.
+function previousMonth(now = new Date()) {
+  const month = now.getMonth(); // 0-based current month == 1-based previous month
+  return month === 0
+    ? { year: now.getFullYear() - 1, month: 12 }
+    : { year: now.getFullYear(), month };
+}
+
+// Compute and upsert the reports of one batch of users.
+async function materializeBatch(userIds, year, month) {
+  const reports = await computeMonthlyCostsForUsers(userIds, year, month);
+  const ops = [...reports].map(([userid, costs]) => ({
+    updateOne: {
+      filter: { userid, year, month },
+      update: { $set: { costs } },
+      upsert: true
+    }
+  }));
+  if (ops.length > 0) {
+    await Report.bulkWrite(ops, { ordered: false });
+  }
+}
+
+// Next page of users with costs in the month, after lastUserId (keyset pagination).
+function pageQuery(year, month, lastUserId, limit) {
+  const filter = { year, month, count: { $gt: 0 } };
+  if (lastUserId !== null && lastUserId !== undefined) {
+    filter.userid = { $gt: lastUserId };
+  }
+  return MonthlyTotal.find(filter).sort({ userid: 1 }).limit(limit).select('userid -_id');
+}
+
+/*
+ Materialize the reports of a month, resuming from the checkpoint of an
+ interrupted run of the same month. Returns the number of processed users.
+*/
+async function materializeMonth(year, month, options = {}) {
+  const batchSize = options.batchSize || materializerConfig.batchSize;
+  const concurrency = options.concurrency || materializerConfig.concurrency;
+
+  const checkpoint = await Checkpoint.findOne({ job: JOB_NAME }).lean();
+  const state = checkpoint && checkpoint.value;
+  const sameMonth = state && state.year === year && state.month === month;
+  if (sameMonth && state.completed && !options.force) {
+    return 0;
+  }
+
+  let lastUserId = sameMonth && !options.force ? state.lastUserId : null;
+  let users = 0;
+  const start = Date.now();
+
+  for (;;) {
+    const page = await pageQuery(year, month, lastUserId, batchSize * concurrency).lean();
+
+    if (page.length === 0) {
+      break;
+    }
+
+    const ids = page.map((doc) => doc.userid);
+    const batches = [];
+    for (let i = 0; i < ids.length; i += batchSize) {
+      batches.push(ids.slice(i, i + batchSize));
+    }
+    await Promise.all(batches.map((batch) => materializeBatch(batch, year, month)));
+
+    users += ids.length;
+    lastUserId = ids[ids.length - 1];
+    await Checkpoint.updateOne(
+      { job: JOB_NAME },
+      { $set: { value: { year, month, lastUserId, completed: false }, updatedAt: new Date() } },
+      { upsert: true }
+    );
+  }
+
+  await Checkpoint.updateOne(
+    { job: JOB_NAME },
+    { $set: { value: { year, month, lastUserId, completed: true }, updatedAt: new Date() } },
+    { upsert: true }
+  );
+
+  Object.assign(lastRun, { year, month, users, finishedAt: new Date(), durationMs: Date.now() - start });
+  return users;
+}
+
+// Periodically materialize the previous month (a no-op once it is completed).
+function startReportMaterializer() {
+  let running = false;
+
+  const tick = async () => {
+    if (running) return;
+    running = true;
+    try {
+      const { year, month } = previousMonth();
+      const users = await materializeMonth(year, month);
+      if (users > 0) {
+        console.log(`Materialized ${users} report(s) for ${year}-${month}`);
+      }
+    } catch (err) {
+      console.error('Report materialization failed:', err);
+    } finally {
+      running = false;
+    }
+  };
+
+  tick();
+  const timer = setInterval(tick, materializerConfig.intervalMs);
+  timer.unref();
+
+  onShutdown('report materializer', () => clearInterval(timer), ORDER.BACKGROUND);
+}
+
+registerStats('reportMaterializer', () => ({ ...materializerConfig, lastRun }));
+
+module.exports = {
+  materializerConfig,
+  materializeMonth,
+  pageQuery,
+  previousMonth,
+  startReportMaterializer
+};
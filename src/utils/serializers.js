@@ -0,0 +1,225 @@
+// Response serializers: JSON stringifiers compiled once from a schema of the response shape.
+
+/*
+ * Precompiled Serialization
+ *
+ * JSON.stringify inspects every value at runtime and serializes whatever it is
+ * given, which is why responses used to be copied with toObject() and a
+ * transform closure first (to drop _id / __v). A compiled serializer knows the
+ * response shape in advance:
+ * - the object code is generated once per schema (new Function), with the
+ *   property names baked in, so no intermediate objects are allocated;
+ * - only declared properties are written (internal fields are skipped, so lean
+ *   documents and hydrated Mongoose documents can be passed directly);
+ * - undefined properties are omitted and values of an unexpected type fall
+ *   back to JSON.stringify, so the output matches res.json().
+ *
+ * Schema types: string, number, boolean, date, any, { type: 'array', items },
+ * { type: 'object', properties } (property order = output order).
+ */
+
+// Strings without quotes, backslashes, control characters or surrogates need no escaping.
+function serializeString(v) {
+  for (let i = 0; i < v.length; i++) {
+    const c = v.charCodeAt(i);
+    if (c < 32 || c === 34 || c === 92 || (c >= 0xd800 && c <= 0xdfff)) {
+      return JSON.stringify(v);
+    }
+  }
+  return `"${v}"`;
+}
+
+const primitives = {
+  string: (v) => (typeof v === 'string' ? serializeString(v) : JSON.stringify(v)),
+  number: (v) => (typeof v === 'number' ? (Number.isFinite(v) ? `${v}` : 'null') : JSON.stringify(v)),
+  boolean: (v) => (v === true ? 'true' : v === false ? 'false' : JSON.stringify(v)),
+  date: (v) => (v instanceof Date ? (isNaN(v.getTime()) ? 'null' : `"${v.toISOString()}"`) : JSON.stringify(v)),
+  any: (v) => JSON.stringify(v)
+};
+
+// Compile a schema into a (value) => JSON string function.
+function compile(schema) {
+  const type = typeof schema === 'string' ? schema : schema.type;
+
+  if (primitives[type]) {
+    const serialize = primitives[type];
+    return (v) => (v === null ? 'null' : serialize(v));
+  }
+
+  if (type === 'array') {
+    const item = compile(schema.items);
+    return (v) => {
+      if (!Array.isArray(v)) return JSON.stringify(v);
+      let json = '[';
+      for (let i = 0; i < v.length; i++) {
+        json += (i ? ',' : '') + (v[i] === undefined ? 'null' : item(v[i]));
+      }
+      return json + ']';
+    };
+  }
+
+  if (type === 'object') {
+    const names = Object.keys(schema.properties);
+    const fields = names.map((name) => compile(schema.properties[name]));
+
+    // One statement per property: read it once, skip it when undefined.
+    const body = names.map((name, i) => {
+      const key = JSON.stringify(JSON.stringify(name) + ':');
+      return `v = o[${JSON.stringify(name)}];\n` +
+        `if (v !== undefined) { json += sep + ${key} + f[${i}](v); sep = ','; }`;
+    }).join('\n');
+
+    // eslint-disable-next-line no-new-func
+    const serializeObject = new Function('f', `return function (o) {
+      if (o === null || typeof o !== 'object') return JSON.stringify(o);
+      let json = '{';
+      let sep = '';
+      let v;
+      ${body}
+      return json + '}';
+    };`)(fields);
+    return serializeObject;
+  }
+
+  throw new Error(`Unsupported serializer type: ${type}`);
+}
+
+/*
+ * Response shapes of the services.
+ */
+const userFields = {
+  id: 'number',
+  first_name: 'string',
+  last_name: 'string',
+  birthday: 'date'
+};
+
+const userDetails = {
+  type: 'object',
+  properties: { first_name: 'string', last_name: 'string', id: 'number', total: 'number' }
+};
+
+const cost = {
+  type: 'object',
+  properties: {
+    userid: 'number',
+    createdAt: 'date',
+    year: 'number',
+    month: 'number',
+    day: 'number',
+    description: 'string',
+    category: 'string',
+    sum: 'number'
+  }
+};
+
+/*
+ Report items are plain objects built by the aggregation (no internal fields),
+ where native JSON.stringify is already the fastest path; only the envelope is
+ compiled (it drops the _id of stored reports without copying the document).
+*/
+const report = {
+  type: 'object',
+  properties: {
+    userid: 'number',
+    year: 'number',
+    month: 'number',
+    costs: 'any'
+  }
+};
+
+const monthRef = { type: 'object', properties: { year: 'number', month: 'number' } };
+
+const analytics = {
+  type: 'object',
+  properties: {
+    userids: { type: 'array', items: 'number' },
+    from: monthRef,
+    to: monthRef,
+    months: 'number',
+    total: 'number',
+    count: 'number',
+    monthlyAverage: 'number',
+    itemAverage: 'number',
+    categories: {
+      type: 'array',
+      items: {
+        type: 'object',
+        properties: { category: 'string', total: 'number', count: 'number', monthlyAverage: 'number', share: 'number' }
+      }
+    },
+    monthly: {
+      type: 'array',
+      items: {
+        type: 'object',
+        properties: { year: 'number', month: 'number', total: 'number', count: 'number', categories: 'any' }
+      }
+    },
+    users: {
+      type: 'array',
+      items: { type: 'object', properties: { userid: 'number', total: 'number', count: 'number' } }
+    },
+    // Top expenses come from the rollups' top lists (their _id is not written).
+    top: {
+      type: 'array',
+      items: {
+        type: 'object',
+        properties: {
+          userid: 'number',
+          year: 'number',
+          month: 'number',
+          day: 'number',
+          description: 'string',
+          category: 'string',
+          sum: 'number'
+        }
+      }
+    }
+  }
+};
+
+const log = {
+  type: 'object',
+  properties: {
+    level: 'string',
+    time: 'date',
+    msg: 'string',
+    pid: 'number',
+    hostname: 'string',
+    statusCode: 'number',
+    responseTimeMs: 'number'
+  }
+};
+
+// User serializers per requested field list (GET /api/users?fields=), compiled on first use.
+const userSerializers = new Map();
+function userSerializer(fields = Object.keys(userFields)) {
+  const key = fields.join(',');
+  if (!userSerializers.has(key)) {
+    const properties = Object.fromEntries(Object.keys(userFields)
+      .filter((name) => fields.includes(name))
+      .map((name) => [name, userFields[name]]));
+    const one = compile({ type: 'object', properties });
+    userSerializers.set(key, { one, many: compile({ type: 'array', items: { type: 'object', properties } }) });
+  }
+  return userSerializers.get(key);
+}
+
+const serializers = {
+  user: userSerializer().one,
+  userDetails: compile(userDetails),
+  userDetailsList: compile({ type: 'array', items: userDetails }),
+  cost: compile(cost),
+  report: compile(report),
+  reports: compile({ type: 'array', items: report }),
+  analytics: compile(analytics),
+  log: compile(log),
+  logs: compile({ type: 'array', items: log })
+};
+
+// Send a pre-serialized JSON body (same headers as res.json()).
+function sendJson(res, serialize, body, status = 200) {
+  return res.status(status).type('json').send(serialize(body));
+}
+
+module.exports = { compile, serializers, userSerializer, sendJson };
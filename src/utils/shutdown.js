@@ -0,0 +1,66 @@
+// Shutdown utility: runs registered cleanup hooks once on SIGTERM/SIGINT.
+
+/*
+ * Graceful Shutdown
+ *
+ * Modules register cleanup hooks with an `order`; on SIGTERM or SIGINT the hooks
+ * run sequentially in ascending order (e.g. stop accepting requests first,
+ * then drain the log queue, then close the database connection).
+ * A hard timeout guarantees the process exits even if a hook hangs.
+ */
+const hooks = [];
+let installed = false;
+let shuttingDown = false;
+
+// Well-known hook orders used across the services.
+const ORDER = {
+  SERVER: 10,
+  BACKGROUND: 20,
+  LOG_SINK: 30,
+  DATABASE: 40
+};
+
+const SHUTDOWN_TIMEOUT_MS = Number(process.env.SHUTDOWN_TIMEOUT_MS) || 10000;
+
+// Run every registered hook in order, logging (but not propagating) failures.
+async function runHooks(signal) {
+  const sorted = [...hooks].sort((a, b) => a.order - b.order);
+  for (const hook of sorted) {
+    try {
+      await hook.fn(signal);
+    } catch (err) {
+      console.error(`Shutdown hook "${hook.name}" failed:`, err);
+    }
+  }
+}
+
+// Handle a termination signal: run hooks once, then exit.
+function shutdown(signal) {
+  if (shuttingDown) return;
+  shuttingDown = true;
+  console.log(`${signal} received, shutting down gracefully`);
+
+  const timer = setTimeout(() => {
+    console.error(`Shutdown timed out after ${SHUTDOWN_TIMEOUT_MS}ms, exiting`);
+    process.exit(1);
+  }, SHUTDOWN_TIMEOUT_MS);
+  timer.unref();
+
+  runHooks(signal).then(() => process.exit(0));
+}
+
+// Register a cleanup hook; signal handlers are installed on first use.
+function onShutdown(name, fn, order = ORDER.BACKGROUND) {
+  hooks.push({ name, fn, order });
+
+  if (!installed) {
+    installed = true;
+    process.once('SIGTERM', () => shutdown('SIGTERM'));
+    process.once('SIGINT', () => shutdown('SIGINT'));
+  }
+}
+
+// True once a termination signal was received (readiness checks report not ready).
+const isShuttingDown = () => shuttingDown;
+
+module.exports = { onShutdown, isShuttingDown, ORDER };
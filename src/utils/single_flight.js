@@ -0,0 +1,76 @@
+// Single-flight: concurrent callers asking for the same key share one in-flight computation.
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+
+/*
+ * Request Coalescing
+ *
+ * The first caller for a key (the "leader") starts the computation; callers
+ * arriving while it is still running receive the same promise instead of
+ * issuing identical queries. Nothing is kept after the promise settles, so
+ * results are never older than one computation.
+ *
+ * Callers share the resolved value and must treat it as read-only.
+ * forget(key) detaches a running computation (e.g. after a write that makes
+ * it outdated), so later callers start a fresh one.
+ */
+const enabled = process.env.SINGLE_FLIGHT_ENABLED !== 'false';
+
+const calls = registry.counter('single_flight_calls_total', 'Single-flight calls by group and role (leader or coalesced)');
+const groups = new Map();
+
+class SingleFlight {
+  constructor(name) {
+    this.name = name;
+    this.inFlight = new Map();
+    this.counters = { leaders: 0, coalesced: 0 };
+    groups.set(name, this);
+  }
+
+  // Run fn() for the key, or join the computation already running for it.
+  do(key, fn) {
+    if (!enabled) {
+      return fn();
+    }
+
+    const running = this.inFlight.get(key);
+    if (running) {
+      this.counters.coalesced++;
+      calls.inc({ group: this.name, role: 'coalesced' });
+      return running;
+    }
+
+    this.counters.leaders++;
+    calls.inc({ group: this.name, role: 'leader' });
+
+    const promise = Promise.resolve()
+      .then(fn)
+      .finally(() => {
+        // Only remove our own entry (forget() may have let a newer one start).
+        if (this.inFlight.get(key) === promise) {
+          this.inFlight.delete(key);
+        }
+      });
+    this.inFlight.set(key, promise);
+    return promise;
+  }
+
+  // Let later callers start a new computation instead of joining the running one.
+  forget(key) {
+    this.inFlight.delete(key);
+  }
+
+  stats() {
+    return { ...this.counters, inFlight: this.inFlight.size };
+  }
+}
+
+registerStats('singleFlight', () => {
+  const snapshot = { enabled };
+  for (const [name, group] of groups) {
+    snapshot[name] = group.stats();
+  }
+  return snapshot;
+});
+
+module.exports = SingleFlight;
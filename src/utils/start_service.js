@@ -0,0 +1,33 @@
+// Service bootstrap: connects to MongoDB, starts the HTTP server and registers graceful shutdown.
+const connectDb = require('./connect_db');
+const { onShutdown, ORDER } = require('./shutdown');
+
+/*
+ * Shared by the four services, the single-process gateway and the cluster workers.
+ * - The server starts listening only after the database connection is ready
+ *   (logMiddleware and every endpoint depend on it).
+ * - `onReady` starts optional background tasks (caches, rollup jobs, ...).
+ * - `key` selects the per-service MongoDB settings (MONGODB_<KEY>_<OPTION>).
+ * - If the database connection fails, the process exits so the deployment
+ *   (or the cluster primary) sees the failure immediately.
+ */
+async function startService({ name, key, app, port, onReady }) {
+  try {
+    await connectDb(key);
+  } catch (err) {
+    console.error(`${name} failed to start (DB connection error):`, err.message);
+    process.exit(1);
+  }
+
+  const server = app.listen(port, () => console.log(`${name} running on port ${port}`));
+
+  // Stop accepting new connections first during graceful shutdown.
+  onShutdown(`${name} http server`, () => new Promise((resolve) => server.close(resolve)), ORDER.SERVER);
+
+  if (onReady) {
+    onReady();
+  }
+  return server;
+}
+
+module.exports = startService;
@@ -0,0 +1,198 @@
+// User existence cache: in-memory set of known user ids for cost validation in the costs service.
+const dotenv = require('dotenv');
+const User = require('../models/user_model');
+const { registerStats } = require('./diagnostics');
+const { registry } = require('./metrics');
+const { onShutdown, ORDER } = require('./shutdown');
+
+dotenv.config();
+
+/*
+ * User Existence Cache
+ *
+ * Every added cost must reference an existing user. Instead of one users
+ * round trip per insert, the costs service keeps the set of known user ids:
+ * - warmed from the users collection at startup (bounded by USER_CACHE_MAX_IDS);
+ * - kept fresh by a delta refresh (users with an _id above the last one seen)
+ *   or, with USER_CACHE_CHANGE_STREAM=true, by a change stream on "users";
+ * - a miss falls back to a lean exists() query, and a found id is added.
+ * Only positive answers are cached, so a new user is never rejected. Removed
+ * users (test cleanup only) are dropped by the next delta refresh, which
+ * reloads the set when it holds more ids than the collection has users (or
+ * by the delete event). The users service also evicts the id directly when
+ * both apps share a process (gateway mode).
+ */
+const userCacheConfig = {
+  enabled: process.env.USER_CACHE_ENABLED !== 'false',
+  maxIds: Number(process.env.USER_CACHE_MAX_IDS) || 1000000,
+  refreshMs: Number(process.env.USER_CACHE_REFRESH_MS) || 30000,
+  reloadMs: Number(process.env.USER_CACHE_RELOAD_MS) || 60 * 60 * 1000,
+  changeStream: process.env.USER_CACHE_CHANGE_STREAM === 'true'
+};
+
+let known = new Set();
+let lastObjectId = null;
+let ready = false;
+const counters = { hits: 0, misses: 0, fallbackFound: 0, fallbackMissing: 0, reloads: 0 };
+
+const lookups = registry.counter('user_existence_lookups_total', 'User existence checks by result (hit, miss_found, miss_absent)');
+const cacheSize = registry.gauge('user_existence_cache_ids', 'User ids held by the existence cache');
+const hitRatio = registry.gauge('user_existence_cache_hit_ratio', 'Share of existence checks answered from the cache');
+
+const remember = (id) => {
+  if (known.size < userCacheConfig.maxIds) {
+    known.add(id);
+  }
+};
+
+// Add the ids of users inserted after `afterId` (all users when null).
+async function loadUsers(target, afterId) {
+  let last = afterId;
+  const filter = afterId ? { _id: { $gt: afterId } } : {};
+  const cursor = User.find(filter).select('id').sort({ _id: 1 }).lean().cursor();
+  for await (const user of cursor) {
+    if (target.size < userCacheConfig.maxIds) {
+      target.add(user.id);
+    }
+    last = user._id;
+  }
+  return last;
+}
+
+// Drop a removed user from the set (users-service delete path in the same process).
+function forgetUser(id) {
+  known.delete(id);
+}
+
+// Rebuild the set from scratch (startup, periodic reload, delete events, detected deletes).
+async function reload() {
+  const next = new Set();
+  const last = await loadUsers(next, null);
+  known = next;
+  lastObjectId = last;
+  ready = true;
+  counters.reloads++;
+}
+
+/*
+ Return the subset of ids that belong to existing users.
+ Cached ids are answered from memory; the rest with one $in query.
+*/
+async function findExistingUserIds(ids) {
+  const existing = new Set();
+  const unknown = [];
+  for (const id of ids) {
+    if (userCacheConfig.enabled && ready && known.has(id)) {
+      existing.add(id);
+    } else {
+      unknown.push(id);
+    }
+  }
+  counters.hits += existing.size;
+  lookups.inc({ result: 'hit' }, existing.size);
+
+  if (unknown.length > 0) {
+    counters.misses += unknown.length;
+    const found = await User.find({ id: { $in: unknown } }).select('id -_id').lean();
+    for (const user of found) {
+      existing.add(user.id);
+      remember(user.id);
+    }
+    counters.fallbackFound += found.length;
+    counters.fallbackMissing += unknown.length - found.length;
+    lookups.inc({ result: 'miss_found' }, found.length);
+    lookups.inc({ result: 'miss_absent' }, unknown.length - found.length);
+  }
+  return existing;
+}
+
+// Whether a user with this id exists.
+async function userExists(id) {
+  if (userCacheConfig.enabled && ready && known.has(id)) {
+    counters.hits++;
+    lookups.inc({ result: 'hit' });
+    return true;
+  }
+
+  counters.misses++;
+  const found = Boolean(await User.exists({ id }));
+  if (found) {
+    remember(id);
+    counters.fallbackFound++;
+  } else {
+    counters.fallbackMissing++;
+  }
+  lookups.inc({ result: found ? 'miss_found' : 'miss_absent' });
+  return found;
+}
+
+// Track inserts and deletes on "users" (change stream mode, requires a replica set).
+function startChangeStream() {
+  const stream = User.watch([{ $match: { operationType: { $in: ['insert', 'delete'] } } }]);
+  stream.on('change', (event) => {
+    if (event.operationType === 'insert') {
+      remember(event.fullDocument.id);
+    } else {
+      // Delete events only carry the _id; rebuild to drop the removed id.
+      reload().catch((err) => console.error('User cache reload failed:', err.message));
+    }
+  });
+  stream.on('error', (err) => {
+    // Misses still fall back to the database, so answers stay correct.
+    console.error('User cache change stream failed:', err.message);
+  });
+  onShutdown('user cache change stream', () => stream.close(), ORDER.BACKGROUND);
+}
+
+// Warm the cache and keep it fresh in the background.
+function startUserExistenceCache() {
+  reload().catch((err) => console.error('User cache warm-up failed:', err.message));
+
+  const timers = [];
+  if (userCacheConfig.changeStream) {
+    startChangeStream();
+  } else {
+    let refreshing = false;
+    timers.push(setInterval(async () => {
+      if (refreshing || !ready) return;
+      refreshing = true;
+      try {
+        lastObjectId = await loadUsers(known, lastObjectId);
+        // More cached ids than users means some were deleted (the delta only sees inserts).
+        if (known.size > await User.estimatedDocumentCount()) {
+          await reload();
+        }
+      } catch (err) {
+        console.error('User cache refresh failed:', err.message);
+      } finally {
+        refreshing = false;
+      }
+    }, userCacheConfig.refreshMs));
+  }
+  timers.push(setInterval(() => {
+    reload().catch((err) => console.error('User cache reload failed:', err.message));
+  }, userCacheConfig.reloadMs));
+
+  timers.forEach((timer) => timer.unref());
+  onShutdown('user cache refresh', () => timers.forEach(clearInterval), ORDER.BACKGROUND);
+}
+
+const ratio = () => {
+  const total = counters.hits + counters.misses;
+  return total ? counters.hits / total : 0;
+};
+
+registry.addCollector(() => {
+  cacheSize.set({}, known.size);
+  hitRatio.set({}, ratio());
+});
+
+registerStats('userExistenceCache', () => ({
+  ...userCacheConfig,
+  ready,
+  size: known.size,
+  hitRatio: ratio(),
+  ...counters
+}));
+
+module.exports = { userCacheConfig, userExists, findExistingUserIds, forgetUser, startUserExistenceCache };
@@ -0,0 +1,383 @@
+// Utility functions: maintain and read the per-user and per-user-month running cost totals.
+const UserTotal = require('../models/user_total_model');
+const MonthlyTotal = require('../models/monthly_total_model');
+const { costSource } = require('./cost_storage');
+
+/*
+ * Running Totals
+ *
+ * Every inserted cost item increments two documents with atomic $inc updates:
+ * - user_totals:    { userid, total, count }
+ * - monthly_totals: { userid, year, month, total, count, categories.<cat>.{total,count}, top }
+ *
+ * Reads of the user total become a single indexed point read.
+ * "top" keeps the ROLLUP_TOP_ITEMS largest items of the month ($push with
+ * $sort/$slice), so analytics never scan cost items. A removed item is pulled
+ * from it; the next smaller item only returns after a totals rebuild.
+ * Both documents also count their changes in "version" (+1 per applied item,
+ * also for removals); it is the validator of version-based ETags (etag.js).
+ * A user or user-month without a totals document (costs stored before the
+ * totals existed) gets one seeded from the stored costs on the first update,
+ * instead of totals that start at the new item (or below zero on a removal).
+ * Drift (e.g. a crash between the cost insert and the $inc) is detected and
+ * repaired by src/scripts/rebuild_user_totals.js.
+ */
+
+// Largest cost items kept per user-month in monthly_totals.top.
+const TOP_ITEMS = Number(process.env.ROLLUP_TOP_ITEMS) || 10;
+
+// Key of a user-month ({ userid, year, month }) in Maps and Sets.
+const monthKey = (doc) => `${doc.userid}:${doc.year}:${doc.month}`;
+
+// The monthly_totals.top entry of a cost item.
+const topEntry = (cost) => ({
+  _id: cost._id,
+  sum: cost.sum,
+  description: cost.description,
+  category: cost.category,
+  day: cost.day
+});
+
+// $push that keeps the TOP_ITEMS largest items of a month (sum descending).
+const pushTop = (entries) => ({ top: { $each: entries, $sort: { sum: -1 }, $slice: TOP_ITEMS } });
+
+// Build the $inc update documents for a cost item (direction -1 reverts a removed cost).
+function buildIncrements(cost, direction = 1) {
+  const sum = (Number(cost.sum) || 0) * direction;
+  return {
+    user: { total: sum, count: direction, version: 1 },
+    month: {
+      total: sum,
+      count: direction,
+      version: 1,
+      [`categories.${cost.category}.total`]: sum,
+      [`categories.${cost.category}.count`]: direction
+    }
+  };
+}
+
+/*
+ $sum and count of the stored costs per user (userid may be a condition such as
+ { $in: ids }). In documents mode the compound cost index covers it.
+*/
+const buildUserSumsPipeline = (userid, source = costSource()) => [
+  { $match: { userid } },
+  { $group: { _id: '$userid', total: { $sum: source.totalField }, count: { $sum: source.countField } } }
+];
+
+/*
+ Totals of the stored costs per (userid, year, month, category) with the
+ category's TOP_ITEMS largest items ($topN, MongoDB 5.2+). Shared by the
+ month seed and the totals rebuild; fold the rows with addCategoryTotals.
+*/
+const buildMonthTotalsPipeline = (match, source = costSource()) => [
+  { $match: match },
+  ...source.unwind,
+  {
+    $group: {
+      _id: { userid: '$userid', year: '$year', month: '$month', category: source.field('category') },
+      total: { $sum: source.field('sum') },
+      count: { $sum: 1 },
+      top: {
+        $topN: {
+          n: TOP_ITEMS,
+          sortBy: { [source.field('sum').slice(1)]: -1 },
+          output: {
+            _id: source.field('_id'),
+            sum: source.field('sum'),
+            description: source.field('description'),
+            category: source.field('category'),
+            day: source.field('day')
+          }
+        }
+      }
+    }
+  }
+];
+
+// Add a category row of buildMonthTotalsPipeline to its month's totals.
+function addCategoryTotals(monthly, row) {
+  monthly.total += row.total;
+  monthly.count += row.count;
+  monthly.categories[row._id.category] = { total: row.total, count: row.count };
+  // The month's largest items are among the largest items of its categories.
+  monthly.top = monthly.top.concat(row.top).sort((a, b) => b.sum - a.sum).slice(0, TOP_ITEMS);
+  return monthly;
+}
+
+// Users joined with their totals document (batch lookup of the users service).
+const buildUserLookupPipeline = (ids) => [
+  { $match: { id: { $in: ids } } },
+  {
+    $lookup: {
+      from: UserTotal.collection.name,
+      localField: 'id',
+      foreignField: 'userid',
+      as: 'totals'
+    }
+  },
+  {
+    $project: {
+      _id: 0,
+      first_name: 1,
+      last_name: 1,
+      id: 1,
+      total: { $arrayElemAt: ['$totals.total', 0] }
+    }
+  }
+];
+
+/*
+ Create the user_totals documents of users without one, seeded with the $sum
+ of their stored costs. Callers run it after storing (or removing) the items
+ they apply, so the seed already reflects them: returns the userids seeded by
+ this call, whose $inc must be skipped.
+*/
+async function seedUserTotals(userIds) {
+  const existing = await UserTotal.find({ userid: { $in: userIds } }).select('userid -_id').lean();
+  const known = new Set(existing.map((doc) => doc.userid));
+  const missing = userIds.filter((userid) => !known.has(userid));
+  if (missing.length === 0) {
+    return new Set();
+  }
+
+  const source = costSource();
+  const rows = await source.Model.aggregate(buildUserSumsPipeline({ $in: missing }, source));
+  const sums = new Map(rows.map((row) => [row._id, row]));
+
+  // $setOnInsert: a document created concurrently by another writer is left as it is.
+  const result = await UserTotal.bulkWrite(missing.map((userid) => ({
+    updateOne: {
+      filter: { userid },
+      update: {
+        $setOnInsert: {
+          total: sums.has(userid) ? sums.get(userid).total : 0,
+          count: sums.has(userid) ? sums.get(userid).count : 0,
+          version: 1
+        }
+      },
+      upsert: true
+    }
+  })), { ordered: false });
+  return new Set(Object.keys(result.upsertedIds || {}).map((i) => missing[i]));
+}
+
+// Apply an $inc to a user's totals, seeding a missing document first.
+async function incUserTotal(userid, inc) {
+  const { matchedCount } = await UserTotal.updateOne({ userid }, { $inc: inc });
+  if (matchedCount === 0 && !(await seedUserTotals([userid])).has(userid)) {
+    await UserTotal.updateOne({ userid }, { $inc: inc }, { upsert: true });
+  }
+}
+
+/*
+ Create the monthly_totals documents of user-months without one, seeded with
+ the totals, categories and largest items of their stored costs (zeros when
+ none are left). Like seedUserTotals it runs after the applied items were
+ stored or removed: returns the keys (monthKey) seeded by this call.
+*/
+async function seedMonthlyTotals(filters) {
+  const existing = await MonthlyTotal.find({ $or: filters }).select('userid year month -_id').lean();
+  const known = new Set(existing.map(monthKey));
+  const missing = filters.filter((filter) => !known.has(monthKey(filter)));
+  if (missing.length === 0) {
+    return new Set();
+  }
+
+  const seeds = new Map(missing.map((filter) => [monthKey(filter), { total: 0, count: 0, categories: {}, top: [] }]));
+  const source = costSource();
+  const rows = await source.Model.aggregate(buildMonthTotalsPipeline({ $or: missing }, source));
+  for (const row of rows) {
+    addCategoryTotals(seeds.get(monthKey(row._id)), row);
+  }
+
+  // $setOnInsert: a document created concurrently by another writer is left as it is.
+  const result = await MonthlyTotal.bulkWrite(missing.map((filter) => ({
+    updateOne: {
+      filter,
+      update: { $setOnInsert: { ...seeds.get(monthKey(filter)), version: 1 } },
+      upsert: true,
+      setDefaultsOnInsert: false
+    }
+  })), { ordered: false });
+  return new Set(Object.keys(result.upsertedIds || {}).map((i) => monthKey(missing[i])));
+}
+
+/*
+ Apply an update to a user-month's totals, seeding a missing document first.
+ Never upserts: a removal must not create a document with negative totals.
+*/
+async function updateMonthTotal(filter, update) {
+  const { matchedCount } = await MonthlyTotal.updateOne(filter, update);
+  if (matchedCount === 0 && !(await seedMonthlyTotals([filter])).has(monthKey(filter))) {
+    await MonthlyTotal.updateOne(filter, update);
+  }
+}
+
+// Apply a single (already stored or removed) cost item to the running totals.
+async function applyCost(cost, direction = 1) {
+  const inc = buildIncrements(cost, direction);
+
+  await Promise.all([
+    incUserTotal(cost.userid, inc.user),
+    updateMonthTotal(
+      { userid: cost.userid, year: cost.year, month: cost.month },
+      direction > 0
+        ? { $inc: inc.month, $push: pushTop([topEntry(cost)]) }
+        : { $inc: inc.month, $pull: { top: { _id: cost._id } } }
+    )
+  ]);
+}
+
+/*
+ Apply many cost items with two bulkWrite calls. Increments are merged per user
+ and per user-month first, so a bulk import touches each totals document once.
+*/
+async function applyCosts(costs) {
+  const users = new Map();
+  const months = new Map();
+
+  const merge = (target, inc) => {
+    for (const [field, value] of Object.entries(inc)) {
+      target[field] = (target[field] || 0) + value;
+    }
+  };
+
+  for (const cost of costs) {
+    const inc = buildIncrements(cost);
+    if (!users.has(cost.userid)) {
+      users.set(cost.userid, {});
+    }
+    merge(users.get(cost.userid), inc.user);
+
+    const key = monthKey(cost);
+    if (!months.has(key)) {
+      months.set(key, { filter: { userid: cost.userid, year: cost.year, month: cost.month }, inc: {}, top: [] });
+    }
+    merge(months.get(key).inc, inc.month);
+    months.get(key).top.push(topEntry(cost));
+  }
+
+  // Users and months seeded now already include the stored items.
+  const [seeded, seededMonths] = await Promise.all([
+    seedUserTotals([...users.keys()]),
+    seedMonthlyTotals([...months.values()].map(({ filter }) => filter))
+  ]);
+  const userOps = [...users].filter(([userid]) => !seeded.has(userid)).map(([userid, inc]) => ({
+    updateOne: { filter: { userid }, update: { $inc: inc }, upsert: true }
+  }));
+  // Only the largest items of a month can enter its top list.
+  const monthOps = [...months].filter(([key]) => !seededMonths.has(key)).map(([, { filter, inc, top }]) => ({
+    updateOne: {
+      filter,
+      update: { $inc: inc, $push: pushTop(top.sort((a, b) => b.sum - a.sum).slice(0, TOP_ITEMS)) },
+      upsert: true,
+      setDefaultsOnInsert: false
+    }
+  }));
+
+  await Promise.all([
+    userOps.length ? UserTotal.bulkWrite(userOps, { ordered: false }) : null,
+    monthOps.length ? MonthlyTotal.bulkWrite(monthOps, { ordered: false }) : null
+  ]);
+}
+
+/*
+ Advance the versions of the users and user-months of the given items without
+ changing their totals. Used when applying the items failed: the totals drift
+ until a rebuild, but version-based ETags still change with the stored data.
+*/
+async function bumpVersions(costs) {
+  const userIds = [...new Set(costs.map((cost) => cost.userid))];
+  const months = new Map(costs.map((cost) => [
+    monthKey(cost),
+    { userid: cost.userid, year: cost.year, month: cost.month }
+  ]));
+
+  // A seeded document starts at version 1 and already includes the items.
+  const [seeded, seededMonths] = await Promise.all([
+    seedUserTotals(userIds),
+    seedMonthlyTotals([...months.values()])
+  ]);
+  const userOps = userIds.filter((userid) => !seeded.has(userid)).map((userid) => ({
+    updateOne: { filter: { userid }, update: { $inc: { version: 1 } } }
+  }));
+  const monthOps = [...months].filter(([key]) => !seededMonths.has(key)).map(([, filter]) => ({
+    updateOne: { filter, update: { $inc: { version: 1 } } }
+  }));
+
+  await Promise.all([
+    userOps.length ? UserTotal.bulkWrite(userOps, { ordered: false }) : null,
+    monthOps.length ? MonthlyTotal.bulkWrite(monthOps, { ordered: false }) : null
+  ]);
+}
+
+/*
+ Return { total, version } of a user: the total of all costs rounded to two
+ decimals, read together with its version from one document.
+ Falls back to a server-side $sum for users whose totals were never recorded
+ (no cost added since the totals store exists); their version is 0.
+*/
+async function getUserTotalState(userId) {
+  const stored = await UserTotal.findOne({ userid: userId }).select('total version -_id').lean();
+  if (stored) {
+    return { total: Number((stored.total || 0).toFixed(2)), version: stored.version || 0 };
+  }
+
+  const source = costSource();
+  const [agg] = await source.Model.aggregate(buildUserSumsPipeline(userId, source));
+  return { total: Number(((agg && agg.total) || 0).toFixed(2)), version: 0 };
+}
+
+// Return the total of all costs of a user, rounded to two decimals.
+async function getUserTotal(userId) {
+  return (await getUserTotalState(userId)).total;
+}
+
+// Current version of a user's totals (0 without a totals document).
+async function getUserVersion(userId) {
+  const stored = await UserTotal.findOne({ userid: userId }).select('version -_id').lean();
+  return (stored && stored.version) || 0;
+}
+
+// Current version of a user-month (0 before its first cost item).
+async function getMonthVersion(userId, year, month) {
+  const stored = await MonthlyTotal.findOne({ userid: userId, year, month }).select('version -_id').lean();
+  return (stored && stored.version) || 0;
+}
+
+// Sum the costs of several users server-side; returns Map(userid -> rounded total).
+async function getUserTotals(userIds) {
+  const source = costSource();
+  const rows = await source.Model.aggregate(buildUserSumsPipeline({ $in: userIds }, source));
+  return new Map(rows.map((r) => [r._id, Number(r.total.toFixed(2))]));
+}
+
+// Remove the totals of a user (test cleanup); returns the user-months that had totals.
+async function removeUserTotals(userId) {
+  const months = await MonthlyTotal.find({ userid: userId }).select('year month -_id').lean();
+  await Promise.all([
+    UserTotal.deleteOne({ userid: userId }),
+    MonthlyTotal.deleteMany({ userid: userId })
+  ]);
+  return months;
+}
+
+module.exports = {
+  TOP_ITEMS,
+  topEntry,
+  addCategoryTotals,
+  applyCost,
+  applyCosts,
+  bumpVersions,
+  buildIncrements,
+  buildMonthTotalsPipeline,
+  buildUserSumsPipeline,
+  buildUserLookupPipeline,
+  getUserTotal,
+  getUserTotalState,
+  getUserTotals,
+  getUserVersion,
+  getMonthVersion,
+  removeUserTotals
+};
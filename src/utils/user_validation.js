@@ -0,0 +1,58 @@
+// User validation: shared input rules for single and bulk user creation.
+
+// MongoDB error code of a unique index violation.
+const DUPLICATE_KEY_CODE = 11000;
+
+// Scalar values Mongoose would cast to a String path (objects and arrays are rejected).
+const isStringLike = (value) => ['string', 'number', 'boolean'].includes(typeof value);
+
+/*
+ * Validate a raw user from a request body.
+ * Returns { value } with normalized fields, or { error } with a client-facing message.
+ * Duplicate ids are not checked here: they are reported by the unique index on insert.
+ * Names are cast to strings as the user schema does, because the bulk endpoint
+ * inserts the normalized users without schema validation.
+ */
+function validateUserInput(body) {
+  if (!body || typeof body !== 'object' || Array.isArray(body)) {
+    return { error: 'Invalid user' };
+  }
+
+  const { id, first_name, last_name, birthday } = body;
+
+  // Validate presence of all required fields.
+  if (id === undefined || id === null || !first_name || !last_name || !birthday) {
+    return { error: 'Missing required fields' };
+  }
+
+  // Convert user id to a number and ensure it is valid.
+  const numericId = Number(id);
+  if (!Number.isFinite(numericId)) {
+    return { error: 'Invalid id' };
+  }
+
+  // Names must be scalar values (cast to strings below).
+  if (!isStringLike(first_name) || !isStringLike(last_name)) {
+    return { error: 'Invalid name' };
+  }
+
+  // Parse birthday string into a Date object and validate its format.
+  const parsedBirthday = new Date(birthday);
+  if (isNaN(parsedBirthday.getTime())) {
+    return { error: 'Invalid birthday format' };
+  }
+
+  return {
+    value: {
+      id: numericId,
+      first_name: String(first_name),
+      last_name: String(last_name),
+      birthday: parsedBirthday
+    }
+  };
+}
+
+// Whether a MongoDB error (or write error) is a unique index violation.
+const isDuplicateKeyError = (err) => Boolean(err) && err.code === DUPLICATE_KEY_CODE;
+
+module.exports = { validateUserInput, isDuplicateKeyError };
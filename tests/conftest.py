@@ -0,0 +1,101 @@
+import os
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from test_api_local import USER_SERVICE_URL, COST_SERVICE_URL, LOG_SERVICE_URL, ADMIN_SERVICE_URL
+
+# Shared helpers of the suites that start the Node services themselves
+# (benchmark, bucket migration and legacy totals checks).
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Throwaway database of the opt-in upgrade checks (dropped after every test).
+MIGRATION_MONGODB_URI = os.environ.get("MIGRATION_MONGODB_URI", "mongodb://127.0.0.1:27017/cost_manager_migration_test")
+
+SERVICES = {
+    "users": ("src/users/app.js", USER_SERVICE_URL),
+    "costs": ("src/costs/app.js", COST_SERVICE_URL),
+    "logs": ("src/logs/app.js", LOG_SERVICE_URL),
+    "admin": ("src/admin/app.js", ADMIN_SERVICE_URL),
+}
+
+
+# Helper: wait until a TCP port accepts connections.
+def wait_for_port(url, timeout=30):
+    host, port = url.split("//", 1)[1].split(":")
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, int(port)), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+# Start the named services with the given environment; returns their processes.
+def start_services(env, names=tuple(SERVICES)):
+    procs = []
+    for name in names:
+        script, url = SERVICES[name]
+        procs.append(subprocess.Popen(["node", script], cwd=REPO_ROOT, env=env))
+        if not wait_for_port(url):
+            stop_services(procs)
+            raise RuntimeError(f"{name} service did not start on {url}")
+    return procs
+
+
+def stop_services(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# Services and scripts running against MIGRATION_MONGODB_URI.
+class ThrowawayServices:
+    def __init__(self, mongodb_uri=MIGRATION_MONGODB_URI):
+        self.mongodb_uri = mongodb_uri
+        self.procs = []
+
+    def env(self, mode="documents"):
+        return dict(os.environ, MONGODB_URI=self.mongodb_uri, NODE_ENV="test", PORT="", COST_STORAGE_MODE=mode)
+
+    # (Re)start the users and costs services with the given storage mode.
+    def start(self, mode="documents"):
+        self.stop()
+        self.procs = start_services(self.env(mode), ("users", "costs"))
+
+    def stop(self):
+        stop_services(self.procs)
+        self.procs = []
+
+    # Run a Node script (path and arguments) of the repository.
+    def run_script(self, *args, mode="documents"):
+        return subprocess.run(["node", *args], cwd=REPO_ROOT, env=self.env(mode), timeout=120)
+
+    # Run a snippet with a mongoose connection `m` to the throwaway database.
+    def run_mongoose(self, body):
+        script = f"require('mongoose').connect(process.env.MONGODB_URI).then((m) => {body}).then(() => process.exit(0))"
+        subprocess.run(["node", "-e", script], cwd=REPO_ROOT, env=self.env(), timeout=60, check=True)
+
+    def drop_database(self):
+        self.run_mongoose("m.connection.dropDatabase()")
+
+
+# Services on a throwaway database; stopped and the database dropped at teardown.
+@pytest.fixture
+def throwaway_services():
+    services = ThrowawayServices()
+    try:
+        yield services
+    finally:
+        services.stop()
+        services.drop_database()
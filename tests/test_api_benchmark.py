@@ -0,0 +1,258 @@
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+import requests
+
+# Reuse the service helpers of conftest.py and the URLs, payloads and report
+# checks of the functional suite.
+from conftest import REPO_ROOT, start_services, stop_services
+from test_api_local import (
+    USER_SERVICE_URL,
+    COST_SERVICE_URL,
+    LOG_SERVICE_URL,
+    ADMIN_SERVICE_URL,
+    user_data,
+    expense_data,
+    today,
+    _assert_report_structure,
+)
+
+# Load-testing and latency benchmark for the four local services.
+#
+# Run directly:
+#   python tests/test_api_benchmark.py [--spawn] [--update-baseline]
+# or through pytest (skipped unless RUN_BENCHMARKS=1):
+#   RUN_BENCHMARKS=1 pytest tests/test_api_benchmark.py
+#
+# --spawn starts the four Node services against a local MongoDB stand-in
+# (BENCH_MONGODB_URI, e.g. `docker run -p 27017:27017 mongo:7`), so the
+# benchmark never touches the Atlas database used by the deployment.
+#
+# The regression gate is opt-in: no baseline is committed, because latencies
+# depend on the machine. Store one with --update-baseline on the machine that
+# runs the gate (or point BENCH_BASELINE to it); without it the gate is skipped.
+
+# Benchmark configuration (environment variables).
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", "16"))
+REQUESTS_PER_ENDPOINT = int(os.environ.get("BENCH_REQUESTS", "200"))
+SEED_COSTS = int(os.environ.get("BENCH_SEED_COSTS", "1000"))
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.25"))
+BASELINE_PATH = Path(os.environ.get("BENCH_BASELINE", REPO_ROOT / "tests" / "benchmark_baseline.json"))
+RESULTS_PATH = Path(os.environ.get("BENCH_RESULTS", REPO_ROOT / "tests" / "bench_results.json"))
+MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://127.0.0.1:27017/cost_manager_bench")
+
+# Dedicated benchmark user, so seeded costs do not change the functional test user.
+# A new id per run (removed again at teardown) keeps the dataset the same size on
+# every run, also against a database that is not thrown away.
+BENCH_USER = dict(
+    user_data,
+    id=int(os.environ.get("BENCH_USER_ID", 700000000 + int(time.time()) % 100000000)),
+    first_name="bench",
+    last_name="bench",
+)
+
+# Per-thread HTTP session (keep-alive connections, like a real client pool).
+_local = threading.local()
+
+
+def _session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+# Helper: nearest-rank percentile of a sorted list.
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# Start the four services against the local MongoDB stand-in.
+def spawn_services():
+    env = dict(os.environ, MONGODB_URI=MONGODB_URI, NODE_ENV="test", PORT="")
+    env.setdefault("TEAM_MEMBERS", "Bench User")
+    return start_services(env)
+
+
+# Seed the benchmark user and SEED_COSTS cost items (bulk endpoint, chunks of 1000).
+def seed_dataset():
+    r = requests.post(f"{USER_SERVICE_URL}/api/add", json=BENCH_USER, timeout=10)
+    assert r.status_code in (200, 201, 400)
+
+    item = dict(expense_data, userid=BENCH_USER["id"], description="bench-seed")
+    remaining = SEED_COSTS
+    while remaining > 0:
+        batch = min(remaining, 1000)
+        r = requests.post(f"{COST_SERVICE_URL}/api/add/bulk", json=[item] * batch, timeout=60)
+        assert r.status_code == 201, r.text
+        remaining -= batch
+
+
+# Remove the benchmark user with all its costs, totals and reports (test-only endpoints, NODE_ENV=test).
+def cleanup_dataset():
+    uid = BENCH_USER["id"]
+    for url, body in ((f"{COST_SERVICE_URL}/removeusercosts", {"user_id": uid}),
+                      (f"{USER_SERVICE_URL}/removeuser", {"id": uid})):
+        try:
+            requests.delete(url, json=body, timeout=60)
+        except requests.RequestException as err:
+            print(f"Benchmark cleanup failed at {url}: {err}")
+
+
+# Endpoint scenarios: name -> (method, url, json body).
+def scenarios():
+    uid = BENCH_USER["id"]
+    return {
+        "add_cost": ("POST", f"{COST_SERVICE_URL}/api/add", dict(expense_data, userid=uid, description="bench-add")),
+        "report": ("GET", f"{COST_SERVICE_URL}/api/report?id={uid}&year={today.year}&month={today.month}", None),
+        "user_details": ("GET", f"{USER_SERVICE_URL}/api/users/{uid}", None),
+        "logs": ("GET", f"{LOG_SERVICE_URL}/api/logs?limit=100", None),
+    }
+
+
+def _timed_request(method, url, body):
+    start = time.perf_counter()
+    try:
+        r = _session().request(method, url, json=body, timeout=30)
+        ok = r.status_code < 400
+    except requests.RequestException:
+        ok = False
+    return (time.perf_counter() - start) * 1000.0, ok
+
+
+# Drive REQUESTS_PER_ENDPOINT requests with CONCURRENCY workers and summarize latency.
+def run_endpoint(method, url, body):
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        start = time.perf_counter()
+        samples = list(pool.map(lambda _: _timed_request(method, url, body), range(REQUESTS_PER_ENDPOINT)))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(ms for ms, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / wall, 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+    }
+
+
+def run_benchmark():
+    try:
+        seed_dataset()
+
+        # Functional sanity check before measuring.
+        r = requests.get(scenarios()["report"][1], timeout=10)
+        assert r.status_code == 200
+        _assert_report_structure(r.json(), today.year, today.month, BENCH_USER["id"])
+        return _measure()
+    finally:
+        cleanup_dataset()
+
+
+# Measure every scenario and collect the results with the run configuration.
+def _measure():
+    results = {
+        "meta": {
+            "concurrency": CONCURRENCY,
+            "requests_per_endpoint": REQUESTS_PER_ENDPOINT,
+            "seed_costs": SEED_COSTS,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "endpoints": {},
+    }
+    for name, (method, url, body) in scenarios().items():
+        results["endpoints"][name] = run_endpoint(method, url, body)
+    return results
+
+
+# Compare results with the stored baseline; returns a list of regression messages.
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = results["endpoints"].get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms > baseline {base['p95_ms']}ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']} rps < baseline {base['throughput_rps']} rps"
+            )
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} errors (baseline {base.get('errors', 0)})")
+    return regressions
+
+
+def write_results(results, path=RESULTS_PATH):
+    path.write_text(json.dumps(results, indent=2) + "\n")
+
+
+def load_baseline(path=BASELINE_PATH):
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+# -----------------------------
+# Pytest entry point
+# -----------------------------
+
+@pytest.mark.skipif(os.environ.get("RUN_BENCHMARKS") != "1", reason="set RUN_BENCHMARKS=1 to run benchmarks")
+def test_benchmark_no_regressions():
+    procs = spawn_services() if os.environ.get("BENCH_SPAWN") == "1" else []
+    try:
+        results = run_benchmark()
+    finally:
+        stop_services(procs)
+
+    write_results(results)
+    baseline = load_baseline()
+    if baseline is None:
+        pytest.skip(f"no baseline at {BASELINE_PATH}; results written to {RESULTS_PATH}")
+    assert find_regressions(results, baseline) == []
+
+
+# -----------------------------
+# Command-line entry point
+# -----------------------------
+
+def main(argv):
+    procs = spawn_services() if "--spawn" in argv else []
+    try:
+        results = run_benchmark()
+    finally:
+        stop_services(procs)
+
+    write_results(results)
+    print(json.dumps(results["endpoints"], indent=2))
+
+    if "--update-baseline" in argv:
+        write_results(results, BASELINE_PATH)
+        print(f"Baseline updated: {BASELINE_PATH}")
+        return 0
+
+    baseline = load_baseline()
+    if baseline is None:
+        print(f"No baseline at {BASELINE_PATH}; run with --update-baseline to store one.")
+        return 0
+
+    regressions = find_regressions(results, baseline)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,3 +1,4 @@
+import json
 import pytest
 import requests
 from datetime import date
@@ -121,6 +122,29 @@ def test_users_service_list_includes_user():
     assert any(u.get("id") == user_data["id"] for u in data)
 
 
+def test_users_service_list_pagination_and_projection():
+    r = requests.get(
+        f"{USER_SERVICE_URL}/api/users",
+        params={"limit": 1, "fields": "id,first_name"},
+        timeout=5
+    )
+    assert r.status_code == 200
+    page = r.json()
+    assert len(page) == 1
+    assert set(page[0].keys()) == {"id", "first_name"}
+
+    # Following the cursor continues with strictly larger ids.
+    cursor = r.headers.get("X-Next-Cursor")
+    assert cursor
+    r2 = requests.get(
+        f"{USER_SERVICE_URL}/api/users",
+        params={"limit": 1, "cursor": cursor},
+        timeout=5
+    )
+    assert r2.status_code == 200
+    assert r2.json()[0]["id"] > page[0]["id"]
+
+
 def test_users_service_get_user_details_total():
     r = requests.get(
         f"{USER_SERVICE_URL}/api/users/{user_data['id']}",
@@ -143,6 +167,56 @@ def test_users_service_get_user_details_total():
     assert total >= 0
 
 
+def test_users_service_user_details_conditional_get():
+    url = f"{USER_SERVICE_URL}/api/users/{user_data['id']}"
+    r = requests.get(url, timeout=5)
+    assert r.status_code == 200
+    etag = r.headers.get("ETag")
+    assert etag
+
+    # Unchanged totals: answered with 304 and no body.
+    r2 = requests.get(url, headers={"If-None-Match": etag}, timeout=5)
+    assert r2.status_code == 304
+    assert r2.content == b""
+
+
+def test_users_service_bulk_add_reports_duplicates():
+    # The local test user already exists (created by the session fixture).
+    r = requests.post(
+        f"{USER_SERVICE_URL}/api/add/bulk",
+        json=[user_data, {"id": "not-a-number"}],
+        timeout=10
+    )
+    assert r.status_code == 207
+
+    results = r.json()["results"]
+    assert results[0]["status"] == "failed"
+    assert results[0]["message"] == "User already exists"
+    assert results[1]["status"] == "failed"
+
+
+def test_users_service_bulk_add_rejects_non_string_names():
+    bad = {"id": 9999997, "first_name": {"first": "x"}, "last_name": ["y"], "birthday": "1999-03-12"}
+    r = requests.post(f"{USER_SERVICE_URL}/api/add/bulk", json=[bad], timeout=10)
+    assert r.status_code == 207
+
+    result = r.json()["results"][0]
+    assert result["status"] == "failed"
+    assert result["message"] == "Invalid name"
+
+
+def test_users_service_batch_lookup():
+    ids = f"{PROF_USER['id']},{user_data['id']},9999998"
+    r = requests.get(f"{USER_SERVICE_URL}/api/users/batch?ids={ids}", timeout=5)
+    assert r.status_code == 200
+
+    # Found users come back in the requested order; unknown ids are omitted.
+    data = r.json()
+    assert [u["id"] for u in data] == [PROF_USER["id"], user_data["id"]]
+    for u in data:
+        assert "first_name" in u and "last_name" in u and "total" in u
+
+
 # -----------------------------
 # Costs service tests
 # -----------------------------
@@ -163,6 +237,52 @@ def test_costs_service_add_expense():
     assert "sum" in body
 
 
+def test_costs_service_add_expense_idempotent_retry():
+    headers = {"Idempotency-Key": f"test-{time.time_ns()}"}
+    payload = dict(expense_data, description="idempotent")
+
+    first = requests.post(f"{COST_SERVICE_URL}/api/add", json=payload, headers=headers, timeout=5)
+    assert first.status_code == 201
+
+    # A retry with the same key replays the stored response instead of inserting again.
+    retry = requests.post(f"{COST_SERVICE_URL}/api/add", json=payload, headers=headers, timeout=5)
+    assert retry.status_code == 201
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert retry.json() == first.json()
+
+    # Reusing the key for a different request is rejected.
+    other = requests.post(f"{COST_SERVICE_URL}/api/add", json=dict(payload, sum=1), headers=headers, timeout=5)
+    assert other.status_code == 422
+    _assert_error_shape(other.json())
+
+
+def test_costs_service_bulk_add_reports_per_item():
+    items = [
+        dict(expense_data, description="bulk-1"),
+        dict(expense_data, category="other"),
+        dict(expense_data, userid=9999998),
+    ]
+    r = requests.post(f"{COST_SERVICE_URL}/api/add/bulk", json=items, timeout=10)
+    assert r.status_code == 207
+
+    body = r.json()
+    assert body["total"] == 3
+    assert body["inserted"] == 1
+    assert body["failed"] == 2
+    statuses = [res["status"] for res in body["results"]]
+    assert statuses == ["created", "failed", "failed"]
+
+
+def test_costs_service_bulk_add_rejects_negative_sum():
+    items = [dict(expense_data, sum=-5), dict(expense_data, description={"text": "x"})]
+    r = requests.post(f"{COST_SERVICE_URL}/api/add/bulk", json=items, timeout=10)
+    assert r.status_code == 207
+
+    body = r.json()
+    assert body["inserted"] == 0
+    assert [res["message"] for res in body["results"]] == ["Sum cannot be negative", "Invalid description"]
+
+
 def test_costs_service_get_report_structure():
     year = today.year
     month = today.month
@@ -176,6 +296,96 @@ def test_costs_service_get_report_structure():
     _assert_report_structure(data, year, month, user_data["id"])
 
 
+def test_costs_service_report_range_year_to_date():
+    year = today.year
+
+    # Year-to-date range returns one report per month from January to now.
+    url = f"{COST_SERVICE_URL}/api/report/range?id={user_data['id']}&year={year}"
+    r = requests.get(url, timeout=5)
+    assert r.status_code == 200
+
+    data = r.json()
+    assert isinstance(data, list)
+    assert len(data) == today.month
+    for i, report in enumerate(data):
+        _assert_report_structure(report, year, i + 1, user_data["id"])
+
+
+def test_costs_service_analytics_year_to_date():
+    url = f"{COST_SERVICE_URL}/api/analytics?id={user_data['id']}&year={today.year}&top=3"
+    r = requests.get(url, timeout=5)
+    assert r.status_code == 200
+
+    data = r.json()
+    assert data["userids"] == [user_data["id"]]
+    assert data["months"] == today.month
+    assert len(data["monthly"]) == today.month
+    assert {c["category"] for c in data["categories"]} == REQUIRED_CATEGORIES
+    assert data["total"] >= expense_data["sum"]
+    assert 0 < len(data["top"]) <= 3
+    assert data["top"][0]["sum"] >= data["top"][-1]["sum"]
+
+    r = requests.get(f"{COST_SERVICE_URL}/api/analytics?id=abc&year={today.year}", timeout=5)
+    assert r.status_code == 400
+    _assert_error_shape(r.json())
+
+
+def test_costs_service_export_streams_user_history():
+    # NDJSON export of the test user (requests decompresses the gzip body transparently).
+    url = f"{COST_SERVICE_URL}/api/export?id={user_data['id']}&format=ndjson"
+    r = requests.get(url, headers={"Accept-Encoding": "gzip"}, timeout=10)
+    assert r.status_code == 200
+    assert r.headers.get("Content-Encoding") == "gzip"
+
+    rows = [json.loads(line) for line in r.text.splitlines() if line]
+    assert rows
+    assert all(row["userid"] == user_data["id"] for row in rows)
+    assert any(row["description"] == expense_data["description"] for row in rows)
+
+    # CSV export starts with the header line.
+    r = requests.get(f"{COST_SERVICE_URL}/api/export?id={user_data['id']}", timeout=10)
+    assert r.status_code == 200
+    assert r.text.splitlines()[0] == "userid,createdAt,year,month,day,description,category,sum"
+
+    r = requests.get(f"{COST_SERVICE_URL}/api/export?format=xml", timeout=5)
+    assert r.status_code == 400
+    _assert_error_shape(r.json())
+
+
+def test_costs_service_past_month_report_conditional_get():
+    year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    url = f"{COST_SERVICE_URL}/api/report?id={user_data['id']}&year={year}&month={month}"
+
+    # The first request computes and stores the report, the second is served from the cache.
+    first = requests.get(url, timeout=5)
+    assert first.status_code == 200
+    second = requests.get(url, timeout=5)
+    assert second.status_code == 200
+    etag = second.headers.get("ETag")
+    assert etag
+
+    r = requests.get(url, headers={"If-None-Match": etag}, timeout=5)
+    assert r.status_code == 304
+
+
+def test_costs_service_report_conditional_get_and_new_cost():
+    url = f"{COST_SERVICE_URL}/api/report?id={user_data['id']}&year={today.year}&month={today.month}"
+    r = requests.get(url, timeout=5)
+    assert r.status_code == 200
+    etag = r.headers.get("ETag")
+    assert etag
+
+    r2 = requests.get(url, headers={"If-None-Match": etag}, timeout=5)
+    assert r2.status_code == 304
+
+    # A new cost item of the month changes the validator.
+    add = requests.post(f"{COST_SERVICE_URL}/api/add", json=dict(expense_data, description="etag"), timeout=5)
+    assert add.status_code == 201
+    r3 = requests.get(url, headers={"If-None-Match": etag}, timeout=5)
+    assert r3.status_code == 200
+    assert any(item["description"] == "etag" for entry in r3.json()["costs"] for item in entry.get("food", []))
+
+
 # -----------------------------
 # Logs service tests
 # -----------------------------
@@ -186,6 +396,14 @@ def test_logs_service_get_logs():
     assert isinstance(r.json(), list)
 
 
+def test_logs_service_compresses_large_pages():
+    r = requests.get(f"{LOG_SERVICE_URL}/api/logs", headers={"Accept-Encoding": "gzip"}, timeout=5)
+    assert r.status_code == 200
+    assert len(r.json()) > 10
+    assert r.headers.get("Content-Encoding") == "gzip"
+    assert "Accept-Encoding" in r.headers.get("Vary", "")
+
+
 def test_logs_not_decreasing_after_requests():
     # Record log count before issuing new requests.
     r1 = requests.get(f"{LOG_SERVICE_URL}/api/logs", timeout=5)
@@ -206,6 +424,35 @@ def test_logs_not_decreasing_after_requests():
     assert after_count >= before_count
 
 
+def test_logs_service_pagination_cursor():
+    # Request a small page and follow the cursor to the next one.
+    r1 = requests.get(f"{LOG_SERVICE_URL}/api/logs?limit=2", timeout=5)
+    assert r1.status_code == 200
+    page1 = r1.json()
+    assert isinstance(page1, list)
+    assert len(page1) <= 2
+
+    cursor = r1.headers.get("X-Next-Cursor")
+    if cursor:
+        r2 = requests.get(
+            f"{LOG_SERVICE_URL}/api/logs",
+            params={"limit": 2, "cursor": cursor},
+            timeout=5
+        )
+        assert r2.status_code == 200
+        page2 = r2.json()
+        assert isinstance(page2, list)
+        # Pages are ordered newest first and do not overlap in time.
+        if page2:
+            assert page2[0]["time"] <= page1[-1]["time"]
+
+
+def test_logs_service_invalid_filter_returns_400():
+    r = requests.get(f"{LOG_SERVICE_URL}/api/logs?statusCode=abc", timeout=5)
+    assert r.status_code == 400
+    _assert_error_shape(r.json())
+
+
 # -----------------------------
 # Admin / about tests
 # -----------------------------
@@ -223,6 +470,17 @@ def test_admin_about():
         assert set(obj.keys()) == {"first_name", "last_name"}
 
 
+def test_all_services_report_ready():
+    for url in (USER_SERVICE_URL, COST_SERVICE_URL, LOG_SERVICE_URL, ADMIN_SERVICE_URL):
+        assert requests.get(f"{url}/healthz", timeout=5).status_code == 200
+
+        r = requests.get(f"{url}/readyz", timeout=5)
+        assert r.status_code == 200
+        data = r.json()
+        assert data["database"] == "connected"
+        assert {"total", "inUse", "waiting"} <= set(data["pool"].keys())
+
+
 # -----------------------------
 # Professor-style test (EXACT FLOW)
 # -----------------------------
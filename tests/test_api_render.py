@@ -1,6 +1,7 @@
 import pytest
 import requests
 import time
+import uuid
 from datetime import date
 
 # SERVICES (Render deployment): base URLs for the 4 microservices.
@@ -47,7 +48,13 @@ def _request_with_retry(method, url, attempts=4, timeout=12, sleep_seconds=2, **
     - Always uses a timeout (never hangs forever)
     - Retries only on network/timeouts
     - If server responds (even 4xx/5xx) we return it immediately
+    - POST retries reuse one Idempotency-Key, so a retried insert is not duplicated
     """
+    if method.upper() == "POST":
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.setdefault("Idempotency-Key", str(uuid.uuid4()))
+        kwargs["headers"] = headers
+
     last_exc = None
     for i in range(attempts):
         try:
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+import requests
+
+# Reuse the service URLs and payloads of the functional suite.
+from test_api_local import USER_SERVICE_URL, COST_SERVICE_URL, user_data, expense_data, today
+
+# Bucket migration check: a report served in bucket mode after
+# src/scripts/migrate_costs_to_buckets.js equals the report served in
+# documents mode before it (same items, same order).
+#
+# Run through pytest (skipped unless RUN_MIGRATION_TESTS=1):
+#   RUN_MIGRATION_TESTS=1 pytest tests/test_bucket_migration.py
+#
+# The users and costs services are started against a throwaway database
+# (MIGRATION_MONGODB_URI, throwaway_services fixture), which is dropped at the
+# end; stop the locally running services first (same ports).
+
+MIGRATION_USER = dict(user_data, id=555555, first_name="migration", last_name="migration")
+
+# Items whose index order (category, sum) differs from their insertion (_id) order.
+MIGRATION_COSTS = [
+    dict(expense_data, userid=MIGRATION_USER["id"], category=category, sum=amount, description=f"migration-{i}")
+    for i, (category, amount) in enumerate([
+        ("sports", 90), ("food", 50), ("food", 10), ("health", 70), ("food", 30), ("sports", 5),
+    ])
+]
+
+
+def _report():
+    url = f"{COST_SERVICE_URL}/api/report"
+    params = {"id": MIGRATION_USER["id"], "year": today.year, "month": today.month}
+    r = requests.get(url, params=params, timeout=10)
+    assert r.status_code == 200
+    return r.json()
+
+
+@pytest.mark.skipif(os.environ.get("RUN_MIGRATION_TESTS") != "1", reason="set RUN_MIGRATION_TESTS=1 to run")
+def test_bucket_migration_keeps_report_items_and_order(throwaway_services):
+    throwaway_services.start("documents")
+    r = requests.post(f"{USER_SERVICE_URL}/api/add", json=MIGRATION_USER, timeout=10)
+    assert r.status_code in (200, 201)
+    for item in MIGRATION_COSTS:
+        r = requests.post(f"{COST_SERVICE_URL}/api/add", json=item, timeout=10)
+        assert r.status_code == 201
+    before = _report()
+    throwaway_services.stop()
+
+    script = "src/scripts/migrate_costs_to_buckets.js"
+    assert throwaway_services.run_script(script, "--restart").returncode == 0
+    assert throwaway_services.run_script(script, "--verify").returncode == 0
+
+    throwaway_services.start("buckets")
+    assert _report() == before
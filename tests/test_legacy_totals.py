@@ -0,0 +1,66 @@
+import os
+
+import pytest
+import requests
+
+# Reuse the service URLs and payloads of the functional suite.
+from test_api_local import USER_SERVICE_URL, COST_SERVICE_URL, user_data, expense_data, today
+
+# Upgrade check: a user whose costs were stored before the running totals
+# existed (no user_totals / monthly_totals documents) keeps complete totals
+# after adding a cost.
+#
+# Run through pytest (skipped unless RUN_MIGRATION_TESTS=1):
+#   RUN_MIGRATION_TESTS=1 pytest tests/test_legacy_totals.py
+#
+# Like the bucket migration check it runs on the throwaway database of the
+# throwaway_services fixture (conftest.py).
+
+LEGACY_USER = dict(user_data, id=444444, first_name="legacy", last_name="legacy")
+
+
+# Delete the user's totals documents, as in a database from before the totals store.
+def _drop_totals(services, userid):
+    services.run_mongoose(
+        "Promise.all(["
+        f"m.connection.collection('user_totals').deleteOne({{ userid: {userid} }}), "
+        f"m.connection.collection('monthly_totals').deleteMany({{ userid: {userid} }})"
+        "])"
+    )
+
+
+def _user_total():
+    r = requests.get(f"{USER_SERVICE_URL}/api/users/{LEGACY_USER['id']}", timeout=10)
+    assert r.status_code == 200
+    return r.json()["total"]
+
+
+def _month_analytics():
+    month = f"{today.year}-{today.month:02d}"
+    params = {"id": LEGACY_USER["id"], "from": month, "to": month}
+    r = requests.get(f"{COST_SERVICE_URL}/api/analytics", params=params, timeout=10)
+    assert r.status_code == 200
+    return r.json()
+
+
+@pytest.mark.skipif(os.environ.get("RUN_MIGRATION_TESTS") != "1", reason="set RUN_MIGRATION_TESTS=1 to run")
+def test_legacy_user_total_includes_costs_before_totals(throwaway_services):
+    item = dict(expense_data, userid=LEGACY_USER["id"], sum=40)
+    throwaway_services.start("documents")
+    r = requests.post(f"{USER_SERVICE_URL}/api/add", json=LEGACY_USER, timeout=10)
+    assert r.status_code in (200, 201)
+    for _ in range(2):
+        r = requests.post(f"{COST_SERVICE_URL}/api/add", json=item, timeout=10)
+        assert r.status_code == 201
+
+    _drop_totals(throwaway_services, LEGACY_USER["id"])
+    assert _user_total() == 80
+
+    # The first cost after the upgrade seeds the totals from the stored costs.
+    r = requests.post(f"{COST_SERVICE_URL}/api/add", json=item, timeout=10)
+    assert r.status_code == 201
+    assert _user_total() == 120
+
+    analytics = _month_analytics()
+    assert analytics["total"] == 120
+    assert len(analytics["top"]) == 3